@@ -0,0 +1,35 @@
+from django.contrib import admin
+from .models import DailySalesRollup, EmailCampaignStats, RollupState
+
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'track', 'license_type', 'file_format', 'provider', 'currency', 'licenses_sold', 'revenue')
+    list_filter = ('provider', 'currency', 'license_type', 'file_format')
+    date_hierarchy = 'date'
+    list_select_related = ('track', 'license_type', 'file_format')
+
+    # Rollups are derived data maintained by analytics.tasks
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RollupState)
+class RollupStateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_order_update', 'updated_at')
+
+
+@admin.register(EmailCampaignStats)
+class EmailCampaignStatsAdmin(admin.ModelAdmin):
+    list_display = ('campaign', 'opens', 'unique_opens', 'clicks', 'unique_clicks', 'last_event_at')
+    search_fields = ('campaign',)
+
+    # Counters are derived data maintained by analytics.tasks
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
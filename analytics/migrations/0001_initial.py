@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('licenses', '0009_licensedownload'),
+        ('music', '0011_rename_created_at_fileformat_created_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_order_update', models.DateTimeField(blank=True, help_text='Orders updated up to this time are included in the rollups.', null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, help_text='The day the orders were placed (UTC).')),
+                ('provider', models.CharField(blank=True, default='', help_text="Payment provider of the order (e.g. 'stripe', 'paypal'). Blank if unknown.", max_length=10)),
+                ('currency', models.CharField(default='usd', max_length=3)),
+                ('licenses_sold', models.PositiveIntegerField(default=0, help_text='Number of licenses sold (sum of order item quantities).')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Revenue before tax (sum of order item price * quantity).', max_digits=14)),
+                ('file_format', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales_rollups', to='music.fileformat')),
+                ('license_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales_rollups', to='licenses.license_type')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales_rollups', to='music.track')),
+            ],
+            options={
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'track', 'license_type', 'file_format', 'provider', 'currency'), name='unique_daily_sales_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailCampaignStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campaign', models.CharField(max_length=100, unique=True)),
+                ('opens', models.PositiveIntegerField(default=0)),
+                ('unique_opens', models.PositiveIntegerField(default=0, help_text='Recipients who opened at least once.')),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('unique_clicks', models.PositiveIntegerField(default=0, help_text='Recipients who clicked at least once.')),
+                ('first_event_at', models.DateTimeField(blank=True, null=True)),
+                ('last_event_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'email campaign stats',
+                'ordering': ['-last_event_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EmailEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stream_id', models.CharField(help_text='Id of the stream entry, so a re-delivered entry is stored once.', max_length=40, unique=True)),
+                ('campaign', models.CharField(help_text="What was sent, e.g. 'newsletter:12' or 'license_email'.", max_length=100)),
+                ('kind', models.CharField(choices=[('open', 'Open'), ('click', 'Click')], max_length=5)),
+                ('recipient', models.CharField(help_text='Subscriber id for newsletters, order reference for license emails.', max_length=255)),
+                ('url', models.URLField(blank=True, default='', help_text='Target of a click.', max_length=2000)),
+                ('occurred_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['campaign', 'kind', 'recipient'], name='email_event_recipient_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+from django.db import models
+from django.utils import timezone
+
+
+class DailySalesRollup(models.Model):
+    """
+    Pre-aggregated sales for one day and one combination of track, license type, file format,
+    payment provider and currency. Built from COMPLETED orders by analytics.services so that
+    reporting never scans Order/OrderItem/License/Payment row by row.
+    """
+    date = models.DateField(db_index=True,
+                            help_text="The day the orders were placed (UTC).")
+    track = models.ForeignKey('music.Track', on_delete=models.CASCADE, related_name='daily_sales_rollups')
+    license_type = models.ForeignKey('licenses.License_type', on_delete=models.CASCADE, related_name='daily_sales_rollups')
+    file_format = models.ForeignKey('music.FileFormat', on_delete=models.CASCADE, related_name='daily_sales_rollups')
+    provider = models.CharField(max_length=10, blank=True, default='',
+                                help_text="Payment provider of the order (e.g. 'stripe', 'paypal'). Blank if unknown.")
+    currency = models.CharField(max_length=3, default='usd')
+
+    licenses_sold = models.PositiveIntegerField(default=0,
+                                                help_text="Number of licenses sold (sum of order item quantities).")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                  help_text="Revenue before tax (sum of order item price * quantity).")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'track', 'license_type', 'file_format', 'provider', 'currency'],
+                name='unique_daily_sales_rollup',
+            ),
+        ]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} - {self.track_id} - {self.licenses_sold} sold"
+
+
+class RollupState(models.Model):
+    """Watermark of the last incremental rollup run (one row per rollup name)."""
+    name = models.CharField(max_length=50, unique=True)
+    last_order_update = models.DateTimeField(null=True, blank=True,
+                                             help_text="Orders updated up to this time are included in the rollups.")
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} - {self.last_order_update}"
+
+
+class EmailEvent(models.Model):
+    """
+    One open or click of a tracked email. Written in batches by analytics.tracking from the Redis
+    stream the tracking endpoints append to - never by the endpoints themselves.
+    """
+    class Kind(models.TextChoices):
+        OPEN = 'open', 'Open'
+        CLICK = 'click', 'Click'
+
+    stream_id = models.CharField(max_length=40, unique=True,
+                                 help_text="Id of the stream entry, so a re-delivered entry is stored once.")
+    campaign = models.CharField(max_length=100,
+                                help_text="What was sent, e.g. 'newsletter:12' or 'license_email'.")
+    kind = models.CharField(max_length=5, choices=Kind.choices)
+    recipient = models.CharField(max_length=255,
+                                 help_text="Subscriber id for newsletters, order reference for license emails.")
+    url = models.URLField(max_length=2000, blank=True, default='', help_text="Target of a click.")
+    occurred_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['campaign', 'kind', 'recipient'], name='email_event_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign} - {self.kind} - {self.recipient}"
+
+
+class EmailCampaignStats(models.Model):
+    """Open/click counters per campaign, kept up to date by the tracking consumer"""
+    campaign = models.CharField(max_length=100, unique=True)
+    opens = models.PositiveIntegerField(default=0)
+    unique_opens = models.PositiveIntegerField(default=0, help_text="Recipients who opened at least once.")
+    clicks = models.PositiveIntegerField(default=0)
+    unique_clicks = models.PositiveIntegerField(default=0, help_text="Recipients who clicked at least once.")
+    first_event_at = models.DateTimeField(null=True, blank=True)
+    last_event_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'email campaign stats'
+        ordering = ['-last_event_at']
+
+    def __str__(self):
+        return f"{self.campaign} - {self.unique_opens} opened, {self.unique_clicks} clicked"
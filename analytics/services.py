@@ -0,0 +1,168 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncDay, TruncMonth
+from django.utils import timezone
+
+from licenses.models import License
+from transactions.models import Order, Payment, PaymentStatus
+from .models import DailySalesRollup, RollupState
+
+SALES_ROLLUP = 'daily_sales'
+
+# Orders committed slightly after a run started can carry an updated_at older than the watermark.
+# Rebuilding a day is idempotent, so we simply re-scan this overlap on every run.
+ROLLUP_OVERLAP = timedelta(minutes=10)
+
+# Days are rebuilt in chunks to keep each delete/insert transaction small
+DAYS_PER_BATCH = 31
+
+DIMENSIONS = {
+    'track': ('track_id', 'track__title'),
+    'license_type': ('license_type_id', 'license_type__license_type_name'),
+    'file_format': ('file_format_id', 'file_format__name'),
+    'provider': ('provider', None),
+}
+
+INTERVALS = {
+    'day': TruncDay,
+    'month': TruncMonth,
+}
+
+
+class AnalyticsError(ValueError):
+    """Raised for unsupported rollup queries"""
+
+
+def aggregate_sales(days):
+    """
+    Aggregate COMPLETED order licenses for the given days into rollup rows (not saved).
+    One grouped query over License -> OrderItem -> Order with the provider taken from the successful payment.
+    """
+    provider = Subquery(
+        Payment.objects
+        .filter(order=OuterRef('order_item__order'), status=PaymentStatus.SUCCESS)
+        .order_by('-created_date')
+        .values('provider')[:1]
+    )
+    rows = (
+        License.objects
+        .filter(
+            order_item__order__status=Order.OrderStatus.COMPLETED,
+            order_item__order__created_date__date__in=days,
+        )
+        .annotate(
+            day=TruncDate('order_item__order__created_date'),
+            provider=Coalesce(provider, Value('')),
+            line_total=ExpressionWrapper(
+                F('order_item__price') * F('order_item__quantity'),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+        .values(
+            'day',
+            'track_license_option__track_id',
+            'track_license_option__license_type_id',
+            'track_license_option__track_storage_file__file_format_id',
+            'provider',
+            'order_item__order__currency',
+        )
+        .annotate(
+            licenses_sold=Sum('order_item__quantity'),
+            revenue=Sum('line_total'),
+        )
+        .order_by()
+    )
+    return [
+        DailySalesRollup(
+            date=row['day'],
+            track_id=row['track_license_option__track_id'],
+            license_type_id=row['track_license_option__license_type_id'],
+            file_format_id=row['track_license_option__track_storage_file__file_format_id'],
+            provider=row['provider'],
+            currency=row['order_item__order__currency'],
+            licenses_sold=row['licenses_sold'] or 0,
+            revenue=Decimal(row['revenue'] or 0).quantize(Decimal('0.01')),
+        )
+        for row in rows
+    ]
+
+
+def rebuild_days(days):
+    """Replace the rollup rows for the given days. Idempotent, so re-running a day is always safe."""
+    days = sorted(set(days))
+    rebuilt = 0
+    for start in range(0, len(days), DAYS_PER_BATCH):
+        batch = days[start:start + DAYS_PER_BATCH]
+        with transaction.atomic():
+            DailySalesRollup.objects.filter(date__in=batch).delete()
+            rebuilt += len(DailySalesRollup.objects.bulk_create(aggregate_sales(batch)))
+    return rebuilt
+
+
+def update_sales_rollups(full_rebuild=False):
+    """
+    Incrementally refresh the daily rollups.
+    Only days that contain orders updated since the last run are rebuilt (status changes such as
+    refunds are picked up the same way), so the cost follows new activity, not order history.
+    Changes to an order's items, licenses and payments bump its updated_at as well (see
+    transactions.pricing.recalculate_order_totals and transactions.models.touch_orders).
+    """
+    state, _ = RollupState.objects.get_or_create(name=SALES_ROLLUP)
+    run_started = timezone.now()
+
+    orders = Order.objects.all()
+    if state.last_order_update and not full_rebuild:
+        orders = orders.filter(updated_at__gte=state.last_order_update - ROLLUP_OVERLAP)
+    days = list(orders.annotate(day=TruncDate('created_date')).values_list('day', flat=True).distinct().order_by())
+
+    if full_rebuild:
+        DailySalesRollup.objects.exclude(date__in=days).delete()
+    rows = rebuild_days(days)
+
+    state.last_order_update = run_started
+    state.updated_at = timezone.now()
+    state.save(update_fields=['last_order_update', 'updated_at'])
+    return {"days": len(days), "rows": rows}
+
+
+def sales_time_series(dimension, interval='day', start=None, end=None, key=None):
+    """
+    Time series of licenses sold and revenue per dimension value, read from the rollup table only.
+    dimension: track | license_type | file_format | provider
+    """
+    if dimension not in DIMENSIONS:
+        raise AnalyticsError(f"Unsupported dimension '{dimension}'. Use one of: {', '.join(DIMENSIONS)}")
+    if interval not in INTERVALS:
+        raise AnalyticsError(f"Unsupported interval '{interval}'. Use one of: {', '.join(INTERVALS)}")
+
+    key_field, label_field = DIMENSIONS[dimension]
+    rollups = DailySalesRollup.objects.all()
+    if start:
+        rollups = rollups.filter(date__gte=start)
+    if end:
+        rollups = rollups.filter(date__lte=end)
+    if key:
+        rollups = rollups.filter(**{key_field: key})
+
+    fields = ['period', key_field, 'currency'] + ([label_field] if label_field else [])
+    rows = (
+        rollups
+        .annotate(period=INTERVALS[interval]('date'))
+        .values(*fields)
+        .annotate(licenses_sold=Sum('licenses_sold'), revenue=Sum('revenue'))
+        .order_by('period', key_field, 'currency')
+    )
+    return [
+        {
+            "period": row['period'].isoformat() if hasattr(row['period'], 'isoformat') else str(row['period']),
+            "key": str(row[key_field]),
+            "label": row[label_field] if label_field else row[key_field],
+            "currency": row['currency'],
+            "licenses_sold": row['licenses_sold'],
+            "revenue": str(Decimal(row['revenue'] or 0).quantize(Decimal('0.01'))),
+        }
+        for row in rows
+    ]
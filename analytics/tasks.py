@@ -0,0 +1,25 @@
+from celery import shared_task
+import logging
+
+from .services import update_sales_rollups
+from .tracking import process_email_events
+
+logger = logging.getLogger(__name__)
+
+
+# Scheduled by celery beat (see core/celery.py). Safe to run as often as needed - each run only
+# rebuilds the days touched by orders updated since the previous run.
+@shared_task
+def update_sales_rollups_task(full_rebuild=False):
+    result = update_sales_rollups(full_rebuild=full_rebuild)
+    logger.info(f"Sales rollups updated: {result['days']} day(s), {result['rows']} row(s)")
+    return result
+
+
+# Scheduled every minute by celery beat; drains the email tracking stream (see analytics/tracking.py)
+@shared_task
+def process_email_events_task():
+    result = process_email_events(consumer=f"celery-{process_email_events_task.request.hostname or 'worker'}")
+    if result['batches']:
+        logger.info(f"Email events stored: {result['events']} in {result['batches']} batch(es)")
+    return result
@@ -0,0 +1,187 @@
+import re
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from common.models import Contact
+from licenses.models import License, License_type, TrackLicenseOptions
+from music.models import FileFormat, Track, TrackStorageFile
+from newsletter.models import Newsletter, Subscriber
+from newsletter.tasks import send_newsletter_task
+from transactions.models import Buyer, Order, OrderItem, Payment, PaymentStatus
+from .models import DailySalesRollup, EmailCampaignStats, EmailEvent
+from .tasks import process_email_events_task, update_sales_rollups_task
+from .tracking import click_url, get_stream, open_pixel_url, reset_memory_stream, tracking_token
+
+
+class SalesRollupTest(APITestCase):
+    def setUp(self):
+        self.buyer = Buyer.objects.create(contact=Contact.objects.create(first_name='Buyer', last_name='Buyer'))
+        self.file_format = FileFormat.objects.create(
+            name='WAV', mime_type='audio/wav', extension='.wav', compression='lossless'
+        )
+        self.license_type = License_type.objects.create(
+            license_type_name='Premium', license_template='Template', license_term='1 Year',
+            transferability='Non-Transferable', price=Decimal('49.99'), download_limit='Unlimited',
+            streaming_limit='Unlimited', monetized_radio_plays='Unlimited', video_rights='Yes',
+            royalty_payment='No'
+        )
+        self.track = Track.objects.create(title='Rollup Track')
+        storage_file = TrackStorageFile.objects.create(file_path='track_storage_files/rollup.wav', file_format=self.file_format)
+        self.option = TrackLicenseOptions.objects.create(
+            track=self.track, track_storage_file=storage_file, license_type=self.license_type
+        )
+        self.content_type = ContentType.objects.get(app_label='licenses', model='tracklicenseoptions')
+
+    def create_order(self, reference_number, provider='stripe', order_status=Order.OrderStatus.COMPLETED):
+        order = Order.objects.create(buyer=self.buyer, reference_number=reference_number)
+        order_item = OrderItem.objects.create(
+            order=order, content_type=self.content_type, object_id=self.option.track_license_option_id,
+            price=self.license_type.price
+        )
+        License.objects.create(track_license_option=self.option, order_item=order_item)
+        Payment.objects.create(order=order, provider=provider, provider_payment_id=reference_number,
+                               amount=Decimal('49.99'), status=PaymentStatus.SUCCESS)
+        Order.objects.filter(pk=order.pk).update(status=order_status)
+        return order
+
+    def test_rollup_is_incremental_and_idempotent(self):
+        self.create_order('ORD-1', provider='stripe')
+        self.create_order('ORD-2', provider='paypal')
+        self.create_order('ORD-3', order_status=Order.OrderStatus.PENDING)
+
+        update_sales_rollups_task()
+        update_sales_rollups_task()  # re-running must not double count
+
+        rollups = DailySalesRollup.objects.all()
+        self.assertEqual(rollups.count(), 2)
+        self.assertEqual(sum(r.licenses_sold for r in rollups), 2)
+        self.assertEqual(sum(r.revenue for r in rollups), Decimal('99.98'))
+
+    def test_refunded_order_is_removed_from_rollup(self):
+        order = self.create_order('ORD-REFUND')
+        update_sales_rollups_task()
+        self.assertEqual(DailySalesRollup.objects.count(), 1)
+
+        order.refresh_from_db()
+        order.status = Order.OrderStatus.REFUNDED
+        order.save()
+        update_sales_rollups_task()
+        self.assertEqual(DailySalesRollup.objects.count(), 0)
+
+    def test_item_and_payment_changes_rebuild_their_day(self):
+        from django.utils import timezone
+
+        order = self.create_order('ORD-EDIT', provider='stripe')
+        update_sales_rollups_task()
+        # Well outside the re-scan overlap of the next run
+        Order.objects.update(updated_at=timezone.now() - timezone.timedelta(days=1))
+
+        order_item = order.order_items.get()
+        order_item.quantity = 3
+        order_item.save()
+        update_sales_rollups_task()
+        rollup = DailySalesRollup.objects.get()
+        self.assertEqual((rollup.licenses_sold, rollup.revenue), (3, Decimal('149.97')))
+
+        Order.objects.update(updated_at=timezone.now() - timezone.timedelta(days=1))
+        Payment.objects.filter(order=order).get().delete()
+        Payment.objects.create(order=order, provider='paypal', provider_payment_id='ORD-EDIT-2',
+                               amount=Decimal('149.97'), status=PaymentStatus.SUCCESS)
+        update_sales_rollups_task()
+        self.assertEqual(DailySalesRollup.objects.get().provider, 'paypal')
+
+    def test_time_series_endpoint(self):
+        self.create_order('ORD-1', provider='stripe')
+        self.create_order('ORD-2', provider='stripe')
+        update_sales_rollups_task()
+
+        url = reverse('analytics-sales', kwargs={'dimension': 'track'})
+        self.assertIn(self.client.get(url).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+        self.client.force_authenticate(get_user_model().objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True,
+        ))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'interval': 'month'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        row = response.data['results'][0]
+        self.assertEqual(row['key'], str(self.track.track_id))
+        self.assertEqual(row['label'], 'Rollup Track')
+        self.assertEqual(row['licenses_sold'], 2)
+        self.assertEqual(row['revenue'], '99.98')
+
+        response = self.client.get(reverse('analytics-sales', kwargs={'dimension': 'provider'}))
+        self.assertEqual(response.data['results'][0]['key'], 'stripe')
+
+        response = self.client.get(reverse('analytics-sales', kwargs={'dimension': 'buyer'}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EmailTrackingTest(APITestCase):
+    def setUp(self):
+        reset_memory_stream()
+        self.addCleanup(reset_memory_stream)
+
+    def test_endpoints_only_append_to_the_stream(self):
+        token = tracking_token('newsletter:1', 7)
+        with self.assertNumQueries(0):
+            response = self.client.get(open_pixel_url(token))
+            redirect = self.client.get(click_url(token, 'https://radicle.example/albums/1?a=1&b=2'))
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(redirect.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(redirect['Location'], 'https://radicle.example/albums/1?a=1&b=2')
+        self.assertEqual(len(get_stream()), 2)
+        self.assertEqual(EmailEvent.objects.count(), 0)
+
+        # A forged recipient is not recorded, a forged link is not followed
+        self.assertEqual(self.client.get(open_pixel_url(token[:-1] + 'x')).status_code, status.HTTP_200_OK)
+        forged = click_url(token, 'https://radicle.example/').rsplit('/', 2)[0] + '/https:evil.example/'
+        self.assertEqual(self.client.get(forged).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(len(get_stream()), 2)
+
+    def test_consumer_stores_events_and_rolls_up_counters(self):
+        for recipient in (1, 1, 2):
+            self.client.get(open_pixel_url(tracking_token('newsletter:1', recipient)))
+        self.client.get(click_url(tracking_token('newsletter:1', 2), 'https://radicle.example/'))
+        self.client.get(open_pixel_url(tracking_token('license_email', 'ORD-1')))
+        redelivered = get_stream().read(1, 'test')
+
+        self.assertEqual(process_email_events_task(), {'batches': 1, 'events': 5})
+        self.assertEqual(len(get_stream()), 0)
+
+        self.client.get(open_pixel_url(tracking_token('newsletter:1', 3)))
+        get_stream().entries.update(redelivered)  # acknowledged too late: already stored, not counted again
+        self.assertEqual(process_email_events_task(), {'batches': 1, 'events': 1})
+
+        stats = EmailCampaignStats.objects.get(campaign='newsletter:1')
+        self.assertEqual((stats.opens, stats.unique_opens, stats.clicks, stats.unique_clicks), (4, 3, 1, 1))
+        self.assertEqual(EmailCampaignStats.objects.get(campaign='license_email').unique_opens, 1)
+        self.assertEqual(EmailEvent.objects.get(kind=EmailEvent.Kind.CLICK).url, 'https://radicle.example/')
+
+    def test_newsletter_links_and_pixel_are_tracked_per_recipient(self):
+        subscriber = Subscriber.objects.create(email='reader@example.com')
+        newsletter = Newsletter.objects.create(
+            subject='Tracked', content='<p><a href="https://radicle.example/albums/1">listen</a></p>',
+        )
+        send_newsletter_task(newsletter.newsletter_id)
+
+        message = mail.outbox[0]
+        html = message.alternatives[0][0]
+        self.assertIn('listen (https://radicle.example/albums/1)', message.body)  # text part is left as is
+        self.assertNotIn('-tracking_token-', html)
+        pixel = re.search(r'<img src="([^"]+/track/open/[^"]+)"', html).group(1)
+        link = re.search(r'<a href="([^"]+/track/click/[^"]+)"', html).group(1)
+
+        self.assertEqual(self.client.get(link)['Location'], 'https://radicle.example/albums/1')
+        self.client.get(pixel)
+        process_email_events_task()
+        stats = EmailCampaignStats.objects.get(campaign=f'newsletter:{newsletter.pk}')
+        self.assertEqual((stats.unique_opens, stats.unique_clicks), (1, 1))
+        self.assertEqual(set(EmailEvent.objects.values_list('recipient', flat=True)), {str(subscriber.pk)})
@@ -0,0 +1,273 @@
+import html
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from itertools import count
+
+import redis
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.urls import reverse
+
+from core.ratelimit import redis_client
+from .models import EmailCampaignStats, EmailEvent
+
+logger = logging.getLogger(__name__)
+
+# Email open/click tracking
+# Emails carry a signed token per recipient ([campaign, recipient]) in a 1x1 open pixel and in their
+# links, which point at a redirect that also carries the signed target URL (so it can't be used as an
+# open redirect). The tracking endpoints verify the signatures and append the event to a Redis stream
+# (XADD, capped at TRACKING_STREAM_MAXLEN) - they never touch the database, so a campaign blast costs
+# one Redis round trip per hit. If Redis is unreachable the event is dropped and the endpoint still
+# answers. process_email_events() reads the stream through a consumer group TRACKING_BATCH_SIZE
+# entries at a time, inserts the events with bulk_create and adds them to per-campaign counters
+# (EmailCampaignStats) in the same transaction, then acknowledges and deletes the entries. Entries
+# already stored (a consumer died before acknowledging) are recognized by their stream id.
+#
+# settings.TRACKING_BACKEND = "memory" swaps in an in-process buffer (used by the test suite).
+
+OPEN = EmailEvent.Kind.OPEN
+CLICK = EmailEvent.Kind.CLICK
+
+TOKEN_SALT = 'analytics.tracking'
+LINK_SALT = 'analytics.tracking.link'
+CONSUMER_GROUP = 'email-event-consumers'
+
+# Only absolute http(s) links are tracked; mailto: and relative links are left alone
+TRACKED_HREF = re.compile(r'(<a\b[^>]*?\bhref=")(https?://[^"]+)(")', re.IGNORECASE)
+
+
+# ---------------- tokens and URLs ----------------
+def tracking_enabled():
+    return getattr(settings, 'EMAIL_TRACKING_ENABLED', True)
+
+
+def tracking_token(campaign, recipient):
+    return signing.Signer(salt=TOKEN_SALT).sign_object([campaign, str(recipient)])
+
+
+def read_tracking_token(token):
+    """(campaign, recipient) from a token, or None if it was tampered with"""
+    try:
+        campaign, recipient = signing.Signer(salt=TOKEN_SALT).unsign_object(token)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    return campaign, recipient
+
+
+def link_token(url):
+    return signing.Signer(salt=LINK_SALT).sign_object(url)
+
+
+def read_link_token(token):
+    try:
+        url = signing.Signer(salt=LINK_SALT).unsign_object(token)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    return url if isinstance(url, str) and url.startswith(('http://', 'https://')) else None
+
+
+def _base_url():
+    return getattr(settings, 'PUBLIC_BASE_URL', 'http://localhost:8000').rstrip('/')
+
+
+def open_pixel_url(token):
+    # token may also be a substitution tag, replaced per recipient at send time
+    return _base_url() + reverse('email-open', kwargs={'token': token})
+
+
+def click_url(token, url):
+    return _base_url() + reverse('email-click', kwargs={'token': token, 'link': link_token(url)})
+
+
+def track_links(content, token):
+    """Point the http(s) links of sanitized HTML at the click redirect"""
+    return TRACKED_HREF.sub(
+        lambda match: f'{match.group(1)}{click_url(token, html.unescape(match.group(2)))}{match.group(3)}',
+        content,
+    )
+
+
+# ---------------- event buffer ----------------
+class RedisStream:
+    def __init__(self, url=None, stream=None):
+        self.client = redis_client(url or getattr(settings, 'TRACKING_REDIS_URL', settings.CELERY_BROKER_URL))
+        self.stream = stream or getattr(settings, 'TRACKING_STREAM', 'email-events')
+        self.maxlen = getattr(settings, 'TRACKING_STREAM_MAXLEN', 1_000_000)
+        self.group_ready = False
+
+    def append(self, fields):
+        self.client.xadd(self.stream, fields, maxlen=self.maxlen, approximate=True)
+
+    def _ensure_group(self):
+        if self.group_ready:
+            return
+        try:
+            self.client.xgroup_create(self.stream, CONSUMER_GROUP, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self.group_ready = True
+
+    def read(self, count, consumer):
+        """Up to `count` unacknowledged entries: first those a dead consumer left pending, then new ones"""
+        self._ensure_group()
+        idle = getattr(settings, 'TRACKING_PENDING_IDLE_SECONDS', 300) * 1000
+        _, entries, *_ = self.client.xautoclaim(self.stream, CONSUMER_GROUP, consumer, idle, '0-0', count=count)
+        if not entries:
+            response = self.client.xreadgroup(CONSUMER_GROUP, consumer, {self.stream: '>'}, count=count)
+            entries = response[0][1] if response else []
+        # Claimed entries that were trimmed meanwhile come back empty; they are only acknowledged
+        self.ack([entry_id.decode() for entry_id, fields in entries if not fields])
+        return [
+            (entry_id.decode(), {key.decode(): value.decode() for key, value in fields.items()})
+            for entry_id, fields in entries
+            if fields
+        ]
+
+    def ack(self, entry_ids):
+        if entry_ids:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.xack(self.stream, CONSUMER_GROUP, *entry_ids)
+            pipe.xdel(self.stream, *entry_ids)
+            pipe.execute()
+
+    def __len__(self):
+        return self.client.xlen(self.stream)
+
+
+class MemoryStream:
+    """In-process stand-in for the stream (one process only, so not for production)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}  # entry id -> fields, in insertion order
+        self.sequence = count()
+
+    def append(self, fields):
+        with self.lock:
+            self.entries[f"{int(time.time() * 1000)}-{next(self.sequence)}"] = dict(fields)
+
+    def read(self, count, consumer):
+        with self.lock:
+            return list(self.entries.items())[:count]
+
+    def ack(self, entry_ids):
+        with self.lock:
+            for entry_id in entry_ids:
+                self.entries.pop(entry_id, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def reset(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_memory_stream = MemoryStream()
+_redis_streams = {}
+
+
+def get_stream():
+    if getattr(settings, 'TRACKING_BACKEND', 'redis') == 'memory':
+        return _memory_stream
+    url = getattr(settings, 'TRACKING_REDIS_URL', settings.CELERY_BROKER_URL)
+    stream = _redis_streams.get(url)
+    if stream is None:
+        stream = _redis_streams[url] = RedisStream(url)
+    return stream
+
+
+def reset_memory_stream():
+    _memory_stream.reset()
+
+
+def record_event(kind, campaign, recipient, url=''):
+    """Append one event to the stream; never raises (tracking must not break the pixel or the redirect)"""
+    try:
+        get_stream().append({'k': kind, 'c': campaign, 'r': recipient, 'u': url, 't': f"{time.time():.3f}"})
+    except redis.RedisError as e:
+        logger.warning(f"Email tracking unavailable, dropping {kind} event for {campaign}: {e}")
+
+
+# ---------------- consumer ----------------
+def _parse(entry_id, fields):
+    try:
+        kind = fields['k']
+        if kind not in EmailEvent.Kind.values:
+            raise ValueError(kind)
+        return EmailEvent(
+            stream_id=entry_id,
+            campaign=fields['c'][:100],
+            kind=kind,
+            recipient=fields['r'][:255],
+            url=fields.get('u', '')[:2000],
+            occurred_at=datetime.fromtimestamp(float(fields['t']), tz=dt_timezone.utc),
+        )
+    except (KeyError, ValueError, TypeError):
+        logger.warning(f"Skipping malformed email event {entry_id}: {fields}")
+        return None
+
+
+def store_events(entries):
+    """Insert a batch of stream entries and add them to the campaign counters; returns events stored"""
+    events = [event for event in (_parse(entry_id, fields) for entry_id, fields in entries) if event]
+    if not events:
+        return 0
+    with transaction.atomic():
+        campaigns = sorted({event.campaign for event in events})
+        EmailCampaignStats.objects.bulk_create(
+            [EmailCampaignStats(campaign=campaign) for campaign in campaigns], ignore_conflicts=True,
+        )
+        # Locking the counters serializes consumers per campaign, which keeps the unique counts exact
+        stats = {s.campaign: s for s in EmailCampaignStats.objects.select_for_update().filter(campaign__in=campaigns).order_by('campaign')}
+
+        stored = set(EmailEvent.objects.filter(stream_id__in=[e.stream_id for e in events]).values_list('stream_id', flat=True))
+        events = [event for event in events if event.stream_id not in stored]
+
+        groups = {}
+        for event in events:
+            groups.setdefault((event.campaign, event.kind), []).append(event)
+        for (campaign, kind), group in groups.items():
+            recipients = {event.recipient for event in group}
+            seen = set(
+                EmailEvent.objects.filter(campaign=campaign, kind=kind, recipient__in=recipients)
+                .values_list('recipient', flat=True).distinct()
+            )
+            s = stats[campaign]
+            if kind == OPEN:
+                s.opens += len(group)
+                s.unique_opens += len(recipients - seen)
+            else:
+                s.clicks += len(group)
+                s.unique_clicks += len(recipients - seen)
+            first, last = min(e.occurred_at for e in group), max(e.occurred_at for e in group)
+            s.first_event_at = min(s.first_event_at or first, first)
+            s.last_event_at = max(s.last_event_at or last, last)
+
+        EmailEvent.objects.bulk_create(events, batch_size=getattr(settings, 'TRACKING_BATCH_SIZE', 1000))
+        EmailCampaignStats.objects.bulk_update(
+            stats.values(), ['opens', 'unique_opens', 'clicks', 'unique_clicks', 'first_event_at', 'last_event_at'],
+        )
+    return len(events)
+
+
+def process_email_events(consumer='worker', max_batches=None):
+    """Drain the stream in batches (at most `max_batches` per run); returns {'batches', 'events'}"""
+    stream = get_stream()
+    size = getattr(settings, 'TRACKING_BATCH_SIZE', 1000)
+    max_batches = max_batches or getattr(settings, 'TRACKING_MAX_BATCHES', 50)
+    result = {'batches': 0, 'events': 0}
+    while result['batches'] < max_batches:
+        entries = stream.read(size, consumer)
+        if not entries:
+            break
+        result['events'] += store_events(entries)
+        result['batches'] += 1
+        stream.ack([entry_id for entry_id, _ in entries])
+    return result
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import SalesTimeSeriesView, email_click, email_open
+
+urlpatterns = [
+    path('analytics/sales/<str:dimension>/', SalesTimeSeriesView.as_view(), name='analytics-sales'),
+    path('track/open/<str:token>/', email_open, name='email-open'),
+    path('track/click/<str:token>/<str:link>/', email_click, name='email-click'),
+]
@@ -0,0 +1,74 @@
+import base64
+
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .services import AnalyticsError, sales_time_series
+from .tracking import CLICK, OPEN, read_link_token, read_tracking_token, record_event
+
+TRANSPARENT_GIF = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+
+class SalesTimeSeriesView(APIView):
+    """
+    GET /api/v1/analytics/sales/<dimension>/?interval=month&start=2025-01-01&end=2025-12-31&key=<id>
+
+    Licenses sold and revenue per track, license type, file format or provider.
+    Served from the daily rollup table only, so response time doesn't grow with order history.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, dimension):
+        params = request.query_params
+        dates = {}
+        for param in ('start', 'end'):
+            value = params.get(param)
+            dates[param] = parse_date(value) if value else None
+            if value and dates[param] is None:
+                return Response(
+                    {param: ['Enter a valid date in YYYY-MM-DD format.']},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            results = sales_time_series(
+                dimension,
+                interval=params.get('interval', 'day'),
+                start=dates['start'],
+                end=dates['end'],
+                key=params.get('key'),
+            )
+        except AnalyticsError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'dimension': dimension,
+            'interval': params.get('interval', 'day'),
+            'results': results,
+        })
+
+
+# The tracking endpoints are plain Django views: no authentication, throttling or content negotiation,
+# and no database access - verifying the signatures and one append to the event stream is all they do.
+def email_open(request, token):
+    """GET /api/v1/track/open/<token>/ - 1x1 pixel; records an open for a valid token"""
+    recipient = read_tracking_token(token)
+    if recipient:
+        record_event(OPEN, *recipient)
+    response = HttpResponse(TRANSPARENT_GIF, content_type='image/gif')
+    response['Cache-Control'] = 'no-store, max-age=0'
+    return response
+
+
+def email_click(request, token, link):
+    """GET /api/v1/track/click/<token>/<link>/ - redirects to the signed link, recording a click"""
+    url = read_link_token(link)
+    if url is None:
+        raise Http404("Unknown link")
+    recipient = read_tracking_token(token)
+    if recipient:
+        record_event(CLICK, *recipient, url=url)
+    return HttpResponseRedirect(url)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactsubmission',
+            name='attachment_content_type',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='contactsubmission',
+            name='attachment_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='contactsubmission',
+            name='attachment_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -15,6 +15,10 @@ class ContactSubmission(models.Model):
     ip_address = models.GenericIPAddressField()
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
     attachment = models.FileField(upload_to='contact_attachments/', blank=True, null=True)
+    # Upload metadata kept for the email task, which only gets the submission id
+    attachment_name = models.CharField(max_length=255, blank=True, default='')
+    attachment_content_type = models.CharField(max_length=100, blank=True, default='')
+    attachment_size = models.PositiveBigIntegerField(blank=True, null=True)
 
     def __str__(self):
         return f"{self.email} - {self.created_at}" 
\ No newline at end of file
@@ -1,8 +1,8 @@
 from celery import shared_task
-from django.core.files.base import ContentFile
 from django.conf import settings
 from .models import ContactSubmission
 from core.email_service import EmailService
+from .utils.attachments import stored_file_attachment
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,16 +20,13 @@ def send_contact_emails(self, submission_id, payload):
         return
 
     try:
-        # Prepare attachment if present
+        # Prepare attachment if present (read from storage in chunks; the encoded body is held in memory)
         attachments = []
         if submission.attachment:
-            submission.attachment.open('rb')
-            content = submission.attachment.read()
-            submission.attachment.close()
-            filename = submission.attachment.name.split('/')[-1]
-            # Get content_type properly
-            content_type = submission.attachment.file.content_type if hasattr(submission.attachment.file, 'content_type') else 'application/octet-stream'
-            attachments.append((filename, content, content_type))   
+            filename = submission.attachment_name or submission.attachment.name.split('/')[-1]
+            attachments.append(stored_file_attachment(
+                submission.attachment, filename, submission.attachment_content_type,
+            ))
 
         # Send email to host with attachment
         EmailService.send_transactional_email(
@@ -1,3 +1,223 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.ratelimit import TOKEN_BUCKET, RateLimiter, parse_rate, reset_memory_backend
+
+from .models import ContactSubmission
+from .utils.recaptcha import averify_recaptcha, verified_cache, verify_recaptcha
+
+
+class StubRecaptchaServer:
+    """Local siteverify stand-in: accepts the token 'good', optionally answering after `delay` seconds"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+                stub.requests.append(form)
+                time.sleep(stub.delay)
+                if form.get('response') == ['good']:
+                    body = {'success': True}
+                else:
+                    body = {'success': False, 'error-codes': ['invalid-input-response']}
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out first
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/siteverify"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        reset_memory_backend()
+        patcher = mock.patch('core.ratelimit.time.time', return_value=3600 * 1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/hour'), (5, 3600))
+        self.assertEqual(parse_rate('10/15min'), (10, 900))
+        with self.assertRaises(ValueError):
+            parse_rate('5/fortnight')
+
+    def test_sliding_window_weights_previous_window(self):
+        limiter = RateLimiter('test', '4/min')
+        results = [limiter.hit('ip') for _ in range(5)]
+        self.assertEqual([r.allowed for r in results], [True, True, True, True, False])
+        self.assertEqual(results[3].remaining, 0)
+        self.assertAlmostEqual(results[4].retry_after, 60)
+
+        # Half way through the next window half of the previous 4 still count
+        self.clock.return_value += 90
+        self.assertEqual([limiter.hit('ip').allowed for _ in range(3)], [True, True, False])
+        # Budgets are per identity
+        self.assertTrue(limiter.hit('other-ip').allowed)
+
+    def test_token_bucket_refills_evenly(self):
+        limiter = RateLimiter('test', '6/min', TOKEN_BUCKET)
+        self.assertTrue(all(limiter.hit('ip').allowed for _ in range(6)))
+        denied = limiter.hit('ip')
+        self.assertFalse(denied.allowed)
+        self.assertAlmostEqual(denied.retry_after, 10)
+
+        self.clock.return_value += 10
+        self.assertTrue(limiter.hit('ip').allowed)
+        self.assertFalse(limiter.hit('ip').allowed)
+
+    @override_settings(RATE_LIMIT_BACKEND='redis', RATE_LIMIT_REDIS_URL='redis://127.0.0.1:1/0')
+    def test_fails_open_without_redis(self):
+        result = RateLimiter('test', '1/min').hit('ip')
+        self.assertTrue(result.allowed)
+
+
+class ContactThrottleTests(APITestCase):
+    def setUp(self):
+        reset_memory_backend()
+
+    @override_settings(RATE_LIMITS={'contact': {'rate': '2/hour'}})
+    def test_contact_form_is_throttled_per_ip(self):
+        url = reverse('contact')
+        data = {'name': 'Jo', 'servicesRequired': '{}'}
+        for _ in range(2):
+            # Missing fields, but the request still counts
+            self.assertEqual(self.client.post(url, data, REMOTE_ADDR='10.0.0.1').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, data, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.post(url, data, REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RATE_LIMITS={'newsletter_subscribe': {'rate': '1/hour'}})
+    def test_newsletter_subscribe_is_throttled(self):
+        url = reverse('newsletter-subscribe')
+        self.assertNotEqual(self.client.post(url, {}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.post(url, {}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class RecaptchaTests(SimpleTestCase):
+    def setUp(self):
+        verified_cache().clear()
+        self.stub = StubRecaptchaServer()
+        self.addCleanup(self.stub.close)
+        self.settings_override = override_settings(
+            RECAPTCHA_SECRET_KEY='secret', RECAPTCHA_VERIFY_URL=self.stub.url, RECAPTCHA_TIMEOUT=(0.5, 0.3),
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_verification_and_cache(self):
+        self.assertEqual(verify_recaptcha('bad', '10.0.0.1'), (False, 'invalid-input-response'))
+        self.assertEqual(verify_recaptcha('good', '10.0.0.1'), (True, None))
+        self.assertEqual(self.stub.requests[-1], {'secret': ['secret'], 'response': ['good'], 'remoteip': ['10.0.0.1']})
+        # A retried submission with the same token is answered from the cache
+        self.assertEqual(verify_recaptcha('good'), (True, None))
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_slow_verification_times_out(self):
+        self.stub.delay = 1.0
+        started = time.monotonic()
+        success, error = verify_recaptcha('good')
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual((success, error), (False, 'reCAPTCHA verification timed out'))
+
+    def test_async_variant(self):
+        self.assertEqual(async_to_sync(averify_recaptcha)('good'), (True, None))
+
+    @override_settings(RECAPTCHA_SECRET_KEY='')
+    def test_not_configured(self):
+        self.assertEqual(verify_recaptcha('good'), (False, 'reCAPTCHA not configured'))
+        self.assertEqual(self.stub.requests, [])
+
+
+class ContactAttachmentTests(APITestCase):
+    def setUp(self):
+        reset_memory_backend()
+        patcher = mock.patch('contact.views.verify_recaptcha', return_value=(True, None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, attachment):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        data = {
+            'name': 'Jo', 'email': 'jo@example.com', 'servicesRequired': '{"mixing": true}', 'recaptchaToken': 'token',
+            'file': SimpleUploadedFile('demo mix.wav', attachment, content_type='audio/wav'),
+        }
+        return self.client.post(reverse('contact'), data, format='multipart')
+
+    @override_settings(CONTACT_RECEIVER_EMAIL='host@example.com', FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_large_upload_is_queued_by_reference_and_attached(self):
+        from django.core import mail
+        from .tasks import send_contact_emails
+
+        content = bytes(range(256)) * 200  # 51KB, above the in-memory threshold
+        with mock.patch('contact.views.send_contact_emails.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.post(content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        submission = ContactSubmission.objects.get()
+        self.assertEqual(
+            (submission.attachment_name, submission.attachment_content_type, submission.attachment_size),
+            ('demo mix.wav', 'audio/wav', len(content)),
+        )
+        delay.assert_called_once()
+        self.assertEqual(delay.call_args.args[0], str(submission.id))
+
+        send_contact_emails(str(submission.id), delay.call_args.args[1])
+        part = mail.outbox[0].attachments[0]
+        self.assertEqual((part.get_filename(), part.get_content_type()), ('demo mix.wav', 'audio/wav'))
+        self.assertEqual(part.get_payload(decode=True), content)
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, ContactSubmission.Status.SUCCESS)
+        self.assertFalse(submission.attachment.storage.exists(submission.attachment.name))
+
+    @override_settings(CONTACT_ATTACHMENT_MAX_SIZE=1024)
+    def test_oversized_attachment_is_rejected(self):
+        self.assertEqual(self.post(b'x' * 2048).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ContactSubmission.objects.exists())
+
+    def test_chunked_encoding_matches_whole_file(self):
+        import base64
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from .utils.attachments import stored_file_attachment
+
+        content = bytes(range(256)) * 41
+        name = default_storage.save('contact_attachments/chunked.bin', ContentFile(content))
+        self.addCleanup(default_storage.delete, name)
+        field_file = ContactSubmission(attachment=name).attachment
+        part = stored_file_attachment(field_file, 'chunked.bin', None, chunk_size=57 * 3)
+        self.assertEqual(part.get_payload(decode=True), content)
+        self.assertEqual(part.get_payload(), base64.encodebytes(content).decode('ascii'))
+        self.assertEqual(part.get_content_type(), 'application/octet-stream')
@@ -0,0 +1,25 @@
+import base64
+from email.mime.base import MIMEBase
+
+# Raw bytes per read: a multiple of 57 (one 76-character base64 line), so the encoded chunks join
+# into a continuous, correctly wrapped body
+CHUNK_SIZE = 57 * 16 * 1024  # ~912KB
+
+
+def stored_file_attachment(field_file, filename, content_type=None, chunk_size=CHUNK_SIZE):
+    """
+    MIME attachment for a stored file, base64-encoded as it is read chunk by chunk, so at most one
+    raw chunk is in memory. The encoded body itself is built whole: Django's mail stack serializes
+    the complete message (as_bytes() for SMTP, a JSON body for SendGrid), so a payload can't be
+    streamed to the backend.
+    """
+    maintype, _, subtype = (content_type or 'application/octet-stream').partition('/')
+    part = MIMEBase(maintype, subtype or 'octet-stream')
+    encoded = []
+    with field_file.open('rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            encoded.append(base64.encodebytes(chunk).decode('ascii'))
+    part.set_payload(''.join(encoded))
+    part['Content-Transfer-Encoding'] = 'base64'
+    part.add_header('Content-Disposition', 'attachment', filename=filename)
+    return part
@@ -1,7 +1,66 @@
-import urllib.parse
-import urllib.request
-import json
+import hashlib
+import logging
+import threading
+
+import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# reCAPTCHA v2 verification
+# One pooled session per process keeps the TLS connection to Google alive between submissions, and
+# tight connect/read timeouts (settings.RECAPTCHA_TIMEOUT) bound how long a slow siteverify can hold
+# a worker. Successful verifications are cached by token hash for a short TTL: Google only accepts a
+# token once, so a client retrying the same submission would otherwise fail with timeout-or-duplicate.
+# The cache is settings.RECAPTCHA_CACHE (the shared Redis alias), so the retry may land on any worker;
+# if it is unreachable, verification simply goes to Google.
+
+DEFAULT_VERIFY_URL = 'https://www.google.com/recaptcha/api/siteverify'
+CACHE_PREFIX = 'recaptcha:verified:'
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                pool_size = getattr(settings, 'RECAPTCHA_POOL_SIZE', 10)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def _cache_key(token):
+    return CACHE_PREFIX + hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def verified_cache():
+    return caches[getattr(settings, 'RECAPTCHA_CACHE', 'default')]
+
+
+def _is_verified(token):
+    try:
+        return bool(verified_cache().get(_cache_key(token)))
+    except Exception as e:
+        logger.warning(f"reCAPTCHA cache unavailable: {str(e)}")
+        return False
+
+
+def _remember_verified(token):
+    try:
+        verified_cache().set(_cache_key(token), True, getattr(settings, 'RECAPTCHA_CACHE_SECONDS', 120))
+    except Exception as e:
+        logger.warning(f"reCAPTCHA cache unavailable: {str(e)}")
+
 
 def verify_recaptcha(token, remote_ip=None):
     """
@@ -11,6 +70,8 @@ def verify_recaptcha(token, remote_ip=None):
     secret_key = settings.RECAPTCHA_SECRET_KEY
     if not secret_key:
         return False, "reCAPTCHA not configured"
+    if _is_verified(token):
+        return True, None
 
     data = {
         'secret': secret_key,
@@ -20,14 +81,24 @@ def verify_recaptcha(token, remote_ip=None):
         data['remoteip'] = remote_ip
 
     try:
-        encoded_data = urllib.parse.urlencode(data).encode('utf-8')
-        req = urllib.request.Request(
-            'https://www.google.com/recaptcha/api/siteverify',
-            data=encoded_data,
-            headers={'Content-Type': 'application/x-www-form-urlencoded'}
+        response = get_session().post(
+            getattr(settings, 'RECAPTCHA_VERIFY_URL', DEFAULT_VERIFY_URL),
+            data=data,
+            timeout=getattr(settings, 'RECAPTCHA_TIMEOUT', (1.0, 3.0)),
         )
-        with urllib.request.urlopen(req, timeout=10) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            return result.get('success', False), None
-    except Exception as e:
-        return False, str(e)
\ No newline at end of file
+        response.raise_for_status()
+        result = response.json()
+    except requests.Timeout:
+        logger.warning("reCAPTCHA verification timed out")
+        return False, "reCAPTCHA verification timed out"
+    except (requests.RequestException, ValueError) as e:
+        return False, str(e)
+
+    if not result.get('success', False):
+        return False, ', '.join(result.get('error-codes', [])) or None
+    _remember_verified(token)
+    return True, None
+
+
+# For async (ASGI) views: the blocking call runs in the thread pool, off the event loop
+averify_recaptcha = sync_to_async(verify_recaptcha, thread_sensitive=False)
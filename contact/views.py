@@ -3,9 +3,10 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
+from django.db import transaction
 from .models import ContactSubmission
 from .utils.recaptcha import verify_recaptcha
-from .utils.rate_limiter import check_rate_limit
+from core.throttles import ScopedRateLimitThrottle
 from .tasks import send_contact_emails
 import logging
 
@@ -14,18 +15,13 @@ logger = logging.getLogger(__name__)
 class ContactView(APIView):
     permission_classes = []  # Allow any
     parser_classes = [MultiPartParser, FormParser]
+    # Rate limited per client before anything is parsed (settings.RATE_LIMITS["contact"])
+    throttle_classes = [ScopedRateLimitThrottle]
+    throttle_scope = 'contact'
 
     def post(self, request):
         # Get client IP
         ip_address = self.get_client_ip(request)
-        
-        # Rate limiting check
-        allowed, remaining, reset_time = check_rate_limit(ip_address)
-        if not allowed:
-            return Response(
-                {'error': 'Rate limit exceeded', 'reset_time': reset_time},
-                status=status.HTTP_429_TOO_MANY_REQUESTS
-            )
 
         # Get raw data directly (no serializer)
         data = request.data
@@ -54,6 +50,13 @@ class ContactView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Large uploads are already on disk (TemporaryUploadedFile); reject them before any further work
+        if attachment and attachment.size > settings.CONTACT_ATTACHMENT_MAX_SIZE:
+            return Response(
+                {'error': f'Attachment exceeds {settings.CONTACT_ATTACHMENT_MAX_SIZE // (1024 * 1024)}MB'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         # Verify reCAPTCHA
         recaptcha_success, recaptcha_error = verify_recaptcha(recaptcha_token, ip_address)
         if not recaptcha_success:
@@ -62,11 +65,15 @@ class ContactView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create submission record
+        # Create submission record; the attachment is copied to storage in chunks and the task
+        # only receives the submission id
         submission = ContactSubmission.objects.create(
             email=email,
             ip_address=ip_address,
-            attachment=attachment
+            attachment=attachment,
+            attachment_name=attachment.name[:255] if attachment else '',
+            attachment_content_type=(attachment.content_type or '')[:100] if attachment else '',
+            attachment_size=attachment.size if attachment else None,
         )
 
         # Prepare payload for Celery
@@ -80,8 +87,9 @@ class ContactView(APIView):
             'additional_info': additional_info
         }
 
-        # Enqueue email task
-        send_contact_emails.delay(str(submission.id), payload)
+        # Enqueue email task once the submission (and its file) is committed
+        submission_id = str(submission.id)
+        transaction.on_commit(lambda: send_contact_emails.delay(submission_id, payload))
 
         return Response(
             {'message': 'Your message has been received. We will get back to you soon.'},
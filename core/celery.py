@@ -21,5 +21,26 @@ app.conf.beat_schedule = {
     "purge-expired-license-downloads": {
         "task": "licenses.tasks.purge_expired_license_downloads",
         "schedule": crontab(minute=0, hour="*/6"),
-    }
+    },
+    "update-sales-rollups": {
+        "task": "analytics.tasks.update_sales_rollups_task",
+        "schedule": crontab(minute="*/15"),
+    },
+    "update-similar-tracks": {
+        "task": "music.tasks.update_similar_tracks_task",
+        "schedule": crontab(minute="5-59/15"),
+    },
+    "rebuild-similar-tracks": {
+        "task": "music.tasks.update_similar_tracks_task",
+        "schedule": crontab(minute=30, hour=3),
+        "kwargs": {"full": True},
+    },
+    "refresh-newsletter-segments": {
+        "task": "newsletter.tasks.refresh_segments_task",
+        "schedule": crontab(minute="*/15"),
+    },
+    "process-email-events": {
+        "task": "analytics.tasks.process_email_events_task",
+        "schedule": crontab(),
+    },
 }
\ No newline at end of file
@@ -0,0 +1,103 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker for outbound providers (HybridEmailBackend -> SendGrid)
+#
+#   closed     calls go through; failures are counted over a window of `failure_window` seconds
+#   open       `failure_threshold` failures within the window open the breaker: calls are refused (the
+#              caller routes straight to its fallback) for `recovery_timeout` seconds
+#   half_open  after that, one call per `recovery_timeout` is let through as a probe (cache.add is the
+#              lock); a success closes the breaker, a failure opens it again
+# State lives in the settings.CIRCUIT_BREAKER_CACHE cache, so every worker sharing that cache sees the
+# same breaker. If the cache itself is unreachable the breaker stays closed - it must not stop mail.
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, failure_window=60, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.recovery_timeout = recovery_timeout
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'CIRCUIT_BREAKER_CACHE', 'default')]
+
+    def _key(self, part):
+        return f"circuit:{self.name}:{part}"
+
+    def allow_request(self):
+        """True if the call should go to the provider (closed, or this caller holds the half-open probe)"""
+        try:
+            opened_until = self.cache.get(self._key('opened_until'))
+            if opened_until is None:
+                return True
+            if time.time() < opened_until:
+                return False
+            return self.cache.add(self._key('probe'), True, self.recovery_timeout)
+        except Exception as e:
+            logger.warning(f"Circuit breaker {self.name} unavailable, allowing call: {str(e)}")
+            return True
+
+    def record_success(self):
+        try:
+            keys = [self._key('failures'), self._key('opened_until')]
+            if self.cache.get_many(keys):
+                self.cache.delete_many(keys + [self._key('probe')])
+                logger.info(f"Circuit breaker {self.name} closed")
+        except Exception as e:
+            logger.warning(f"Circuit breaker {self.name} unavailable: {str(e)}")
+
+    def record_failure(self):
+        try:
+            if self.cache.get(self._key('opened_until')) is not None:
+                self._trip()  # the half-open probe failed
+                return
+            key = self._key('failures')
+            if self.cache.add(key, 1, self.failure_window):
+                failures = 1
+            else:
+                try:
+                    failures = self.cache.incr(key)
+                except ValueError:  # expired in between
+                    self.cache.set(key, 1, self.failure_window)
+                    failures = 1
+            if failures >= self.failure_threshold:
+                self._trip()
+        except Exception as e:
+            logger.warning(f"Circuit breaker {self.name} unavailable: {str(e)}")
+
+    def _trip(self):
+        self.cache.set(self._key('opened_until'), time.time() + self.recovery_timeout, None)
+        self.cache.delete_many([self._key('failures'), self._key('probe')])
+        logger.warning(f"Circuit breaker {self.name} opened for {self.recovery_timeout}s")
+
+    def status(self):
+        try:
+            values = self.cache.get_many([self._key('failures'), self._key('opened_until')])
+        except Exception:
+            values = {}
+        opened_until = values.get(self._key('opened_until'))
+        if opened_until is None:
+            state = CLOSED
+        else:
+            state = OPEN if time.time() < opened_until else HALF_OPEN
+        return {
+            'name': self.name,
+            'state': state,
+            'failures': values.get(self._key('failures'), 0),
+            'opened_until': opened_until,
+        }
+
+    @property
+    def state(self):
+        return self.status()['state']
@@ -1,20 +1,167 @@
+import base64
 import logging
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.base import MIMEBase
+from django.core.mail.backends.base import BaseEmailBackend
 from django.core.mail.backends.smtp import EmailBackend
 from django.core.mail import get_connection
 from django.conf import settings
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-from django.core.mail.message import EmailMessage
+import requests
+from requests.adapters import HTTPAdapter
+from sendgrid.helpers.mail import (
+    Attachment, Disposition, FileContent, FileName, FileType, Mail, Personalization, Substitution, To,
+)
+from django.core.mail.message import EmailMessage, EmailMultiAlternatives
 from django.core.exceptions import ImproperlyConfigured
 
+from .circuitbreaker import CircuitBreaker
+
 logger = logging.getLogger(__name__)
 
+# SendGrid accepts at most 1000 personalizations (recipients with their own substitutions) per API call
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
+# SendGrid API client
+# sendgrid's own SendGridAPIClient goes through urllib and opens a new TLS connection per request, so
+# the backend posts the Mail payload itself over one keep-alive requests session per process. Its
+# pool and a process-wide semaphore both hold SENDGRID_MAX_CONCURRENCY, the cap on sends in flight.
+# Every send's latency is recorded in sendgrid_metrics.
+
+_session = None
+_send_slots = None
+_client_lock = threading.Lock()
+
+
+def sendgrid_max_concurrency():
+    return max(1, getattr(settings, 'SENDGRID_MAX_CONCURRENCY', 8))
+
+
+def sendgrid_session():
+    global _session
+    if _session is None:
+        with _client_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=sendgrid_max_concurrency(), max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def sendgrid_send_slots():
+    global _send_slots
+    if _send_slots is None:
+        with _client_lock:
+            if _send_slots is None:
+                _send_slots = threading.BoundedSemaphore(sendgrid_max_concurrency())
+    return _send_slots
+
+
+def reset_sendgrid_client():
+    """Drop the pooled session and send slots (after a fork, or when the settings change)"""
+    global _session, _send_slots, _client_lock
+    _session, _send_slots = None, None
+    _client_lock = threading.Lock()
+
+
+# A forked worker must not share the parent's sockets
+os.register_at_fork(after_in_child=reset_sendgrid_client)
+
+
+class SendLatencyMetrics:
+    """Process-wide count, failures and latency of calls to one provider"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.count += 1
+            self.failures += 0 if ok else 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'failures': self.failures,
+                'avg_ms': round(self.total_seconds / self.count * 1000, 1) if self.count else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 1),
+            }
+
+
+sendgrid_metrics = SendLatencyMetrics()
+smtp_metrics = SendLatencyMetrics()
+
 
-class SendGridBackend:
+def sendgrid_attachment(attachment):
+    """SendGrid Attachment for a Django attachment (MIMEBase part or (filename, content, mimetype))"""
+    if isinstance(attachment, MIMEBase):
+        filename = attachment.get_filename()
+        content_type = attachment.get_content_type()
+        if attachment.get('Content-Transfer-Encoding') == 'base64':
+            content = ''.join(attachment.get_payload().split())  # already encoded, just unwrap the lines
+        else:
+            content = base64.b64encode(attachment.get_payload(decode=True)).decode('ascii')
+    else:
+        filename, content, content_type = attachment
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        content = base64.b64encode(content).decode('ascii')
+    return Attachment(
+        FileContent(content), FileName(filename), FileType(content_type or 'application/octet-stream'), Disposition('attachment'),
+    )
+
+
+def personalization_batches(recipients, size=SENDGRID_MAX_PERSONALIZATIONS):
+    for start in range(0, len(recipients), size):
+        yield recipients[start:start + size]
+
+
+def personalized_messages(subject, html_content, recipients, plain_content=None, from_email=None):
+    """
+    One message per (email, {tag: value}) recipient with the tags replaced locally - what SendGrid
+    does server-side for personalizations, for backends that send message by message.
+    """
+    messages = []
+    for email, substitutions in recipients:
+        html, plain = html_content, plain_content
+        for tag, value in substitutions.items():
+            html = html.replace(tag, value) if html else html
+            plain = plain.replace(tag, value) if plain else plain
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=plain or html,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+        )
+        if html:
+            message.attach_alternative(html, "text/html")
+        messages.append(message)
+    return messages
+
+
+class SendGridBackend(BaseEmailBackend):
     """SendGrid email backend for production use."""
+    personalization_batch_size = SENDGRID_MAX_PERSONALIZATIONS
     
     def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
         self.api_key = getattr(settings, 'SENDGRID_API_KEY', None)
+        self.host = getattr(settings, 'SENDGRID_API_HOST', 'https://api.sendgrid.com')
         self.from_email = getattr(settings, 'SENDGRID_FROM_EMAIL', settings.DEFAULT_FROM_EMAIL)
         self.fail_silently = fail_silently
         
@@ -24,78 +171,168 @@ class SendGridBackend:
     def send_messages(self, email_messages):
         """
         Send email messages via SendGrid API.
+        Up to SENDGRID_MAX_CONCURRENCY messages are in flight at once, over the shared pooled session.
         Returns number of successfully sent messages.
         """
         if not email_messages:
             return 0
+
+        workers = min(len(email_messages), sendgrid_max_concurrency())
+        if workers == 1:
+            return sum(self._send_message(message) for message in email_messages)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(self._send_message, email_messages))
+
+    def _send_message(self, message):
+        try:
+            # Extract HTML content
+            html_content = getattr(message, 'html_body', None)
+            if not html_content and hasattr(message, 'alternatives'):
+                for content, mimetype in message.alternatives:
+                    if mimetype == 'text/html':
+                        html_content = content
+                        break
+
+            # Create SendGrid message
+            sg_message = Mail(
+                from_email=self.from_email,
+                to_emails=message.to,
+                subject=message.subject,
+                html_content=html_content or message.body,
+            )
             
-        sent_count = 0
-        
-        for message in email_messages:
+            # Add CC and BCC if present
+            if message.cc:
+                sg_message.cc = message.cc
+            if message.bcc:
+                sg_message.bcc = message.bcc
+            
+            # Add reply-to if present
+            if message.reply_to:
+                # SendGrid helper expects a single email or ReplyTo object
+                # Django uses a list for reply_to
+                if isinstance(message.reply_to, list) and message.reply_to:
+                    sg_message.reply_to = message.reply_to[0]
+                else:
+                    sg_message.reply_to = message.reply_to
+
+            for attachment in message.attachments:
+                sg_message.add_attachment(sendgrid_attachment(attachment))
+            
+            # Send via SendGrid API
+            response = self.post(sg_message)
+            
+            if response.status_code in [200, 202]:
+                logger.info(f"SendGrid sent email to {message.to}")
+                return 1
+            logger.error(f"SendGrid failed: {response.status_code}")
+                
+        except Exception as e:
+            logger.error(f"SendGrid error sending to {message.to}: {str(e)}")
+            if not self.fail_silently:
+                raise
+        return 0
+
+    def post(self, sg_message):
+        """POST a Mail to /v3/mail/send over the pooled session, recording its latency"""
+        with sendgrid_send_slots():
+            started = time.monotonic()
+            ok = False
             try:
-                # Extract HTML content
-                html_content = getattr(message, 'html_body', None)
-                if not html_content and hasattr(message, 'alternatives'):
-                    for content, mimetype in message.alternatives:
-                        if mimetype == 'text/html':
-                            html_content = content
-                            break
-
-                # Create SendGrid message
-                sg_message = Mail(
-                    from_email=self.from_email,
-                    to_emails=message.to,
-                    subject=message.subject,
-                    html_content=html_content or message.body,
+                response = sendgrid_session().post(
+                    f"{self.host}/v3/mail/send",
+                    json=sg_message.get(),
+                    headers={'Authorization': f'Bearer {self.api_key}'},
+                    timeout=getattr(settings, 'SENDGRID_TIMEOUT', (3.05, 10)),
                 )
-                
-                # Add CC and BCC if present
-                if message.cc:
-                    sg_message.cc = message.cc
-                if message.bcc:
-                    sg_message.bcc = message.bcc
-                
-                # Add reply-to if present
-                if message.reply_to:
-                    # SendGrid helper expects a single email or ReplyTo object
-                    # Django uses a list for reply_to
-                    if isinstance(message.reply_to, list) and message.reply_to:
-                        sg_message.reply_to = message.reply_to[0]
-                    else:
-                        sg_message.reply_to = message.reply_to
-                
-                # Send via SendGrid API
-                sg = SendGridAPIClient(self.api_key)
-                response = sg.send(sg_message)
-                
-                if response.status_code in [200, 202]:
-                    sent_count += 1
-                    logger.info(f"SendGrid sent email to {message.to}")
-                else:
-                    logger.error(f"SendGrid failed: {response.status_code}")
-                    
+                response.raise_for_status()
+                ok = True
+                return response
+            finally:
+                sendgrid_metrics.record(time.monotonic() - started, ok)
+
+    def send_personalized(self, subject, html_content, recipients, plain_content=None):
+        """
+        Send one message to many recipients as SendGrid personalizations, each with its own
+        substitutions: `recipients` is a list of (email, {tag: value}), packed up to
+        SENDGRID_MAX_PERSONALIZATIONS per API call. Returns the emails of the recipients accepted.
+        """
+        accepted = []
+
+        for batch in personalization_batches(recipients, self.personalization_batch_size):
+            sg_message = Mail(
+                from_email=self.from_email,
+                subject=subject,
+                html_content=html_content,
+                plain_text_content=plain_content,
+            )
+            for email, substitutions in batch:
+                personalization = Personalization()
+                personalization.add_to(To(email))
+                for tag, value in substitutions.items():
+                    personalization.add_substitution(Substitution(tag, value))
+                sg_message.add_personalization(personalization, index=len(sg_message.personalizations or []))
+
+            try:
+                response = self.post(sg_message)
             except Exception as e:
-                logger.error(f"SendGrid error sending to {message.to}: {str(e)}")
+                logger.error(f"SendGrid error sending to {len(batch)} recipients: {str(e)}")
                 if not self.fail_silently:
                     raise
-        
-        return sent_count
+                continue
+
+            if response.status_code in [200, 202]:
+                accepted.extend(email for email, _ in batch)
+                logger.info(f"SendGrid sent email to {len(batch)} recipients")
+            else:
+                logger.error(f"SendGrid failed: {response.status_code}")
+
+        return accepted
+
+
+def sendgrid_breaker():
+    return CircuitBreaker(
+        'sendgrid',
+        failure_threshold=getattr(settings, 'SENDGRID_BREAKER_FAILURE_THRESHOLD', 5),
+        failure_window=getattr(settings, 'SENDGRID_BREAKER_FAILURE_WINDOW', 60),
+        recovery_timeout=getattr(settings, 'SENDGRID_BREAKER_RECOVERY_TIMEOUT', 30),
+    )
+
+
+def is_provider_failure(exc):
+    """True for errors that say SendGrid is unhealthy, not that it rejected this particular message"""
+    if not isinstance(exc, requests.RequestException):
+        return False
+    status = getattr(exc.response, 'status_code', None)
+    return status is None or status >= 500 or status == 429
+
+
+def is_message_rejection(exc):
+    """True for errors that refuse one message (recipient, sender, content), not ones that say the transport is down"""
+    if isinstance(exc, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return True
+    return isinstance(exc, requests.RequestException) and not is_provider_failure(exc)
 
 
-class HybridEmailBackend:
+class HybridEmailBackend(BaseEmailBackend):
     """
     Hybrid email backend that tries SendGridBackend first, falls back to SMTP.
+    SendGrid calls go through a circuit breaker (core/circuitbreaker.py): while it is open, mail is
+    routed straight to SMTP instead of waiting on SendGrid to fail for every message.
     """
     
     def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
         self.fail_silently = fail_silently
         self.sendgrid_backend = None
         self.smtp_backend = None
+        self.breaker = sendgrid_breaker()
         
         # Initialize SendGrid backend if API key is available
         if getattr(settings, 'SENDGRID_API_KEY', None):
             try:
-                self.sendgrid_backend = SendGridBackend(fail_silently=True, **kwargs)
+                # Not fail_silently: the breaker needs to see why a send failed
+                self.sendgrid_backend = SendGridBackend(fail_silently=False, **kwargs)
             except ImproperlyConfigured:
                 logger.warning("SendGrid not configured, using SMTP only")
         
@@ -108,12 +345,43 @@ class HybridEmailBackend:
             use_tls=settings.EMAIL_USE_TLS,
             fail_silently=self.fail_silently,  # Respect the fail_silently argument
         )
+
+    @property
+    def personalization_batch_size(self):
+        return self.sendgrid_backend.personalization_batch_size if self.sendgrid_backend else None
+
+    def _send_via_sendgrid(self, send, recipients):
+        """Run one SendGrid call under the breaker; `send` returns True if everything was delivered"""
+        if not self.sendgrid_backend or not self.breaker.allow_request():
+            return False
+        try:
+            delivered = send()
+        except Exception as e:
+            logger.warning(f"SendGrid failed for {recipients}: {str(e)}, falling back to SMTP")
+            if is_provider_failure(e):
+                self.breaker.record_failure()
+            return False
+        if delivered:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        return delivered
+
+    def _send_via_smtp(self, email_messages):
+        started = time.monotonic()
+        ok = False
+        try:
+            sent = self.smtp_backend.send_messages(email_messages) or 0
+            ok = True
+            return sent
+        finally:
+            smtp_metrics.record(time.monotonic() - started, ok)
     
     def send_messages(self, email_messages):
         """
         Try SendGrid first, fall back to SMTP if it fails.
         Attempts to send each message individually via SendGrid, 
-        and falls back to SMTP for any that fail.
+        and falls back to SMTP for any that fail (or all of them while the breaker is open).
         """
         if not email_messages:
             return 0
@@ -121,31 +389,58 @@ class HybridEmailBackend:
         sent_count = 0
         
         for message in email_messages:
-            message_sent = False
-            
             # Try SendGrid first
-            if self.sendgrid_backend:
-                try:
-                    # SendGridBackend.send_messages expects a list
-                    sg_count = self.sendgrid_backend.send_messages([message])
-                    if sg_count == 1:
-                        sent_count += 1
-                        message_sent = True
-                        logger.info(f"Email to {message.to} sent via SendGrid")
-                except Exception as e:
-                    logger.warning(f"SendGrid failed for {message.to}: {str(e)}, falling back to SMTP")
+            # SendGridBackend.send_messages expects a list
+            if self._send_via_sendgrid(lambda: self.sendgrid_backend.send_messages([message]) == 1, message.to):
+                sent_count += 1
+                logger.info(f"Email to {message.to} sent via SendGrid")
+                continue
             
             # Fallback to SMTP if SendGrid failed or wasn't available
-            if not message_sent and self.smtp_backend:
-                try:
-                    # SMTP backend also expects a list
-                    smtp_count = self.smtp_backend.send_messages([message])
-                    if smtp_count == 1:
-                        sent_count += 1
-                        logger.info(f"Email to {message.to} sent via SMTP fallback")
-                except Exception as e:
-                    logger.error(f"SMTP fallback failed for {message.to}: {str(e)}")
-                    if not self.fail_silently:
-                        raise
+            try:
+                # SMTP backend also expects a list
+                smtp_count = self._send_via_smtp([message])
+                if smtp_count == 1:
+                    sent_count += 1
+                    logger.info(f"Email to {message.to} sent via SMTP fallback")
+            except Exception as e:
+                logger.error(f"SMTP fallback failed for {message.to}: {str(e)}")
+                if not self.fail_silently:
+                    raise
         
-        return sent_count
\ No newline at end of file
+        return sent_count
+
+    def send_personalized(self, subject, html_content, recipients, plain_content=None):
+        """
+        Send personalization batches via SendGrid; a batch SendGrid did not accept (or every batch,
+        while the breaker is open) is expanded into individual messages and sent over SMTP one by one.
+        Returns the emails of the recipients accepted, so a partly failed fallback is reported per recipient.
+        """
+        if not self.sendgrid_backend:
+            return self._send_each_via_smtp(personalized_messages(subject, html_content, recipients, plain_content))
+
+        accepted = []
+
+        for batch in personalization_batches(recipients, self.sendgrid_backend.personalization_batch_size):
+            if self._send_via_sendgrid(
+                lambda: len(self.sendgrid_backend.send_personalized(subject, html_content, batch, plain_content)) == len(batch),
+                f"{len(batch)} recipients",
+            ):
+                accepted.extend(email for email, _ in batch)
+                continue
+            accepted.extend(self._send_each_via_smtp(personalized_messages(subject, html_content, batch, plain_content)))
+
+        return accepted
+
+    def _send_each_via_smtp(self, email_messages):
+        accepted = []
+        for message in email_messages:
+            try:
+                if self._send_via_smtp([message]) == 1:
+                    accepted.extend(message.to)
+            except Exception as e:
+                logger.error(f"SMTP fallback failed for {message.to}: {str(e)}")
+                # A refused message fails alone; a dead SMTP server aborts the batch
+                if not self.fail_silently and not is_message_rejection(e):
+                    raise
+        return accepted
@@ -1,7 +1,7 @@
 import logging
-from django.core.mail import get_connection, send_mail
+from django.core.mail import get_connection
 from django.conf import settings
-from .email_backends import SendGridBackend, HybridEmailBackend
+from .email_backends import SendGridBackend, HybridEmailBackend, is_message_rejection, personalized_messages, sendgrid_breaker, sendgrid_metrics, smtp_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -10,28 +10,41 @@ class EmailService:
     """High-level email service with backend selection logic."""
     
     @staticmethod
-    def send_newsletter(subject, message, recipient_list, html_message=None):
+    def send_newsletter(subject, message, recipient_list, html_message=None, substitutions=None, connection=None):
         """
         Send newsletter - optimized for bulk sending.
-        Always tries to use SendGrid first for newsletters.
+        Each recipient gets their own copy; `substitutions` maps an email to {tag: value} pairs
+        (e.g. its unsubscribe link) replaced in that copy. Backends that support it (SendGrid)
+        send the whole list as personalization batches - up to 1000 recipients per API call -
+        others get one message per recipient. Returns the emails of the recipients sent to; a rejected
+        recipient is left out, while a transport error (server unreachable, connection dropped) raises.
         """
         backend_type = 'sendgrid' if getattr(settings, 'SENDGRID_API_KEY', None) else settings.EMAIL_BACKEND_TYPE
         
-        backend = get_connection()
+        backend = connection or get_connection()
+        substitutions = substitutions or {}
+        recipients = [(email, substitutions.get(email, {})) for email in recipient_list]
         
         try:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipient_list,
-                html_message=html_message,
-                connection=backend
-            )
-            logger.info(f"Newsletter sent to {len(recipient_list)} recipients via {backend_type}")
+            if hasattr(backend, 'send_personalized'):
+                accepted = backend.send_personalized(subject, html_message, recipients, plain_content=message or None)
+            else:
+                # Message by message, so each recipient gets its own outcome
+                accepted = []
+                for email_message in personalized_messages(subject, html_message, recipients, plain_content=message or None):
+                    try:
+                        if backend.send_messages([email_message]):
+                            accepted.append(email_message.to[0])
+                    except Exception as e:
+                        # A refused recipient is reported as unsent; transport errors abort the send
+                        if not is_message_rejection(e):
+                            raise
+                        logger.warning(f"Newsletter rejected for {email_message.to[0]}: {str(e)}")
+            logger.info(f"Newsletter sent to {len(accepted)}/{len(recipient_list)} recipients via {backend_type}")
         except Exception as e:
             logger.error(f"Newsletter sending failed: {str(e)}")
             raise
+        return accepted
     
     @staticmethod
     def send_transactional_email(subject, message=None, recipient_list=None, html_message=None, 
@@ -108,4 +121,7 @@ class EmailService:
             'backend_type': settings.EMAIL_BACKEND_TYPE,
             'sendgrid_configured': bool(getattr(settings, 'SENDGRID_API_KEY', None)),
             'smtp_configured': bool(settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD),
+            'sendgrid_circuit': sendgrid_breaker().status(),
+            'sendgrid_metrics': sendgrid_metrics.snapshot(),
+            'smtp_metrics': smtp_metrics.snapshot(),
         }
\ No newline at end of file
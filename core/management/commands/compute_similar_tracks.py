@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from music.similarity import update_similar_tracks
+
+
+class Command(BaseCommand):
+    help = 'Encode new/changed tracks and refresh their precomputed similar tracks (--full rebuilds every list)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-encode every track and rebuild all neighbour lists')
+
+    def handle(self, *args, **options):
+        counts = update_similar_tracks(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Encoded {counts['encoded']} track(s), rewrote {counts['updated']} neighbour list(s)"
+        ))
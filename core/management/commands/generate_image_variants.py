@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from music.images import update_image_variants
+from music.models import Track
+
+
+class Command(BaseCommand):
+    help = ('Generate responsive AVIF/WebP/JPEG variants for track thumbnails, vinyl thumbnails and cover art '
+            '(backfills the existing media/thumbnails, media/vinyl_thumbnails and media/cover_arts uploads)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild variants even when they are up to date')
+
+    def handle(self, *args, **options):
+        tracks = (
+            Track.objects
+            .exclude(Q(thumbnail='') | Q(thumbnail__isnull=True), Q(vinyl_thumbnail='') | Q(vinyl_thumbnail__isnull=True),
+                     Q(cover_art='') | Q(cover_art__isnull=True), image_variants={})
+            .order_by('title')
+        )
+        updated = failed = 0
+        for track in tracks.iterator(chunk_size=100):
+            try:
+                fields = update_image_variants(track, force=options['force'])
+            except (OSError, ValueError) as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"{track.track_id} ({track.title}): {e}"))
+                continue
+            if fields:
+                updated += 1
+                self.stdout.write(f"{track.title}: {', '.join(fields)}")
+        self.stdout.write(self.style.SUCCESS(f"Image variants updated for {updated} track(s), {failed} failed"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from music.assets import AssetError, generate_track_assets, tracks_needing_assets
+from music.models import Track
+
+
+class Command(BaseCommand):
+    help = 'Generate waveform peaks and preview clips for tracks that are missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate for every track with a full-mix file')
+
+    def handle(self, *args, **options):
+        tracks = Track.objects.all() if options['all'] else tracks_needing_assets()
+        generated = failed = 0
+        for track in tracks.iterator(chunk_size=100):
+            try:
+                generate_track_assets(track)
+                generated += 1
+            except AssetError as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"{track.track_id} ({track.title}): {e}"))
+        self.stdout.write(self.style.SUCCESS(f"Player assets generated for {generated} track(s), {failed} skipped"))
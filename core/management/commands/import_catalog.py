@@ -0,0 +1,55 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from music.catalog_import import run_import
+from music.models import CatalogImport
+
+
+class Command(BaseCommand):
+    help = 'Bulk import tracks, storage files, license options and contributors from a CSV/JSONL manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', nargs='?', help='Path to the .csv or .jsonl manifest')
+        parser.add_argument('--audio-dir', help='Directory the manifest file paths are relative to (default: manifest directory)')
+        parser.add_argument('--resume', metavar='IMPORT_ID', help='Resume a failed or interrupted import from its checkpoint')
+        parser.add_argument('--batch-size', type=int, help='Rows validated and written per transaction')
+        parser.add_argument('--workers', type=int, help='Concurrent file uploads')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                job = CatalogImport.objects.get(import_id=options['resume'])
+            except (CatalogImport.DoesNotExist, ValueError):
+                raise CommandError(f"Import {options['resume']} not found")
+            if job.status == CatalogImport.Status.COMPLETED:
+                raise CommandError(f"Import {job.import_id} already completed")
+            self.stdout.write(f"Resuming import {job.import_id} after row {job.rows_processed}")
+        else:
+            manifest = options['manifest']
+            if not manifest or not os.path.isfile(manifest):
+                raise CommandError('A manifest file is required (or use --resume)')
+            manifest = os.path.abspath(manifest)
+            audio_dir = os.path.abspath(options['audio_dir'] or os.path.dirname(manifest))
+            if not os.path.isdir(audio_dir):
+                raise CommandError(f"Audio directory {audio_dir} does not exist")
+            job = CatalogImport.objects.create(manifest_path=manifest, audio_root=audio_dir)
+            self.stdout.write(f"Started import {job.import_id}")
+
+        try:
+            job = run_import(
+                job,
+                batch_size=options['batch_size'],
+                upload_workers=options['workers'],
+                log=lambda message: self.stdout.write(message),
+            )
+        except Exception as e:
+            raise CommandError(f"Import {job.import_id} failed after row {job.rows_processed}: {e}. "
+                               f"Fix the problem and run with --resume {job.import_id}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import {job.import_id} completed: {job.tracks_created} tracks, {job.files_uploaded} files, "
+            f"{job.error_count} row errors"
+        ))
+        for error in job.errors[:20]:
+            self.stdout.write(self.style.WARNING(f"  row {error['row']}: {error['error']}"))
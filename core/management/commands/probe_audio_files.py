@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from music.models import TrackStorageFile
+from music.services import probe_storage_file
+
+
+class Command(BaseCommand):
+    help = 'Probe audio file headers to fill in duration, bit rate, sample rate, bit depth and size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-probe every file, not only files that were never probed')
+
+    def handle(self, *args, **options):
+        files = TrackStorageFile.objects.select_related('file_format').order_by('created_date')
+        if not options['all']:
+            files = files.filter(probe_status=TrackStorageFile.ProbeStatus.PENDING)
+
+        counts = {}
+        for storage_file in files.iterator(chunk_size=200):
+            probe_storage_file(storage_file)
+            counts[storage_file.probe_status] = counts.get(storage_file.probe_status, 0) + 1
+            if storage_file.probe_status != TrackStorageFile.ProbeStatus.OK:
+                self.stdout.write(self.style.WARNING(
+                    f"{storage_file.file_path.name}: {storage_file.probe_status} {'; '.join(storage_file.probe_issues)}"
+                ))
+        summary = ', '.join(f"{count} {status.lower()}" for status, count in sorted(counts.items())) or 'nothing to probe'
+        self.stdout.write(self.style.SUCCESS(f"Probed audio files: {summary}"))
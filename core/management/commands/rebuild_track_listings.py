@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from music.listing import rebuild_all_listings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized TrackListing rows for the whole catalog (after deploys or bulk SQL edits)'
+
+    def handle(self, *args, **options):
+        rows = rebuild_all_listings()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} track listing(s)"))
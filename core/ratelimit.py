@@ -0,0 +1,232 @@
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Rate limiting shared by the public endpoints (contact form, checkout, newsletter signup, downloads)
+#
+# Two algorithms, each a single atomic round trip on Redis (a Lua script, sent with EVALSHA):
+#   sliding_window  counters for the current and previous fixed window; the previous one is weighted by
+#                   how much of it still overlaps the sliding window, so there is no burst at the boundary
+#   token_bucket    `limit` tokens refilled evenly over the period; allows short bursts, smooth average
+# Clients come from one connection pool per URL with short timeouts. If Redis is unreachable the
+# request is allowed (fail open) - a broken limiter must not take the contact form or checkout down.
+#
+# settings.RATE_LIMIT_BACKEND = "memory" swaps in an in-process implementation of the same algorithms
+# (used by the test suite; one process only, so not for production).
+
+SLIDING_WINDOW = 'sliding_window'
+TOKEN_BUCKET = 'token_bucket'
+
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit, weight, cost, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+if previous * weight + current + cost > limit then
+    return {0, current, previous}
+end
+current = redis.call('INCRBY', KEYS[1], cost)
+redis.call('PEXPIRE', KEYS[1], ttl)
+return {1, current, previous}
+"""
+
+TOKEN_BUCKET_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local capacity, rate, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate))
+return {allowed, tostring(tokens)}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until the request would be allowed (0 when allowed)
+
+    @property
+    def reset_time(self):
+        return datetime.now(timezone.utc) + timedelta(seconds=self.retry_after)
+
+
+def parse_rate(rate):
+    """'5/hour' -> (5, 3600); also accepts '10/15min' style multipliers"""
+    count, _, period = rate.partition('/')
+    digits = ''.join(ch for ch in period if ch.isdigit())
+    unit = period[len(digits):].strip().lower()
+    if unit not in PERIODS:
+        raise ValueError(f"Unknown rate period in {rate!r}")
+    return int(count), int(digits or 1) * PERIODS[unit]
+
+
+# ---------------- backends ----------------
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def redis_client(url=None):
+    """Redis client on a shared, process-wide connection pool"""
+    url = url or getattr(settings, 'RATE_LIMIT_REDIS_URL', settings.CELERY_BROKER_URL)
+    pool = _pools.get(url)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(url)
+            if pool is None:
+                timeout = getattr(settings, 'RATE_LIMIT_REDIS_TIMEOUT', 0.25)
+                pool = _pools[url] = redis.ConnectionPool.from_url(
+                    url, socket_timeout=timeout, socket_connect_timeout=timeout, health_check_interval=30,
+                )
+    return redis.Redis(connection_pool=pool)
+
+
+class RedisBackend:
+    def __init__(self, url=None):
+        self.client = redis_client(url)
+        self._sliding_window = self.client.register_script(SLIDING_WINDOW_SCRIPT)
+        self._token_bucket = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def sliding_window(self, key, previous_key, limit, weight, cost, ttl_ms):
+        allowed, current, previous = self._sliding_window(keys=[key, previous_key], args=[limit, weight, cost, ttl_ms])
+        return bool(allowed), int(current), int(previous)
+
+    def token_bucket(self, key, capacity, rate_per_ms, now_ms, cost):
+        allowed, tokens = self._token_bucket(keys=[key], args=[capacity, rate_per_ms, now_ms, cost])
+        return bool(allowed), float(tokens)
+
+
+class MemoryBackend:
+    """In-process stand-in with the same semantics as the Lua scripts"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}  # key -> (value, expires at in ms)
+
+    def _get(self, key, default, now_ms):
+        value, expires = self.data.get(key, (default, None))
+        if expires is not None and expires <= now_ms:
+            del self.data[key]
+            return default
+        return value
+
+    def sliding_window(self, key, previous_key, limit, weight, cost, ttl_ms):
+        now_ms = time.time() * 1000
+        with self.lock:
+            current = self._get(key, 0, now_ms)
+            previous = self._get(previous_key, 0, now_ms)
+            if previous * weight + current + cost > limit:
+                return False, current, previous
+            current += cost
+            self.data[key] = (current, now_ms + ttl_ms)
+            return True, current, previous
+
+    def token_bucket(self, key, capacity, rate_per_ms, now_ms, cost):
+        with self.lock:
+            tokens, last = self._get(key, (capacity, now_ms), now_ms)
+            tokens = min(capacity, tokens + max(0, now_ms - last) * rate_per_ms)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.data[key] = ((tokens, now_ms), now_ms + math.ceil(capacity / rate_per_ms))
+            return allowed, tokens
+
+    def reset(self):
+        with self.lock:
+            self.data.clear()
+
+
+_memory_backend = MemoryBackend()
+_redis_backends = {}
+
+
+def get_backend():
+    if getattr(settings, 'RATE_LIMIT_BACKEND', 'redis') == 'memory':
+        return _memory_backend
+    url = getattr(settings, 'RATE_LIMIT_REDIS_URL', settings.CELERY_BROKER_URL)
+    backend = _redis_backends.get(url)
+    if backend is None:
+        backend = _redis_backends[url] = RedisBackend(url)
+    return backend
+
+
+def reset_memory_backend():
+    _memory_backend.reset()
+
+
+# ---------------- limiter ----------------
+class RateLimiter:
+    """
+    RateLimiter('contact', '5/hour').hit(ip) -> RateLimitResult
+    Keys are namespaced by scope, so one identity has independent budgets per endpoint.
+    """
+
+    def __init__(self, scope, rate, algorithm=SLIDING_WINDOW):
+        if algorithm not in (SLIDING_WINDOW, TOKEN_BUCKET):
+            raise ValueError(f"Unknown rate limit algorithm {algorithm!r}")
+        self.scope = scope
+        self.limit, self.period = parse_rate(rate)
+        self.algorithm = algorithm
+
+    def hit(self, identity, cost=1):
+        try:
+            if self.algorithm == TOKEN_BUCKET:
+                return self._token_bucket(identity, cost)
+            return self._sliding_window(identity, cost)
+        except redis.RedisError as e:
+            logger.warning(f"Rate limiter unavailable for {self.scope}, allowing request: {e}")
+            return RateLimitResult(True, self.limit, self.limit, 0.0)
+
+    def _sliding_window(self, identity, cost):
+        now = time.time()
+        window = int(now // self.period)
+        elapsed = (now - window * self.period) / self.period
+        weight = 1.0 - elapsed
+        key = f"rl:{self.scope}:{identity}:{window}"
+        previous_key = f"rl:{self.scope}:{identity}:{window - 1}"
+        allowed, current, previous = get_backend().sliding_window(
+            key, previous_key, self.limit, weight, cost, self.period * 2000,
+        )
+        used = previous * weight + current
+        remaining = max(0, math.floor(self.limit - used))
+        retry_after = 0.0
+        if not allowed:
+            if current + cost <= self.limit and previous:
+                # Wait until enough of the previous window has slid out
+                needed = (previous * weight + current + cost - self.limit) / previous
+                retry_after = needed * self.period
+            else:
+                # Only the next window (where this one becomes the weighted previous) can help
+                retry_after = (1.0 - elapsed) * self.period
+        return RateLimitResult(allowed, self.limit, remaining, retry_after)
+
+    def _token_bucket(self, identity, cost):
+        rate_per_ms = self.limit / (self.period * 1000)
+        allowed, tokens = get_backend().token_bucket(
+            f"rl:{self.scope}:{identity}:tb", self.limit, rate_per_ms, int(time.time() * 1000), cost,
+        )
+        retry_after = 0.0 if allowed else (cost - tokens) / rate_per_ms / 1000
+        return RateLimitResult(allowed, self.limit, math.floor(tokens), retry_after)
+
+
+def limiter_for_scope(scope):
+    """RateLimiter configured by settings.RATE_LIMITS[scope] = {"rate": "5/hour", "algorithm": ...}"""
+    config = settings.RATE_LIMITS[scope]
+    return RateLimiter(scope, config['rate'], config.get('algorithm', SLIDING_WINDOW))
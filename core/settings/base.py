@@ -27,13 +27,34 @@ DEBUG = config("DJANGO_DEBUG", default=False, cast=bool)
 # SendGrid Settings
 SENDGRID_API_KEY = config("SENDGRID_API_KEY", default="")
 SENDGRID_FROM_EMAIL = config("SENDGRID_FROM_EMAIL", default=EMAIL_HOST_USER)
+SENDGRID_API_HOST = config("SENDGRID_API_HOST", default="https://api.sendgrid.com")
+# Sends in flight per process (pooled keep-alive connections), and (connect, read) timeout in seconds
+SENDGRID_MAX_CONCURRENCY = config("SENDGRID_MAX_CONCURRENCY", default=8, cast=int)
+SENDGRID_TIMEOUT = (3.05, 10)
+
+# Newsletter fan-out (newsletter/delivery.py): recipients per chunk task, and per send_messages() call (SendGrid batches hold up to 1000)
+NEWSLETTER_CHUNK_SIZE = 1000
+NEWSLETTER_BATCH_SIZE = 100
+NEWSLETTER_LEDGER_BATCH_SIZE = 1000  # delivery ledger rows per INSERT when a send is planned
+NEWSLETTER_CHUNK_LEASE_SECONDS = 3600  # a chunk left SENDING this long (its worker died) may be claimed again
+# Bulk subscriber import/export (newsletter/bulk.py)
+NEWSLETTER_IMPORT_BATCH_SIZE = 1000
+NEWSLETTER_IMPORT_MAX_REPORTED_ERRORS = 500
+NEWSLETTER_EXPORT_CHUNK_SIZE = 2000
 
 # Contact Us settings
 CONTACT_RECEIVER_EMAIL = config("CONTACT_RECEIVER_EMAIL", default="")
 RECAPTCHA_SECRET_KEY = config("RECAPTCHA_SECRET_KEY", default="")
-# Upload limits for 25MB attachments (with margin)
-DATA_UPLOAD_MAX_MEMORY_SIZE = 30 * 1024 * 1024  # 30MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 30 * 1024 * 1024  # 30MB
+RECAPTCHA_VERIFY_URL = "https://www.google.com/recaptcha/api/siteverify"
+RECAPTCHA_TIMEOUT = (1.0, 3.0)  # (connect, read) seconds - the contact form waits on this
+RECAPTCHA_POOL_SIZE = 10
+RECAPTCHA_CACHE_SECONDS = 120  # tokens expire after two minutes anyway
+RECAPTCHA_CACHE = "shared"  # a retried submission may land on another worker
+# Uploads above FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a temporary file instead of worker memory.
+# DATA_UPLOAD_MAX_MEMORY_SIZE only counts the non-file part of a request body.
+DATA_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(2.5 * 1024 * 1024)  # 2.5MB (Django's default)
+CONTACT_ATTACHMENT_MAX_SIZE = 25 * 1024 * 1024  # 25MB
 
 # Dynamic Email Backend Selection
 EMAIL_BACKEND_TYPE = config("EMAIL_BACKEND_TYPE", default="smtp")
@@ -70,11 +91,64 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json" # default
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
+# Rate limits for public endpoints (core/ratelimit.py, applied through core.throttles.ScopedRateLimitThrottle)
+RATE_LIMIT_BACKEND = config("RATE_LIMIT_BACKEND", default="redis")  # "memory" = single-process stand-in
+RATE_LIMIT_REDIS_URL = config("RATE_LIMIT_REDIS_URL", default=CELERY_BROKER_URL)
+RATE_LIMIT_REDIS_TIMEOUT = 0.25  # seconds; on timeout the request is allowed
+RATE_LIMITS = {
+    "contact": {"rate": "5/hour", "algorithm": "sliding_window"},
+    "newsletter_subscribe": {"rate": "10/hour", "algorithm": "sliding_window"},
+    "checkout": {"rate": "10/min", "algorithm": "token_bucket"},
+    "license_download": {"rate": "30/min", "algorithm": "token_bucket"},
+}
+# Caches: "default" is per process; "shared" is Redis, for state every worker must see
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config("SHARED_CACHE_URL", default=CELERY_BROKER_URL),
+        "OPTIONS": {"socket_connect_timeout": 0.25, "socket_timeout": 0.25},
+    },
+}
+# SendGrid circuit breaker in HybridEmailBackend (core/circuitbreaker.py): FAILURE_THRESHOLD failures within
+# FAILURE_WINDOW seconds send all mail straight to SMTP; after RECOVERY_TIMEOUT seconds one probe goes to SendGrid
+SENDGRID_BREAKER_FAILURE_THRESHOLD = 5
+SENDGRID_BREAKER_FAILURE_WINDOW = 60
+SENDGRID_BREAKER_RECOVERY_TIMEOUT = 30
+CIRCUIT_BREAKER_CACHE = "shared"
+# Email open/click tracking (analytics/tracking.py): the endpoints only append to a Redis stream, which
+# analytics.tasks.process_email_events_task drains into the database TRACKING_BATCH_SIZE events at a time
+EMAIL_TRACKING_ENABLED = config("EMAIL_TRACKING_ENABLED", default=True, cast=bool)
+TRACKING_BACKEND = config("TRACKING_BACKEND", default="redis")  # "memory" = single-process stand-in
+TRACKING_REDIS_URL = config("TRACKING_REDIS_URL", default=CELERY_BROKER_URL)
+TRACKING_STREAM = "email-events"
+TRACKING_STREAM_MAXLEN = 1_000_000  # oldest events are trimmed beyond this if the consumer falls behind
+TRACKING_BATCH_SIZE = 1000
+TRACKING_MAX_BATCHES = 50  # per consumer run
+TRACKING_PENDING_IDLE_SECONDS = 300  # entries left unacknowledged this long are taken over by another consumer
 # ZIP/URL validity
 LICENSE_ZIP_TTL_HOURS = 96  # you set 96; make it configurable
 S3_PRESIGNED_TTL_SECONDS = 900  # ~15 minutes for presigned redirects
 # Streaming threshold for stems (sum sizes)
 STEMS_STREAM_THRESHOLD_MB = 200  # stream if stems bundle is larger than this
+# Bulk catalog import (music/catalog_import.py). API imports may only read manifests/audio under this directory
+CATALOG_IMPORT_ROOT = config("CATALOG_IMPORT_ROOT", default=os.path.join(BASE_DIR, 'catalog_imports'))
+CATALOG_IMPORT_BATCH_SIZE = 500
+CATALOG_IMPORT_UPLOAD_WORKERS = 8
+# Derived player assets (music/assets.py): waveform peaks and preview clips
+FFMPEG_BINARY = config("FFMPEG_BINARY", default="ffmpeg")
+PREVIEW_CLIP_SECONDS = 30
+PREVIEW_BITRATE = "64k"
+# Responsive image variants (music/images.py) for track thumbnails, vinyl thumbnails and cover art
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1280)
+IMAGE_VARIANT_FORMATS = ("avif", "webp", "jpeg")
+# Credits graph responses (music/credits.py); invalidated on writes, the TTL is only a backstop
+CREDITS_CACHE_SECONDS = 60 * 60
+CREDITS_CACHE = "shared"  # every worker must see the same version key
+# Neighbours kept per track by the similar-tracks job (music/similarity.py)
+SIMILAR_TRACKS_COUNT = 20
 ALLOWED_HOSTS = []
 
 # Media files (user-uploaded files)
@@ -104,6 +178,7 @@ INSTALLED_APPS = [
     'common.apps.CommonConfig',
     'newsletter.apps.NewsletterConfig',
     'contact.apps.ContactConfig',
+    'analytics.apps.AnalyticsConfig',
     # django summernote for rich html text for the emails and contracts
     'django_summernote',
     'django_cleanup.apps.CleanupConfig'
@@ -273,6 +348,11 @@ if 'test' in sys.argv or 'test_coverage' in sys.argv:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    RATE_LIMIT_BACKEND = "memory"
+    CIRCUIT_BREAKER_CACHE = "default"
+    CREDITS_CACHE = "default"
+    RECAPTCHA_CACHE = "default"
+    TRACKING_BACKEND = "memory"
 
 # You can optionally add this to settings.py to customize test database name
 TEST = {
@@ -0,0 +1,24 @@
+from rest_framework.throttling import BaseThrottle
+
+from .ratelimit import limiter_for_scope
+
+
+class ScopedRateLimitThrottle(BaseThrottle):
+    """
+    DRF throttle on core.ratelimit. The view (or @action) sets `throttle_scope` - or a subclass sets
+    `scope`, for function views - whose rate and algorithm come from settings.RATE_LIMITS.
+    Authenticated users are limited per account, anyone else per client IP.
+    """
+    scope = None
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None) or self.scope
+        if not scope:
+            return True
+        user = getattr(request, 'user', None)
+        identity = f"user:{user.pk}" if user is not None and user.is_authenticated else f"ip:{self.get_ident(request)}"
+        self.result = limiter_for_scope(scope).hit(identity)
+        return self.result.allowed
+
+    def wait(self):
+        return self.result.retry_after
@@ -2,7 +2,9 @@ from django.db import models
 from django.core.exceptions import ValidationError
 import uuid
 from music.models import Track, Contributor, Contact, TrackStorageFile, MusicProfessional, ROLE_CHOICES
-from transactions.models import OrderItem
+from transactions.models import OrderItem, touch_orders
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 
 # Create your models here.
@@ -188,4 +190,26 @@ class LicenseDownload(models.Model):
     license = models.OneToOneField(License, on_delete=models.CASCADE, related_name='license_downloads')
     token = models.CharField(max_length=255, unique=True)
     expires_at = models.DateTimeField()
-    zip_file = models.FileField(upload_to='license_zips/', blank=True, null=True)
\ No newline at end of file
+    zip_file = models.FileField(upload_to='license_zips/', blank=True, null=True)
+
+
+# Prices and formats on the storefront listing (music/listing.py) come from these tables
+@receiver([post_save, post_delete], sender=TrackLicenseOptions)
+def refresh_listing_on_option_change(sender, instance, **kwargs):
+    from music.listing import schedule_listing_refresh
+    schedule_listing_refresh([instance.track_id])
+
+
+@receiver(post_save, sender=License_type)
+def refresh_listing_on_license_type_change(sender, instance, created, **kwargs):
+    if created:
+        return
+    from music.listing import schedule_listing_refresh
+    schedule_listing_refresh(instance.track_license_options.values_list('track_id', flat=True))
+
+
+# Sold licenses feed the sales rollups (analytics/services.py), which rebuild days of updated orders
+@receiver([post_save, post_delete], sender=License)
+def touch_order_on_license_change(sender, instance, **kwargs):
+    if instance.order_item_id:
+        touch_orders(OrderItem.objects.filter(pk=instance.order_item_id).values_list('order_id', flat=True).first())
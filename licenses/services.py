@@ -125,6 +125,9 @@ def build_download_urls_from_base(base_url: str, license_obj: License) -> tuple[
     return license_url, asset_url
 
 
+LICENSE_EMAIL_CAMPAIGN = 'license_email'
+
+
 # Send an email to the buyer with the license PDF attached and links to download the track and license with celery
 # TODO send email with download url 
 def send_license_email(
@@ -138,6 +141,11 @@ def send_license_email(
     """
     print("SENDING EMAIL TO", to_email)
     
+    from analytics.tracking import click_url, open_pixel_url, tracking_enabled, tracking_token
+
+    # Opens/clicks are tracked per order; the HTML links go through the click redirect, the text part keeps the plain URLs
+    token = tracking_token(LICENSE_EMAIL_CAMPAIGN, order_reference) if tracking_enabled() else None
+
     # Prepare context for template
     license_items = []
     attachments = []
@@ -149,7 +157,9 @@ def send_license_email(
             license_items.append({
                 'track_title': license.track_license_option.track.title,
                 'track_url': track_url,
-                'license_url': license_url
+                'license_url': license_url,
+                'track_link': click_url(token, track_url) if token else track_url,
+                'license_link': click_url(token, license_url) if token else license_url,
             })
             
             # Prepare attachment
@@ -168,7 +178,8 @@ def send_license_email(
         template_name="emails/license_email",
         context={
             'order_reference': order_reference,
-            'licenses': license_items
+            'licenses': license_items,
+            'open_pixel_url': open_pixel_url(token) if token else None,
         },
         attachments=attachments,
         reply_to=[settings.DEFAULT_FROM_EMAIL]
@@ -182,7 +193,7 @@ def get_or_create_license_zip(license_obj):
     from django.utils.text import slugify
     import secrets, zipfile, os, tempfile
 
-    existing = getattr(license_obj, "license_download", None)
+    existing = getattr(license_obj, "license_downloads", None)
     if existing and existing.expires_at > timezone.now() and existing.zip_file:
         return existing
 
@@ -7,7 +7,8 @@ from rest_framework import permissions
 from .services import generate_license_agreement, build_download_urls, send_license_email
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
+from core.throttles import ScopedRateLimitThrottle
 from django.http import HttpResponse, Http404
 from django.shortcuts import get_object_or_404
 from .models import License
@@ -194,8 +195,15 @@ def download_track(request, license_id):
     )
 
 
+class LicenseDownloadThrottle(ScopedRateLimitThrottle):
+    scope = "license_download"
+
+
 # This endpoint is used to download the zip file that contains the track and license agreement- as opposed to the download_license_agreement and download_track endpoints that are used to download the license agreement and track separately/ no zip file
 #They are save in LicenseDownload with a reference to license...that's what make them reachable
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+@throttle_classes([LicenseDownloadThrottle])
 def download_assets(request, license_id, token):
     ld = get_object_or_404(LicenseDownload, license_id=license_id, token=token)
     if ld.expires_at <= timezone.now():
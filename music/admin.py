@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Track, Publisher, Contributor, Publishing, Contribution, Library, FileFormat, SocialMediaLink, MusicProfessional, TrackStorageFile
+from .models import Track, Publisher, Contributor, Publishing, Contribution, Library, FileFormat, SocialMediaLink, MusicProfessional, TrackStorageFile, CatalogImport
 # Register your models here.
 
 admin.site.register(FileFormat)
@@ -11,6 +11,17 @@ admin.site.register(Contribution)
 admin.site.register(Library)
 admin.site.register(SocialMediaLink)
 admin.site.register(MusicProfessional)
-admin.site.register(TrackStorageFile)
 
 
+@admin.register(CatalogImport)
+class CatalogImportAdmin(admin.ModelAdmin):
+    list_display = ('import_id', 'status', 'rows_processed', 'tracks_created', 'files_uploaded', 'error_count', 'created_date', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = [field.name for field in CatalogImport._meta.fields]
+
+
+@admin.register(TrackStorageFile)
+class TrackStorageFileAdmin(admin.ModelAdmin):
+    list_display = ('track_storage_file_id', 'file_path', 'file_format', 'duration_seconds', 'bit_rate', 'sample_rate', 'bit_depth', 'file_size', 'probe_status')
+    list_filter = ('probe_status', 'file_format')
+    readonly_fields = ('duration_seconds', 'sample_rate', 'bit_depth', 'channels', 'probe_status', 'probe_issues', 'probed_at')
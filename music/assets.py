@@ -0,0 +1,293 @@
+import hashlib
+import io
+import shutil
+import struct
+import subprocess
+import sys
+import wave
+from array import array
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Count, Exists, OuterRef
+
+from .models import Track, TrackAsset, TrackStorageFile
+
+# Derived player assets per track
+# - Waveform peaks: min/max pairs as signed 8-bit values at several fixed resolutions, stored in one
+#   small binary file (a few KB whatever the track length). Layout, little endian:
+#     header  '<4sHHI'  magic b'RPKS', version, level count, duration in ms
+#     levels  '<I'      points per level (ascending), one per level
+#     data    int8      min,max,min,max... for each level in the same order
+# - Preview clip: a short low-bitrate excerpt so clients never download masters to play a track.
+#
+# Decoding uses ffmpeg (settings.FFMPEG_BINARY) when it's installed on the worker. Without it, PCM WAV
+# masters are still handled in-process: peaks from the raw frames and an 8-bit mono WAV preview.
+
+PEAKS_MAGIC = b'RPKS'
+PEAKS_VERSION = 1
+PEAK_LEVELS = (256, 1024, 4096)
+BUCKET_SECONDS = 0.01  # base resolution peaks are collected at before downsampling to the levels
+DECODE_SAMPLE_RATE = 22050
+
+# Full mixes, best source first. Stems/Samples never feed the player assets.
+SOURCE_PREFERENCE = ['WAV', 'AIFF', 'FLAC', 'ALAC', 'M4A', 'MP3', 'OGG']
+
+
+class AssetError(Exception):
+    """The track has no usable source or it can't be decoded on this worker"""
+
+
+def ffmpeg_binary():
+    return shutil.which(getattr(settings, 'FFMPEG_BINARY', 'ffmpeg'))
+
+
+def select_source(track):
+    """The highest quality full-mix storage file for the track"""
+    candidates = list(
+        TrackStorageFile.objects
+        .filter(track_license_options__track=track, file_format__name__in=SOURCE_PREFERENCE)
+        .select_related('file_format')
+        .distinct()
+    )
+    if not candidates:
+        raise AssetError(f"Track {track.track_id} has no full-mix audio file")
+    return min(candidates, key=lambda f: (SOURCE_PREFERENCE.index(f.file_format.name), -(f.bit_rate or 0)))
+
+
+# ---------------- decoding ----------------
+def _ffmpeg_input(field_file):
+    try:
+        return field_file.path
+    except NotImplementedError:
+        return field_file.url  # remote storage: ffmpeg streams the (presigned) URL itself
+
+
+def _to_int16(frames, sample_width):
+    """Convert little-endian PCM frames to an int16 array by keeping the two most significant bytes"""
+    if sample_width == 1:
+        return array('h', ((b - 128) << 8 for b in frames))  # 8-bit WAV is unsigned
+    if sample_width == 2:
+        samples = array('h')
+        samples.frombytes(frames)
+    else:
+        converted = bytearray(len(frames) // sample_width * 2)
+        converted[0::2] = frames[sample_width - 2::sample_width]
+        converted[1::2] = frames[sample_width - 1::sample_width]
+        samples = array('h')
+        samples.frombytes(bytes(converted))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples
+
+
+def iter_pcm(field_file, start=0.0, duration=None, chunk_seconds=1.0):
+    """
+    Yield (samples, channels, sample_rate) chunks of int16 audio.
+    ffmpeg decodes any format to mono DECODE_SAMPLE_RATE; the fallback reads PCM WAV frames directly.
+    """
+    ffmpeg = ffmpeg_binary()
+    if ffmpeg:
+        command = [ffmpeg, '-v', 'error', '-nostdin']
+        if start:
+            command += ['-ss', f'{start:.3f}']
+        command += ['-i', _ffmpeg_input(field_file)]
+        if duration:
+            command += ['-t', f'{duration:.3f}']
+        command += ['-ac', '1', '-ar', str(DECODE_SAMPLE_RATE), '-f', 's16le', '-']
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        chunk_bytes = int(DECODE_SAMPLE_RATE * chunk_seconds) * 2
+        try:
+            while True:
+                data = process.stdout.read(chunk_bytes)
+                if not data:
+                    break
+                yield _to_int16(data[:len(data) - len(data) % 2], 2), 1, DECODE_SAMPLE_RATE
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode('utf-8', 'replace')
+            process.stderr.close()
+            if process.wait() != 0:
+                raise AssetError(f"ffmpeg failed: {stderr.strip()[:500]}")
+        return
+
+    with field_file.storage.open(field_file.name, 'rb') as f:
+        try:
+            reader = wave.open(f, 'rb')
+        except (wave.Error, EOFError) as e:
+            raise AssetError(f"ffmpeg is not installed and the source is not a PCM WAV file ({e})")
+        with reader:
+            channels, sample_width, sample_rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+            remaining = reader.getnframes()
+            if start:
+                first = min(int(start * sample_rate), remaining)
+                reader.setpos(first)
+                remaining -= first
+            if duration:
+                remaining = min(remaining, int(duration * sample_rate))
+            chunk_frames = int(sample_rate * chunk_seconds)
+            while remaining > 0:
+                frames = reader.readframes(min(chunk_frames, remaining))
+                if not frames:
+                    break
+                remaining -= len(frames) // (channels * sample_width)
+                yield _to_int16(frames, sample_width), channels, sample_rate
+
+
+# ---------------- waveform peaks ----------------
+def collect_peaks(chunks):
+    """Reduce a PCM stream to per-bucket min/max arrays. Returns (mins, maxs, duration_seconds)."""
+    mins, maxs = array('h'), array('h')
+    pending = array('h')
+    bucket = None
+    total_frames = 0
+    sample_rate = channels = None
+    for samples, channels, sample_rate in chunks:
+        if bucket is None:
+            bucket = max(1, int(sample_rate * BUCKET_SECONDS)) * channels
+        total_frames += len(samples) // channels
+        pending.extend(samples)
+        full = len(pending) - len(pending) % bucket
+        for offset in range(0, full, bucket):
+            window = pending[offset:offset + bucket]
+            mins.append(min(window))
+            maxs.append(max(window))
+        del pending[:full]
+    if pending:
+        mins.append(min(pending))
+        maxs.append(max(pending))
+    duration = total_frames / sample_rate if sample_rate else 0.0
+    return mins, maxs, duration
+
+
+def downsample_peaks(mins, maxs, points):
+    """min/max pairs (int8, interleaved) for exactly `points` columns"""
+    count = len(mins)
+    level = array('b')
+    for i in range(points):
+        start = i * count // points
+        end = max((i + 1) * count // points, start + 1)
+        if start >= count:
+            level.extend((0, 0))
+            continue
+        level.append(min(mins[start:end]) >> 8)
+        level.append(max(maxs[start:end]) >> 8)
+    return level
+
+
+def encode_peaks(mins, maxs, duration, levels=PEAK_LEVELS):
+    levels = sorted(levels)
+    header = struct.pack('<4sHHI', PEAKS_MAGIC, PEAKS_VERSION, len(levels), int(round(duration * 1000)))
+    header += struct.pack(f'<{len(levels)}I', *levels)
+    return header + b''.join(downsample_peaks(mins, maxs, points).tobytes() for points in levels)
+
+
+def decode_peaks(data):
+    """Parse a peaks file into (duration_seconds, {points: array('b') of interleaved min/max})"""
+    magic, version, level_count, duration_ms = struct.unpack_from('<4sHHI', data)
+    if magic != PEAKS_MAGIC or version != PEAKS_VERSION:
+        raise AssetError("Not a peaks file")
+    offset = struct.calcsize('<4sHHI')
+    levels = struct.unpack_from(f'<{level_count}I', data, offset)
+    offset += 4 * level_count
+    peaks = {}
+    for points in levels:
+        level = array('b')
+        level.frombytes(data[offset:offset + points * 2])
+        peaks[points] = level
+        offset += points * 2
+    return duration_ms / 1000, peaks
+
+
+# ---------------- preview clip ----------------
+def preview_window(duration):
+    """Start and length of the preview: PREVIEW_CLIP_SECONDS from a quarter into the track"""
+    length = getattr(settings, 'PREVIEW_CLIP_SECONDS', 30)
+    if not duration or duration <= length:
+        return 0.0, length
+    return min(duration * 0.25, duration - length), length
+
+
+def render_preview(field_file, duration):
+    """Returns (bytes, content_type, extension)"""
+    start, length = preview_window(duration)
+    ffmpeg = ffmpeg_binary()
+    if ffmpeg:
+        bitrate = getattr(settings, 'PREVIEW_BITRATE', '64k')
+        command = [
+            ffmpeg, '-v', 'error', '-nostdin', '-ss', f'{start:.3f}', '-i', _ffmpeg_input(field_file),
+            '-t', f'{length:.3f}', '-vn', '-map_metadata', '-1', '-ac', '2',
+            '-codec:a', 'libmp3lame', '-b:a', bitrate, '-f', 'mp3', '-',
+        ]
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            raise AssetError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'replace').strip()[:500]}")
+        return result.stdout, 'audio/mpeg', '.mp3'
+
+    # In-process fallback: mono, at most DECODE_SAMPLE_RATE, 8-bit WAV (~175kbps)
+    buffer = io.BytesIO()
+    writer = None
+    for samples, channels, sample_rate in iter_pcm(field_file, start=start, duration=length):
+        step = max(1, sample_rate // DECODE_SAMPLE_RATE)
+        mono = samples[0::channels * step]
+        if writer is None:
+            writer = wave.open(buffer, 'wb')
+            writer.setnchannels(1)
+            writer.setsampwidth(1)
+            writer.setframerate(sample_rate // step)
+        writer.writeframes(bytes((sample >> 8) + 128 for sample in mono))
+    if writer is None:
+        raise AssetError("Source has no audio frames")
+    writer.close()
+    return buffer.getvalue(), 'audio/wav', '.wav'
+
+
+# ---------------- storage ----------------
+def save_asset(track, kind, source, data, content_type, extension):
+    content_hash = hashlib.sha256(data).hexdigest()
+    asset = TrackAsset.objects.filter(track=track, kind=kind).first()
+    if asset and asset.content_hash == content_hash and asset.source_id == source.pk:
+        return asset
+    asset = asset or TrackAsset(track=track, kind=kind)
+    asset.source = source
+    asset.content_type = content_type
+    asset.content_hash = content_hash
+    asset.file_size = len(data)
+    # Content hash in the name: a regenerated asset gets a new URL, so old ones can be cached forever
+    name = f"{track.track_id}/{kind.lower()}-{content_hash[:16]}{extension}"
+    asset.file.save(name, ContentFile(data), save=False)
+    asset.save()  # django-cleanup removes the replaced file
+    return asset
+
+
+def generate_track_assets(track, kinds=(TrackAsset.Kind.WAVEFORM, TrackAsset.Kind.PREVIEW)):
+    """Generate (or refresh) the derived assets of a track from its best full-mix file"""
+    source = select_source(track)
+    duration = source.duration_seconds or track.duration_seconds
+    assets = []
+    if TrackAsset.Kind.WAVEFORM in kinds:
+        mins, maxs, decoded_duration = collect_peaks(iter_pcm(source.file_path))
+        if not mins:
+            raise AssetError("Source has no audio frames")
+        duration = decoded_duration or duration
+        assets.append(save_asset(
+            track, TrackAsset.Kind.WAVEFORM, source,
+            encode_peaks(mins, maxs, decoded_duration), 'application/octet-stream', '.peaks',
+        ))
+    if TrackAsset.Kind.PREVIEW in kinds:
+        data, content_type, extension = render_preview(source.file_path, duration)
+        assets.append(save_asset(track, TrackAsset.Kind.PREVIEW, source, data, content_type, extension))
+    return assets
+
+
+def tracks_needing_assets():
+    """Tracks with a full-mix file but missing player assets"""
+    with_source = TrackStorageFile.objects.filter(
+        track_license_options__track=OuterRef('pk'), file_format__name__in=SOURCE_PREFERENCE,
+    )
+    return (
+        Track.objects
+        .filter(Exists(with_source))
+        .annotate(asset_count=Count('assets'))
+        .filter(asset_count__lt=len(TrackAsset.Kind.values))
+    )
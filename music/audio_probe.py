@@ -0,0 +1,425 @@
+import os
+import struct
+
+# Header-only audio probing
+# Reads container/stream headers at known offsets (a few KB per file, plus one tail read for OGG)
+# and never decodes audio, so probing a 500MB WAV costs the same as probing a 3MB MP3.
+# Supported: WAV, AIFF/AIFC, FLAC, MP3 (CBR, Xing/Info and VBRI VBR), OGG Vorbis/Opus, M4A/ALAC.
+#
+# probe(read, file_size) returns a dict:
+#   container, codec, duration_seconds, bit_rate (kbps), sample_rate (Hz), bit_depth, channels, bpm
+# read(offset, length) must return up to `length` bytes starting at `offset`.
+
+HEAD_BYTES = 64 * 1024
+
+
+class ProbeError(Exception):
+    """The file is not a supported audio file or its headers are damaged"""
+
+
+class UnsupportedAudio(ProbeError):
+    """The file is not in a container we can probe"""
+
+
+class BufferedReader:
+    """Serves reads inside the first HEAD_BYTES from one cached read so local parsing costs one round trip"""
+
+    def __init__(self, read, file_size):
+        self._read = read
+        self.file_size = file_size
+        self.head = read(0, min(HEAD_BYTES, file_size))
+
+    def __call__(self, offset, length):
+        if offset + length <= len(self.head):
+            return self.head[offset:offset + length]
+        if offset >= self.file_size:
+            return b''
+        return self._read(offset, min(length, self.file_size - offset))
+
+
+def probe(read, file_size):
+    reader = BufferedReader(read, file_size)
+    head = reader.head
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        info = _probe_wav(reader)
+    elif head[:4] == b'FORM' and head[8:12] in (b'AIFF', b'AIFC'):
+        info = _probe_aiff(reader)
+    elif head[:4] == b'fLaC':
+        info = _probe_flac(reader)
+    elif head[:4] == b'OggS':
+        info = _probe_ogg(reader)
+    elif head[4:8] == b'ftyp':
+        info = _probe_mp4(reader)
+    elif head[:3] == b'ID3' or _find_mp3_frame(head, 0) is not None:
+        info = _probe_mp3(reader)
+    else:
+        raise UnsupportedAudio("Unrecognized audio container")
+
+    info.setdefault('bpm', None)
+    info.setdefault('bit_depth', None)
+    # Fall back to the average bit rate when the header doesn't carry one
+    if not info.get('bit_rate') and info.get('duration_seconds'):
+        info['bit_rate'] = int(round(file_size * 8 / info['duration_seconds'] / 1000))
+    return info
+
+
+def probe_path(path):
+    """Probe a local file"""
+    with open(path, 'rb') as f:
+        def read(offset, length):
+            f.seek(offset)
+            return f.read(length)
+        return probe(read, os.path.getsize(path))
+
+
+def _chunks(reader, offset, end, big_endian=False):
+    """Yield (chunk_id, data_offset, size) for RIFF/IFF style chunk lists by reading 8-byte headers only"""
+    fmt = '>I' if big_endian else '<I'
+    while offset + 8 <= end:
+        header = reader(offset, 8)
+        if len(header) < 8:
+            return
+        chunk_id, size = header[:4], struct.unpack(fmt, header[4:])[0]
+        yield chunk_id, offset + 8, size
+        offset += 8 + size + (size & 1)  # chunks are word aligned
+
+
+# ---------------- WAV ----------------
+def _probe_wav(reader):
+    fmt = None
+    data_size = None
+    for chunk_id, data_offset, size in _chunks(reader, 12, reader.file_size):
+        if chunk_id == b'fmt ':
+            fmt = reader(data_offset, 16)
+        elif chunk_id == b'data':
+            # Streaming writers leave 0/0xFFFFFFFF here - use what's actually on disk
+            data_size = min(size, reader.file_size - data_offset) if size not in (0, 0xFFFFFFFF) else reader.file_size - data_offset
+            break
+    if not fmt or len(fmt) < 16:
+        raise ProbeError("WAV file has no fmt chunk")
+    audio_format, channels, sample_rate, byte_rate, _, bits = struct.unpack('<HHIIHH', fmt)
+    if data_size is None or not byte_rate:
+        raise ProbeError("WAV file has no data chunk")
+    return {
+        'container': 'wav',
+        'codec': 'pcm' if audio_format in (1, 0xFFFE) else f'wav-0x{audio_format:04x}',
+        'duration_seconds': data_size / byte_rate,
+        'bit_rate': int(round(byte_rate * 8 / 1000)),
+        'sample_rate': sample_rate,
+        'bit_depth': bits,
+        'channels': channels,
+    }
+
+
+# ---------------- AIFF ----------------
+def _extended_to_float(data):
+    """IEEE 754 80-bit extended (AIFF sample rate) to float"""
+    exponent = ((data[0] & 0x7F) << 8) | data[1]
+    mantissa = int.from_bytes(data[2:10], 'big')
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    value = mantissa * 2.0 ** (exponent - 16383 - 63)
+    return -value if data[0] & 0x80 else value
+
+
+def _probe_aiff(reader):
+    for chunk_id, data_offset, size in _chunks(reader, 12, reader.file_size, big_endian=True):
+        if chunk_id == b'COMM':
+            comm = reader(data_offset, min(size, 22))  # AIFC appends the compression type
+            if len(comm) < 18:
+                break
+            channels, frames, bits = struct.unpack('>hIh', comm[:8])
+            sample_rate = int(round(_extended_to_float(comm[8:18])))
+            if not sample_rate:
+                break
+            codec = comm[18:22].decode('latin-1').strip().lower() if len(comm) >= 22 else 'pcm'
+            return {
+                'container': 'aiff',
+                'codec': 'pcm' if codec in ('', 'none', 'sowt', 'pcm') else codec,
+                'duration_seconds': frames / sample_rate,
+                'bit_rate': int(round(sample_rate * channels * bits / 1000)),
+                'sample_rate': sample_rate,
+                'bit_depth': bits,
+                'channels': channels,
+            }
+    raise ProbeError("AIFF file has no COMM chunk")
+
+
+# ---------------- FLAC ----------------
+def _vorbis_comment_bpm(data):
+    """BPM from a Vorbis comment block (FLAC/OGG)"""
+    try:
+        vendor_length = struct.unpack('<I', data[:4])[0]
+        offset = 4 + vendor_length
+        count = struct.unpack('<I', data[offset:offset + 4])[0]
+        offset += 4
+        for _ in range(count):
+            length = struct.unpack('<I', data[offset:offset + 4])[0]
+            comment = data[offset + 4:offset + 4 + length].decode('utf-8', 'replace')
+            offset += 4 + length
+            key, _, value = comment.partition('=')
+            if key.upper() in ('BPM', 'TBPM', 'TEMPO'):
+                return _parse_bpm(value)
+    except (struct.error, IndexError):
+        pass
+    return None
+
+
+def _parse_bpm(value):
+    try:
+        bpm = int(round(float(str(value).strip().strip('\x00'))))
+    except ValueError:
+        return None
+    return bpm if 0 < bpm < 1000 else None
+
+
+def _probe_flac(reader):
+    offset = 4
+    info = None
+    bpm = None
+    while offset + 4 <= reader.file_size:
+        header = reader(offset, 4)
+        last, block_type = header[0] & 0x80, header[0] & 0x7F
+        length = int.from_bytes(header[1:4], 'big')
+        if block_type == 0:  # STREAMINFO
+            streaminfo = reader(offset + 4, 34)
+            packed = int.from_bytes(streaminfo[10:18], 'big')
+            sample_rate = packed >> 44
+            total_samples = packed & 0xFFFFFFFFF
+            info = {
+                'container': 'flac',
+                'codec': 'flac',
+                'duration_seconds': total_samples / sample_rate if sample_rate else None,
+                'sample_rate': sample_rate,
+                'channels': ((packed >> 41) & 0x7) + 1,
+                'bit_depth': ((packed >> 36) & 0x1F) + 1,
+            }
+        elif block_type == 4 and length <= HEAD_BYTES:  # VORBIS_COMMENT
+            bpm = _vorbis_comment_bpm(reader(offset + 4, length))
+        offset += 4 + length
+        if last:
+            break
+    if not info or not info['sample_rate']:
+        raise ProbeError("FLAC file has no STREAMINFO block")
+    info['bpm'] = bpm
+    return info
+
+
+# ---------------- MP3 ----------------
+MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+
+def _parse_mp3_header(header):
+    """Decode a 4-byte MPEG audio frame header, or None if it isn't one"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = {0: 2.5, 2: 2, 3: 1}.get((header[1] >> 3) & 0x3)
+    layer = {1: 3, 2: 2, 3: 1}.get((header[1] >> 1) & 0x3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index]
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x1
+    if layer == 1:
+        samples, frame_length = 384, (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or version == 1 else 576
+        frame_length = samples // 8 * bitrate * 1000 // sample_rate + padding
+    return {
+        'version': version,
+        'layer': layer,
+        'bit_rate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': 1 if (header[3] >> 6) == 3 else 2,
+        'samples': samples,
+        'frame_length': frame_length,
+    }
+
+
+def _find_mp3_frame(data, start):
+    """Offset of the first frame header in data[start:] that is followed by another valid frame"""
+    offset = data.find(b'\xff', start)
+    while 0 <= offset < len(data) - 4:
+        frame = _parse_mp3_header(data[offset:offset + 4])
+        if frame:
+            following = data[offset + frame['frame_length']:offset + frame['frame_length'] + 4]
+            if len(following) < 4 or _parse_mp3_header(following):
+                return offset
+        offset = data.find(b'\xff', offset + 1)
+    return None
+
+
+def _id3_bpm(tag, major_version):
+    """TBPM from an ID3v2.3/2.4 tag body"""
+    offset = 0
+    while offset + 10 <= len(tag):
+        frame_id = tag[offset:offset + 4]
+        if not frame_id.strip(b'\x00'):
+            break
+        raw_size = tag[offset + 4:offset + 8]
+        if major_version == 4:
+            size = (raw_size[0] << 21) | (raw_size[1] << 14) | (raw_size[2] << 7) | raw_size[3]
+        else:
+            size = struct.unpack('>I', raw_size)[0]
+        if frame_id == b'TBPM':
+            body = tag[offset + 10:offset + 10 + size]
+            encoding = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}.get(body[:1][0] if body else 0, 'latin-1')
+            return _parse_bpm(body[1:].decode(encoding, 'replace'))
+        offset += 10 + size
+    return None
+
+
+def _probe_mp3(reader):
+    audio_start = 0
+    bpm = None
+    head = reader.head
+    if head[:3] == b'ID3':
+        size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        audio_start = 10 + size + (10 if head[5] & 0x10 else 0)
+        if head[3] in (3, 4):
+            # Only frames ahead of embedded artwork are read - TBPM is almost always near the front
+            bpm = _id3_bpm(reader(10, min(size, HEAD_BYTES)), head[3])
+
+    # Tags with large embedded artwork push the first frame past the cached head - one more read
+    window = reader(audio_start, HEAD_BYTES)
+    offset = _find_mp3_frame(window, 0)
+    if offset is None:
+        raise ProbeError("No MPEG audio frame found")
+    frame_offset = audio_start + offset
+    frame = _parse_mp3_header(window[offset:offset + 4])
+    first = window[offset:offset + frame['frame_length']] if frame['frame_length'] <= len(window) - offset \
+        else reader(frame_offset, frame['frame_length'])
+
+    frames = stream_bytes = None
+    # Xing/Info header: after the side info in the first frame
+    side_info = (32 if frame['channels'] == 2 else 17) if frame['version'] == 1 else (17 if frame['channels'] == 2 else 9)
+    xing = first[4 + side_info:4 + side_info + 16]
+    if xing[:4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', xing[4:8])[0]
+        position = 8
+        if flags & 0x1:
+            frames = struct.unpack('>I', xing[position:position + 4])[0]
+            position += 4
+        if flags & 0x2:
+            stream_bytes = struct.unpack('>I', xing[position:position + 4])[0]
+    elif first[36:40] == b'VBRI':
+        stream_bytes, frames = struct.unpack('>II', first[46:54])
+
+    audio_size = reader.file_size - frame_offset
+    if reader.file_size > 128 and reader(reader.file_size - 128, 3) == b'TAG':
+        audio_size -= 128  # ID3v1 trailer
+
+    if frames:
+        duration = frames * frame['samples'] / frame['sample_rate']
+        bit_rate = int(round((stream_bytes or audio_size) * 8 / duration / 1000)) if duration else None
+    else:
+        bit_rate = frame['bit_rate']
+        duration = audio_size * 8 / (bit_rate * 1000)
+    return {
+        'container': 'mp3',
+        'codec': f"mpeg{frame['version']}-layer{frame['layer']}",
+        'duration_seconds': duration,
+        'bit_rate': bit_rate,
+        'sample_rate': frame['sample_rate'],
+        'channels': frame['channels'],
+        'bpm': bpm,
+    }
+
+
+# ---------------- OGG ----------------
+def _ogg_first_packet(data):
+    segments = data[26]
+    return data[27 + segments:]
+
+
+def _probe_ogg(reader):
+    packet = _ogg_first_packet(reader.head)
+    if packet[:7] == b'\x01vorbis':
+        channels = packet[11]
+        sample_rate, _, nominal_bitrate = struct.unpack('<IiI', packet[12:24])
+        info = {'container': 'ogg', 'codec': 'vorbis', 'sample_rate': sample_rate, 'channels': channels,
+                'bit_rate': int(round(nominal_bitrate / 1000)) if 0 < nominal_bitrate < 0xFFFFFFFF else None}
+        granule_rate, pre_skip = sample_rate, 0
+    elif packet[:8] == b'OpusHead':
+        channels = packet[9]
+        pre_skip, sample_rate = struct.unpack('<HI', packet[10:16])
+        info = {'container': 'ogg', 'codec': 'opus', 'sample_rate': sample_rate, 'channels': channels}
+        granule_rate = 48000  # Opus granule positions are always 48kHz
+    else:
+        raise UnsupportedAudio("Unsupported OGG codec")
+
+    # Duration is the granule position of the last page - read the tail only
+    tail_start = max(0, reader.file_size - HEAD_BYTES)
+    tail = reader(tail_start, reader.file_size - tail_start)
+    last_page = tail.rfind(b'OggS')
+    if last_page < 0 or len(tail) < last_page + 14 or not granule_rate:
+        raise ProbeError("OGG file has no final page")
+    granule = struct.unpack('<q', tail[last_page + 6:last_page + 14])[0]
+    info['duration_seconds'] = max(granule - pre_skip, 0) / granule_rate
+    return info
+
+
+# ---------------- M4A / ALAC ----------------
+def _atoms(reader, offset, end):
+    while offset + 8 <= end:
+        header = reader(offset, 8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', reader(offset + 8, 8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield kind, offset + header_size, offset + size
+        offset += size
+
+
+def _find_atom(reader, path, offset, end):
+    for kind, body, atom_end in _atoms(reader, offset, end):
+        if kind == path[0]:
+            return (body, atom_end) if len(path) == 1 else _find_atom(reader, path[1:], body, atom_end)
+    return None
+
+
+def _probe_mp4(reader):
+    moov = _find_atom(reader, [b'moov'], 0, reader.file_size)
+    if not moov:
+        raise ProbeError("MP4 file has no moov atom")
+    info = {'container': 'm4a', 'codec': None}
+
+    mvhd = _find_atom(reader, [b'mvhd'], *moov)
+    if mvhd:
+        data = reader(mvhd[0], 32)
+        if data[0] == 1:
+            timescale, duration = struct.unpack('>IQ', data[20:32])
+        else:
+            timescale, duration = struct.unpack('>II', data[12:20])
+        info['duration_seconds'] = duration / timescale if timescale else None
+
+    # Audio sample entry of the first track: codec, channels, bit depth, sample rate
+    stsd = _find_atom(reader, [b'trak', b'mdia', b'minf', b'stbl', b'stsd'], *moov)
+    if stsd:
+        entry = reader(stsd[0] + 8, 36)
+        if len(entry) >= 36:
+            info['codec'] = entry[4:8].decode('latin-1')
+            info['channels'], bits = struct.unpack('>HH', entry[24:28])
+            info['sample_rate'] = struct.unpack('>I', entry[32:36])[0] >> 16
+            if info['codec'] == 'alac':
+                info['bit_depth'] = bits
+    if not info.get('duration_seconds'):
+        raise ProbeError("MP4 file has no duration")
+    return info
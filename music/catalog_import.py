@@ -0,0 +1,356 @@
+import csv
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from common.models import Contact
+from licenses.models import License_type, TrackLicenseOptions
+from .listing import schedule_listing_refresh
+from .tags import sync_track_tags
+from .models import CatalogImport, Contribution, Contributor, FileFormat, MusicProfessional, Track, TrackStorageFile
+
+# Bulk catalog import
+# Manifest: one track per row, CSV (header row) or JSONL (one JSON object per line).
+#   - any Track field by name (title is required); list fields accept a JSON array or "a|b|c" in CSV
+#   - files: [{"path": "relative/to/audio_root.wav", "format": "WAV", "license_types": ["Basic"], "description": "..."}]
+#     CSV shorthand for a single file: file, file_format, license_types ("Basic|Premium"), file_description
+#   - contributors: [{"email": "...", "first_name": "...", "last_name": "...", "sudo_name": "...",
+#                     "role": "Producer", "contribution_type": "Creative"}]
+# Rows are validated and written in batches: files for the batch are uploaded concurrently, then
+# every table is written with bulk_create and the checkpoint is committed in the same transaction.
+
+MAX_STORED_ERRORS = 1000
+
+TRACK_FIELDS = [
+    'track_id', 'title', 'artists_features_line', 'isrc_code', 'upc_code', 'alternate_titles', 'version_subtitle',
+    'description', 'release_date', 'language', 'explicit_content', 'lyrics', 'bpm', 'key', 'time_signature',
+    'duration_seconds', 'genres', 'moods', 'keywords_tags', 'instruments', 'vocal_description', 'buy_link',
+    'stream_link', 'download_link', 'donation_link', 'note',
+]
+LIST_FIELDS = {'alternate_titles', 'genres', 'moods', 'keywords_tags', 'instruments'}
+ROLES = {choice for choice, _ in Contributor._meta.get_field('role').choices}
+CONTRIBUTION_TYPES = {choice for choice, _ in Contribution.CONTRIBUTION_TYPE_CHOICES}
+
+
+class RowError(Exception):
+    """A manifest row that can't be imported - recorded on the job and skipped"""
+
+
+def read_manifest(path):
+    """Stream manifest rows as dicts without loading the whole file"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == '.csv':
+            yield from csv.DictReader(f)
+        elif extension in ('.jsonl', '.ndjson'):
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    # keep row numbering stable - the row is rejected by validation
+                    yield {'__error__': f"Invalid JSON on line {line_number}: {e}"}
+        else:
+            raise ValueError(f"Unsupported manifest type '{extension}'. Use .csv or .jsonl")
+
+
+def _parse_list(value):
+    if value in (None, ''):
+        return []
+    if isinstance(value, list):
+        return value
+    value = str(value).strip()
+    if value.startswith('['):
+        return json.loads(value)
+    return [item.strip() for item in value.split('|') if item.strip()]
+
+
+def _parse_json(value, default):
+    if value in (None, ''):
+        return default
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+class CatalogImporter:
+    def __init__(self, job, batch_size=None, upload_workers=None, log=None):
+        self.job = job
+        self.audio_root = os.path.realpath(job.audio_root)
+        self.batch_size = batch_size or getattr(settings, 'CATALOG_IMPORT_BATCH_SIZE', 500)
+        self.upload_workers = upload_workers or getattr(settings, 'CATALOG_IMPORT_UPLOAD_WORKERS', 8)
+        self.log = log or (lambda message: None)
+        # Lookup tables are small and loaded once for the whole import
+        self.file_formats = {fmt.name.lower(): fmt for fmt in FileFormat.objects.all()}
+        self.license_types = {lt.license_type_name.lower(): lt for lt in License_type.objects.all()}
+        self.upload_to = TrackStorageFile._meta.get_field('file_path')
+
+    def run(self):
+        """Import the manifest, resuming after job.rows_processed. Returns the job."""
+        job = self.job
+        job.status = CatalogImport.Status.RUNNING
+        job.last_error = None
+        job.save(update_fields=['status', 'last_error', 'updated_at'])
+        try:
+            rows = islice(read_manifest(job.manifest_path), job.rows_processed, None)
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch, first_row=job.rows_processed + 1)
+                self.log(f"{job.rows_processed} rows processed, {job.tracks_created} tracks created")
+        except Exception as e:
+            job.status = CatalogImport.Status.FAILED
+            job.last_error = str(e)
+            job.save(update_fields=['status', 'last_error', 'updated_at'])
+            raise
+        job.status = CatalogImport.Status.COMPLETED
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at', 'updated_at'])
+        return job
+
+    # ---------------- validation ----------------
+    def validate_row(self, raw):
+        if raw.get('__error__'):
+            raise RowError(raw['__error__'])
+
+        track_values = {}
+        for name in TRACK_FIELDS:
+            value = raw.get(name)
+            if value in (None, ''):
+                continue
+            field = Track._meta.get_field(name)
+            try:
+                if name in LIST_FIELDS:
+                    value = _parse_list(value)
+                else:
+                    value = field.clean(value, None)
+            except (ValidationError, ValueError) as e:
+                messages = e.messages if isinstance(e, ValidationError) else [str(e)]
+                raise RowError(f"{name}: {' '.join(messages)}")
+            track_values[name] = value
+        if not track_values.get('title'):
+            raise RowError("title: This field is required.")
+        track_values.setdefault('track_id', uuid.uuid4())
+
+        try:
+            files = _parse_json(raw.get('files'), None)
+            if files is None and raw.get('file'):
+                files = [{
+                    'path': raw['file'],
+                    'format': raw.get('file_format'),
+                    'license_types': _parse_list(raw.get('license_types')),
+                    'description': raw.get('file_description'),
+                }]
+            contributors = _parse_json(raw.get('contributors'), [])
+        except json.JSONDecodeError as e:
+            raise RowError(f"Invalid JSON: {e}")
+
+        prepared_files = []
+        for spec in files or []:
+            file_format = self.file_formats.get(str(spec.get('format') or '').lower())
+            if not file_format:
+                raise RowError(f"Unknown file format '{spec.get('format')}'")
+            license_types = []
+            for name in spec.get('license_types') or []:
+                license_type = self.license_types.get(str(name).lower())
+                if not license_type:
+                    raise RowError(f"Unknown license type '{name}'")
+                license_types.append(license_type)
+            path = os.path.realpath(os.path.join(self.audio_root, str(spec.get('path') or '')))
+            if not path.startswith(self.audio_root + os.sep) or not os.path.isfile(path):
+                raise RowError(f"Audio file not found: {spec.get('path')}")
+            prepared_files.append({
+                'path': path,
+                'file_format': file_format,
+                'license_types': license_types,
+                'description': spec.get('description') or f"{track_values['title']} - {file_format.name}",
+                'bit_rate': spec.get('bit_rate'),
+            })
+
+        prepared_contributors = []
+        for spec in contributors:
+            if not spec.get('email'):
+                raise RowError("contributors: email is required")
+            if spec.get('role') and spec['role'] not in ROLES:
+                raise RowError(f"contributors: unknown role '{spec['role']}'")
+            if spec.get('contribution_type') and spec['contribution_type'] not in CONTRIBUTION_TYPES:
+                raise RowError(f"contributors: unknown contribution type '{spec['contribution_type']}'")
+            prepared_contributors.append({
+                'email': spec['email'].strip().lower(),
+                'first_name': spec.get('first_name', ''),
+                'last_name': spec.get('last_name', ''),
+                'sudo_name': spec.get('sudo_name'),
+                'role': spec.get('role') or 'Various',
+                'contribution_type': spec.get('contribution_type') or 'Various',
+            })
+
+        return {'track': Track(**track_values), 'files': prepared_files, 'contributors': prepared_contributors}
+
+    # ---------------- uploads ----------------
+    def _upload(self, path):
+        with open(path, 'rb') as f:
+            name = default_storage.save(self.upload_to.generate_filename(None, os.path.basename(path)), File(f))
+        return name, os.path.getsize(path)
+
+    def upload_files(self, paths):
+        """Upload files concurrently. Returns ({path: (storage_name, size)}, {path: error})"""
+        uploaded, failed = {}, {}
+        with ThreadPoolExecutor(max_workers=self.upload_workers) as pool:
+            futures = {path: pool.submit(self._upload, path) for path in paths}
+            for path, future in futures.items():
+                try:
+                    uploaded[path] = future.result()
+                except Exception as e:
+                    failed[path] = str(e)
+        return uploaded, failed
+
+    # ---------------- contributors ----------------
+    def resolve_contributors(self, rows):
+        """Map (email, role) -> Contributor, creating missing contacts/professionals/contributors in bulk"""
+        specs = {}
+        for row in rows:
+            for spec in row['contributors']:
+                specs.setdefault(spec['email'], spec)
+        if not specs:
+            return {}
+
+        contacts = {}
+        existing = Contact.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=specs.keys()).order_by('email')
+        for contact in existing:
+            contacts.setdefault(contact.email_lower, contact)
+        new_contacts = [
+            Contact(email=email, first_name=spec['first_name'], last_name=spec['last_name'], sudo_name=spec['sudo_name'])
+            for email, spec in specs.items() if email not in contacts
+        ]
+        Contact.objects.bulk_create(new_contacts)
+        contacts.update({contact.email: contact for contact in new_contacts})
+
+        professionals = {
+            professional.contact_id: professional
+            for professional in MusicProfessional.objects.filter(contact__in=contacts.values())
+        }
+        new_professionals = [
+            MusicProfessional(contact=contact) for contact in contacts.values() if contact.contact_id not in professionals
+        ]
+        MusicProfessional.objects.bulk_create(new_professionals)
+        professionals.update({professional.contact_id: professional for professional in new_professionals})
+
+        wanted = {
+            (spec['email'], spec['role'])
+            for row in rows for spec in row['contributors']
+        }
+        contributors = {}
+        professional_emails = {
+            professionals[contact.contact_id].professional_id: email for email, contact in contacts.items()
+        }
+        for contributor in Contributor.objects.filter(music_professional__in=professionals.values()).order_by('contributor_id'):
+            key = (professional_emails[contributor.music_professional_id], contributor.role)
+            contributors.setdefault(key, contributor)
+        new_contributors = [
+            Contributor(music_professional=professionals[contacts[email].contact_id], role=role)
+            for email, role in wanted if (email, role) not in contributors
+        ]
+        Contributor.objects.bulk_create(new_contributors)
+        for contributor in new_contributors:
+            contributors[(professional_emails[contributor.music_professional_id], contributor.role)] = contributor
+        return contributors
+
+    # ---------------- batch ----------------
+    def import_batch(self, batch, first_row):
+        errors = []
+        prepared = []
+        for offset, raw in enumerate(batch):
+            row_number = first_row + offset
+            try:
+                row = self.validate_row(raw)
+            except RowError as e:
+                errors.append({'row': row_number, 'error': str(e)})
+                continue
+            row['row'] = row_number
+            prepared.append(row)
+
+        # Rows already imported (explicit track_id seen before) are rejected rather than duplicated
+        existing = set(
+            Track.objects.filter(track_id__in=[row['track'].track_id for row in prepared]).values_list('track_id', flat=True)
+        )
+        if existing:
+            errors += [{'row': row['row'], 'error': f"Track {row['track'].track_id} already exists"}
+                       for row in prepared if row['track'].track_id in existing]
+            prepared = [row for row in prepared if row['track'].track_id not in existing]
+
+        uploaded, failed = self.upload_files({spec['path'] for row in prepared for spec in row['files']})
+        if failed:
+            kept = []
+            for row in prepared:
+                failures = [failed[spec['path']] for spec in row['files'] if spec['path'] in failed]
+                if failures:
+                    errors.append({'row': row['row'], 'error': f"Upload failed: {failures[0]}"})
+                else:
+                    kept.append(row)
+            prepared = kept
+
+        with transaction.atomic():
+            contributors = self.resolve_contributors(prepared)
+            tracks, storage_files, options, contributions = [], [], [], []
+            for row in prepared:
+                track = row['track']
+                tracks.append(track)
+                for spec in row['files']:
+                    storage_name, size = uploaded[spec['path']]
+                    storage_file = TrackStorageFile(
+                        description=spec['description'],
+                        file_path=storage_name,
+                        file_format=spec['file_format'],
+                        bit_rate=spec['bit_rate'],
+                        file_size=size,
+                    )
+                    storage_files.append(storage_file)
+                    options += [
+                        TrackLicenseOptions(track=track, track_storage_file=storage_file, license_type=license_type)
+                        for license_type in spec['license_types']
+                    ]
+                for spec in row['contributors']:
+                    contributions.append(Contribution(
+                        contributor=contributors[(spec['email'], spec['role'])],
+                        track=track,
+                        contribution_type=spec['contribution_type'],
+                        contribution_date=track.release_date,
+                    ))
+
+            Track.objects.bulk_create(tracks)
+            TrackStorageFile.objects.bulk_create(storage_files)
+            TrackLicenseOptions.objects.bulk_create(options)
+            Contribution.objects.bulk_create(contributions)
+            sync_track_tags(tracks)
+
+            job = self.job
+            job.rows_processed += len(batch)
+            job.tracks_created += len(tracks)
+            job.files_uploaded += len(uploaded)
+            job.error_count += len(errors)
+            job.errors = (job.errors + errors)[:MAX_STORED_ERRORS]
+            job.save(update_fields=['rows_processed', 'tracks_created', 'files_uploaded', 'error_count', 'errors', 'updated_at'])
+
+            # bulk_create skips post_save, so tags are synced above and the listing/metadata probe queued here
+            schedule_listing_refresh([track.track_id for track in tracks])
+            if storage_files:
+                from .tasks import probe_storage_files_task
+                storage_file_ids = [str(storage_file.track_storage_file_id) for storage_file in storage_files]
+                transaction.on_commit(lambda: probe_storage_files_task.delay(storage_file_ids))
+
+
+def run_import(job, **kwargs):
+    """Run (or resume) an import job"""
+    return CatalogImporter(job, **kwargs).run()
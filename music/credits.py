@@ -0,0 +1,176 @@
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Prefetch
+from django.http import Http404
+
+from .models import Contribution, MusicProfessional, SocialMediaLink, Track
+
+logger = logging.getLogger(__name__)
+
+# Credits graph: Contribution -> Contributor -> MusicProfessional -> Contact -> SocialMediaLink
+# Each graph is built from a fixed number of queries (one join for the contribution chain, one for
+# the social links) and cached. Any write to a model in the chain bumps CREDITS_VERSION_KEY, which
+# retires every cached graph at once - a contact rename has to show up on all of that person's tracks.
+# Version and graphs live in the settings.CREDITS_CACHE cache, shared by every web and Celery worker,
+# so a write in any process (an admin save, a catalog import) invalidates the graphs everywhere. If
+# that cache is unreachable graphs are built uncached, and a missed invalidation only lasts until the
+# CREDITS_CACHE_SECONDS expiry.
+
+CREDITS_VERSION_KEY = 'credits:version'
+
+SOCIAL_LINKS = Prefetch(
+    'contributor__music_professional__social_media_links',
+    queryset=SocialMediaLink.objects.only('social_media_id', 'url', 'platform', 'music_professional_id').order_by('platform'),
+)
+
+
+def credits_cache():
+    return caches[getattr(settings, 'CREDITS_CACHE', 'default')]
+
+
+def _version(cache):
+    version = cache.get(CREDITS_VERSION_KEY)
+    if version is None:
+        cache.add(CREDITS_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CREDITS_VERSION_KEY, 1)
+    return version
+
+
+def invalidate_credits():
+    cache = credits_cache()
+    try:
+        try:
+            cache.incr(CREDITS_VERSION_KEY)
+        except ValueError:  # key missing/evicted - nothing cached under the old version can be trusted either
+            cache.set(CREDITS_VERSION_KEY, 2, timeout=None)
+    except Exception as e:
+        logger.warning(f"Credits cache unavailable, cached graphs expire on their own: {str(e)}")
+
+
+def _cached(key, build):
+    cache = credits_cache()
+    try:
+        key = f"credits:v{_version(cache)}:{key}"
+        data = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Credits cache unavailable, building uncached: {str(e)}")
+        return build()
+    if data is None:
+        data = build()
+        try:
+            cache.set(key, data, getattr(settings, 'CREDITS_CACHE_SECONDS', 3600))
+        except Exception as e:
+            logger.warning(f"Credits cache unavailable: {str(e)}")
+    return data
+
+
+def _professional(professional):
+    contact = professional.contact
+    return {
+        'professional_id': str(professional.professional_id),
+        'name': contact.sudo_name or f"{contact.first_name} {contact.last_name}".strip() or contact.company_name,
+        'first_name': contact.first_name,
+        'last_name': contact.last_name,
+        'sudo_name': contact.sudo_name,
+        'company_name': contact.company_name,
+        'pro_affiliation': professional.pro_affiliation,
+        'ipi_number': professional.ipi_number,
+        'ref_code': professional.ref_code,
+        'social_media_links': [
+            {'platform': link.platform, 'url': link.url} for link in professional.social_media_links.all()
+        ],
+    }
+
+
+def _contribution(contribution):
+    return {
+        'contribution_id': str(contribution.contribution_id),
+        'role': contribution.contributor.role,
+        'contribution_type': contribution.contribution_type,
+        'description': contribution.contribution_description,
+        'date': contribution.contribution_date.isoformat() if contribution.contribution_date else None,
+    }
+
+
+def build_track_credits(track_id):
+    """Everyone credited on a track, grouped per professional (3 queries)"""
+    track = Track.objects.filter(track_id=track_id).only('track_id', 'title', 'artists_features_line').first()
+    if track is None:
+        raise Http404("Track not found")
+    contributions = (
+        Contribution.objects
+        .filter(track=track)
+        .select_related('contributor__music_professional__contact')
+        .prefetch_related(SOCIAL_LINKS)
+        .order_by('contributor__role', 'contribution_date', 'contribution_id')
+    )
+    credits = {}
+    for contribution in contributions:
+        professional = contribution.contributor.music_professional
+        entry = credits.get(professional.professional_id)
+        if entry is None:
+            entry = credits[professional.professional_id] = {**_professional(professional), 'contributions': []}
+        entry['contributions'].append(_contribution(contribution))
+    return {
+        'track': {
+            'track_id': str(track.track_id),
+            'title': track.title,
+            'artists_features_line': track.artists_features_line,
+        },
+        'credits': list(credits.values()),
+    }
+
+
+def build_professional_credits(professional_id):
+    """A professional with every track they're credited on (3 queries)"""
+    professional = (
+        MusicProfessional.objects
+        .select_related('contact')
+        .prefetch_related(Prefetch('social_media_links', queryset=SOCIAL_LINKS.queryset))
+        .filter(professional_id=professional_id)
+        .first()
+    )
+    if professional is None:
+        raise Http404("Music professional not found")
+    contributions = (
+        Contribution.objects
+        .filter(contributor__music_professional=professional)
+        .select_related('contributor', 'track')
+        .only(
+            'contribution_id', 'contribution_type', 'contribution_description', 'contribution_date',
+            'contributor', 'track', 'contributor__role', 'track__track_id', 'track__title', 'track__artists_features_line',
+        )
+        .order_by('-track__release_date', 'track__title', 'contribution_id')
+    )
+    tracks = {}
+    for contribution in contributions:
+        entry = tracks.get(contribution.track_id)
+        if entry is None:
+            entry = tracks[contribution.track_id] = {
+                'track_id': str(contribution.track.track_id),
+                'title': contribution.track.title,
+                'artists_features_line': contribution.track.artists_features_line,
+                'contributions': [],
+            }
+        entry['contributions'].append(_contribution(contribution))
+    return {'professional': _professional(professional), 'credits': list(tracks.values())}
+
+
+def _uuid_or_404(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise Http404("Not found")
+
+
+def track_credits(track_id):
+    track_id = _uuid_or_404(track_id)
+    return _cached(f"track:{track_id}", lambda: build_track_credits(track_id))
+
+
+def professional_credits(professional_id):
+    professional_id = _uuid_or_404(professional_id)
+    return _cached(f"professional:{professional_id}", lambda: build_professional_credits(professional_id))
@@ -0,0 +1,165 @@
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from PIL import Image, ImageOps, features
+
+from .models import Track
+
+# Responsive image variants for Track.thumbnail / vinyl_thumbnail / cover_art
+# Each uploaded image is resized to fixed widths (never upscaled) and encoded as AVIF, WebP and JPEG.
+# Variant names carry a content hash, so they're uploaded with an immutable cache header and a new
+# upload simply gets new names. The result is recorded on Track.image_variants:
+#   {"cover_art": {"source": "cover_arts/x.png", "width": 3000, "height": 3000,
+#                  "variants": {"webp": [{"width": 320, "height": 320, "name": "image_variants/..."}, ...], ...}}}
+
+IMAGE_FIELDS = ('thumbnail', 'vinyl_thumbnail', 'cover_art')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# format -> (file extension, Pillow save options). Ordered best compression first, JPEG last as the fallback.
+ENCODERS = {
+    'avif': ('avif', {'quality': 60, 'speed': 6}),
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_widths():
+    return sorted(getattr(settings, 'IMAGE_VARIANT_WIDTHS', (160, 320, 640, 1280)))
+
+
+def variant_formats():
+    formats = getattr(settings, 'IMAGE_VARIANT_FORMATS', tuple(ENCODERS))
+    # AVIF needs a Pillow build with libavif
+    return [fmt for fmt in formats if fmt != 'avif' or features.check('avif')]
+
+
+def variant_storage():
+    """Default storage, but uploading with a long-lived immutable Cache-Control on S3"""
+    if hasattr(default_storage, 'get_object_parameters'):
+        parameters = {**default_storage.object_parameters, 'CacheControl': IMMUTABLE_CACHE_CONTROL}
+        return default_storage.__class__(object_parameters=parameters)
+    return default_storage
+
+
+def _flatten(image):
+    """RGB copy for JPEG, with transparency composited on white"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(data):
+    """Returns ((width, height), [(format, width, height, bytes), ...]) for every variant of an image"""
+    largest = variant_widths()[-1]
+    with Image.open(io.BytesIO(data)) as source:
+        original = source.size
+        if source.getexif().get(0x0112, 1) in (5, 6, 7, 8):  # EXIF orientation rotated by 90 degrees
+            original = original[::-1]
+        if source.format == 'JPEG':
+            source.draft('RGB', (largest, largest * 4))  # decode at reduced scale when possible
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    widths = [width for width in variant_widths() if width < image.width]
+    if image.width <= largest:
+        widths.append(image.width)  # small originals top the srcset at their own size
+    rendered = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt in variant_formats():
+            options = ENCODERS[fmt][1]
+            buffer = io.BytesIO()
+            (_flatten(resized) if fmt == 'jpeg' else resized).save(buffer, format=fmt.upper(), **options)
+            rendered.append((fmt, width, height, buffer.getvalue()))
+    return original, rendered
+
+
+def build_variants(field_file, field_name):
+    """Render and upload all variants of one image field. Returns its image_variants entry."""
+    with field_file.storage.open(field_file.name, 'rb') as f:
+        (width, height), rendered = render_variants(f.read())
+
+    storage = variant_storage()
+    variants = {}
+    for fmt, variant_width, variant_height, content in rendered:
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        name = f"image_variants/{field_name}/{digest}-{variant_width}.{ENCODERS[fmt][0]}"
+        if not storage.exists(name):  # identical content is already uploaded under the same name
+            name = storage.save(name, ContentFile(content))
+        variants.setdefault(fmt, []).append({'width': variant_width, 'height': variant_height, 'name': name})
+    return {'source': field_file.name, 'width': width, 'height': height, 'variants': variants}
+
+
+def _variant_names(entry):
+    return {variant['name'] for variants in (entry or {}).get('variants', {}).values() for variant in variants}
+
+
+def stale_image_fields(track):
+    """Image fields whose variants are missing or were built from a different upload"""
+    current = track.image_variants or {}
+    stale = []
+    for field_name in IMAGE_FIELDS:
+        field_file = getattr(track, field_name)
+        entry = current.get(field_name)
+        if field_file and (not entry or entry.get('source') != field_file.name):
+            stale.append(field_name)
+        elif not field_file and entry:
+            stale.append(field_name)
+    return stale
+
+
+def update_image_variants(track, force=False):
+    """(Re)build variants for the track's changed images and delete the ones they replace"""
+    fields = list(IMAGE_FIELDS) if force else stale_image_fields(track)
+    if not fields:
+        return []
+    variants = dict(track.image_variants or {})
+    replaced = set()
+    for field_name in fields:
+        field_file = getattr(track, field_name)
+        old = variants.pop(field_name, None)
+        if field_file:
+            variants[field_name] = build_variants(field_file, field_name)
+        replaced |= _variant_names(old) - _variant_names(variants.get(field_name))
+
+    track.image_variants = variants
+    track.save(update_fields=['image_variants'])
+
+    if replaced:
+        # Another track may use an identical image (same content -> same name)
+        still_used = set()
+        shared = Q()
+        for name in replaced:
+            shared |= Q(image_variants__icontains=name)
+        for other in Track.objects.exclude(pk=track.pk).filter(shared).values_list('image_variants', flat=True):
+            for entry in other.values():
+                still_used |= _variant_names(entry)
+        storage = variant_storage()
+        for name in replaced - still_used:
+            storage.delete(name)
+    return fields
+
+
+def srcset_map(image_variants, field_name):
+    """Serializer representation: per format a srcset string, plus a JPEG src fallback"""
+    entry = (image_variants or {}).get(field_name)
+    if not entry:
+        return None
+    storage = default_storage
+    result = {'width': entry['width'], 'height': entry['height'], 'srcset': {}}
+    for fmt, variants in entry['variants'].items():
+        urls = [(variant['width'], storage.url(variant['name'])) for variant in sorted(variants, key=lambda v: v['width'])]
+        result['srcset'][fmt] = ', '.join(f"{url} {width}w" for width, url in urls)
+        if fmt == 'jpeg':
+            result['src'] = urls[-1][1]
+    return result
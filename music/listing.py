@@ -0,0 +1,166 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .models import Contribution, Track, TrackAsset, TrackListing
+
+# TrackListing read model
+# Rows are rebuilt per track from a fixed set of grouped queries (tracks, license options with prices
+# and formats, credits, previews) whatever the batch size, then swapped in with one delete + bulk insert.
+# Catalog signals call schedule_listing_refresh() with the affected track ids. The ids are collected on
+# the database connection and the refresh runs once per transaction after commit, so an admin save
+# (track, contributors, license options) or an import batch costs one rebuild of its tracks.
+#
+# This is a plain table on every backend rather than a PostgreSQL materialized view: a view can only
+# be refreshed as a whole, while catalog edits only ever touch a handful of tracks.
+
+BATCH_SIZE = 500
+
+# Credit roles in the order they qualify as the track's primary artist
+PRIMARY_ARTIST_ROLES = ['Singer', 'Performer', 'Producer', 'Composer', 'Songwriter', 'Lyricist', 'Various', 'Other', 'Engineer']
+
+LISTING_IMAGE_FIELDS = ('thumbnail', 'cover_art')
+
+_pending = threading.local()
+
+
+def _display_name(first_name, last_name, sudo_name, company_name):
+    return sudo_name or f"{first_name or ''} {last_name or ''}".strip() or company_name or ''
+
+
+def build_listings(track_ids):
+    """Unsaved TrackListing rows for the given tracks (5 queries)"""
+    from licenses.models import TrackLicenseOptions
+
+    tracks = list(Track.objects.filter(track_id__in=track_ids).only(
+        'track_id', 'title', 'artists_features_line', 'release_date', 'explicit_content', 'bpm', 'key',
+        'duration_seconds', 'genres', 'moods', 'image_variants',
+    ))
+    if not tracks:
+        return []
+    ids = [track.track_id for track in tracks]
+
+    prices, formats = {}, {}
+    options = (
+        TrackLicenseOptions.objects
+        .filter(track_id__in=ids)
+        .values_list('track_id', 'license_type__price', 'license_type__currency', 'track_storage_file__file_format__name')
+    )
+    for track_id, price, currency, format_name in options:
+        if price is not None and (track_id not in prices or price < prices[track_id][0]):
+            prices[track_id] = (price, currency)
+        formats.setdefault(track_id, set()).add(format_name)
+
+    artists = {}
+    credits = (
+        Contribution.objects
+        .filter(track_id__in=ids)
+        .values_list(
+            'track_id', 'contributor__role',
+            'contributor__music_professional__contact__first_name',
+            'contributor__music_professional__contact__last_name',
+            'contributor__music_professional__contact__sudo_name',
+            'contributor__music_professional__contact__company_name',
+        )
+    )
+    for track_id, role, *names in credits:
+        rank = PRIMARY_ARTIST_ROLES.index(role) if role in PRIMARY_ARTIST_ROLES else len(PRIMARY_ARTIST_ROLES)
+        name = _display_name(*names)
+        if name and (track_id not in artists or rank < artists[track_id][0]):
+            artists[track_id] = (rank, name)
+
+    previews = dict(
+        TrackAsset.objects.filter(track_id__in=ids, kind=TrackAsset.Kind.PREVIEW).values_list('track_id', 'file')
+    )
+
+    listings = []
+    for track in tracks:
+        price, currency = prices.get(track.track_id, (None, ''))
+        variants = track.image_variants or {}
+        listings.append(TrackListing(
+            track=track,
+            title=track.title,
+            artists_features_line=track.artists_features_line,
+            primary_artist=artists.get(track.track_id, (None, track.artists_features_line or ''))[1],
+            release_date=track.release_date,
+            explicit_content=track.explicit_content,
+            bpm=track.bpm,
+            key=track.key,
+            duration_seconds=track.duration_seconds,
+            genres=track.genres or [],
+            moods=track.moods or [],
+            min_price=price,
+            currency=currency or '',
+            formats=sorted(formats.get(track.track_id, [])),
+            image_variants={field: variants[field] for field in LISTING_IMAGE_FIELDS if field in variants},
+            preview_name=previews.get(track.track_id) or '',
+        ))
+    return listings
+
+
+def refresh_track_listings(track_ids):
+    """Rebuild the listing rows of the given tracks (deleted tracks simply lose their row)"""
+    track_ids = list(set(track_ids))
+    refreshed = 0
+    for start in range(0, len(track_ids), BATCH_SIZE):
+        batch = track_ids[start:start + BATCH_SIZE]
+        with transaction.atomic():
+            listings = build_listings(batch)
+            TrackListing.objects.filter(track_id__in=batch).delete()
+            refreshed += len(TrackListing.objects.bulk_create(listings))
+    return refreshed
+
+
+def rebuild_all_listings():
+    track_ids = list(Track.objects.values_list('track_id', flat=True))
+    TrackListing.objects.exclude(track_id__in=track_ids).delete()
+    return refresh_track_listings(track_ids)
+
+
+class _PendingRefresh:
+    """The on_commit callback of one transaction, collecting the track ids scheduled in it"""
+
+    def __init__(self):
+        self.track_ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        refresh_track_listings(self.track_ids)
+
+
+def schedule_listing_refresh(track_ids):
+    """Queue tracks for a listing refresh once the current transaction commits"""
+    track_ids = {track_id for track_id in track_ids if track_id is not None}
+    if not track_ids:
+        return
+    pending = getattr(_pending, 'track_ids', None)
+    if pending is not None:
+        pending.update(track_ids)
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        refresh_track_listings(track_ids)
+        return
+    refresh = getattr(connection, 'pending_listing_refresh', None)
+    # A rollback drops the registered callback with the transaction, so it is looked up, not assumed
+    if refresh is None or refresh.done or not any(entry[1] is refresh for entry in connection.run_on_commit):
+        refresh = connection.pending_listing_refresh = _PendingRefresh()
+        transaction.on_commit(refresh)
+    refresh.track_ids.update(track_ids)
+
+
+@contextmanager
+def deferred_listing_refresh():
+    """Collect refreshes from many writes (e.g. seeding or admin bulk actions) into one rebuild on exit"""
+    if getattr(_pending, 'track_ids', None) is not None:
+        yield
+        return
+    _pending.track_ids = set()
+    try:
+        yield
+        track_ids = _pending.track_ids
+    finally:
+        _pending.track_ids = None
+    schedule_listing_refresh(track_ids)
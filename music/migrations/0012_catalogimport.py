@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:09
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0011_rename_created_at_fileformat_created_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogImport',
+            fields=[
+                ('import_id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for the import.', primary_key=True, serialize=False)),
+                ('manifest_path', models.CharField(help_text='Server path of the CSV or JSONL manifest.', max_length=1024)),
+                ('audio_root', models.CharField(help_text='Server directory the manifest file paths are relative to.', max_length=1024)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('rows_processed', models.PositiveIntegerField(default=0, help_text='Manifest rows already handled (imported or rejected). Resume starts after this row.')),
+                ('tracks_created', models.PositiveIntegerField(default=0)),
+                ('files_uploaded', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list, help_text="Per-row errors as {'row': n, 'error': '...'} (capped).")),
+                ('last_error', models.TextField(blank=True, help_text='The error that stopped the import, if it failed.', null=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0012_catalogimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackstoragefile',
+            name='bit_depth',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='The bit depth of the audio file (lossless formats only).', null=True),
+        ),
+        migrations.AddField(
+            model_name='trackstoragefile',
+            name='channels',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='The number of audio channels.', null=True),
+        ),
+        migrations.AddField(
+            model_name='trackstoragefile',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, help_text='The duration of the audio file (in seconds).', null=True),
+        ),
+        migrations.AddField(
+            model_name='trackstoragefile',
+            name='probe_issues',
+            field=models.JSONField(blank=True, default=list, help_text='Mismatches between the probed file and its file format, or the probe error.'),
+        ),
+        migrations.AddField(
+            model_name='trackstoragefile',
+            name='probe_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('OK', 'OK'), ('MISMATCH', 'Format mismatch'), ('UNSUPPORTED', 'Unsupported'), ('FAILED', 'Failed')], default='PENDING', help_text='Result of the last metadata probe.', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='trackstoragefile',
+            name='probed_at',
+            field=models.DateTimeField(blank=True, help_text='When the file was last probed.', null=True),
+        ),
+        migrations.AddField(
+            model_name='trackstoragefile',
+            name='sample_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='The sample rate of the audio file (in Hz).', null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:15
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0013_trackstoragefile_probe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackAsset',
+            fields=[
+                ('track_asset_id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique identifier for the track asset.', primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('WAVEFORM', 'Waveform peaks'), ('PREVIEW', 'Preview clip')], help_text='The type of derived asset.', max_length=10)),
+                ('file', models.FileField(help_text='The derived file. Names carry a content hash so they can be cached forever.', upload_to='track_assets')),
+                ('content_type', models.CharField(help_text='MIME type served for the asset.', max_length=50)),
+                ('content_hash', models.CharField(help_text='SHA-256 of the file, used as the ETag.', max_length=64)),
+                ('file_size', models.PositiveIntegerField(default=0, help_text='The size of the asset (in bytes).')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('source', models.ForeignKey(blank=True, help_text='The storage file the asset was generated from.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='derived_assets', to='music.trackstoragefile')),
+                ('track', models.ForeignKey(help_text='The track the asset was derived from.', on_delete=django.db.models.deletion.CASCADE, related_name='assets', to='music.track')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('track', 'kind'), name='unique_track_asset_kind')],
+            },
+        ),
+    ]
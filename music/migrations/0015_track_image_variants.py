@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0014_trackasset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='track',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized AVIF/WebP/JPEG variants of the images above (see music/images.py).'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Make the existing music_library_tracks table an explicit through model (state only),
+    then add the added_date column and the (library, id) index used for cursor pagination.
+    """
+
+    dependencies = [
+        ('music', '0015_track_image_variants'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='LibraryTrack',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('library', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='library_tracks', to='music.library')),
+                        ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='library_tracks', to='music.track')),
+                    ],
+                    options={
+                        'db_table': 'music_library_tracks',
+                        'unique_together': {('library', 'track')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='library',
+                    name='tracks',
+                    field=models.ManyToManyField(related_name='libraries', through='music.LibraryTrack', to='music.track'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='librarytrack',
+            name='added_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When the track was added to the library.'),
+        ),
+        migrations.AddIndex(
+            model_name='librarytrack',
+            index=models.Index(fields=['library', 'id'], name='library_track_order_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0016_librarytrack'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackListing',
+            fields=[
+                ('track', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='music.track')),
+                ('title', models.CharField(max_length=255)),
+                ('artists_features_line', models.CharField(blank=True, max_length=255, null=True)),
+                ('primary_artist', models.CharField(blank=True, default='', help_text='Display name of the main credited artist.', max_length=255)),
+                ('release_date', models.DateField()),
+                ('explicit_content', models.BooleanField(default=False)),
+                ('bpm', models.IntegerField(blank=True, null=True)),
+                ('key', models.CharField(blank=True, max_length=50, null=True)),
+                ('duration_seconds', models.IntegerField(blank=True, null=True)),
+                ('genres', models.JSONField(blank=True, default=list)),
+                ('moods', models.JSONField(blank=True, default=list)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, help_text="Cheapest license price for the track (null if it can't be licensed).", max_digits=10, null=True)),
+                ('currency', models.CharField(blank=True, default='', max_length=10)),
+                ('formats', models.JSONField(blank=True, default=list, help_text='Names of the file formats the track is sold in.')),
+                ('image_variants', models.JSONField(blank=True, default=dict, help_text='Thumbnail and cover art entries copied from Track.image_variants.')),
+                ('preview_name', models.CharField(blank=True, default='', help_text='Storage name of the preview clip.', max_length=255)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-release_date', 'track'], name='track_listing_order_idx')],
+            },
+        ),
+    ]
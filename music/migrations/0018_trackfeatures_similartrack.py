@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0017_tracklisting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackFeatures',
+            fields=[
+                ('track', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='features', serialize=False, to='music.track')),
+                ('vector', models.BinaryField(help_text='Packed sparse vector: uint16 dimensions followed by float32 weights.')),
+                ('signature', models.CharField(help_text='Hash of the attribute values the vector was encoded from.', max_length=64)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SimilarTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Cosine similarity, 0 to 1.')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='music.track')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_tracks', to='music.track')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['track', '-score'], name='similar_track_rank_idx')],
+                'unique_together': {('track', 'similar')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0018_trackfeatures_similartrack'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('genre', 'Genre'), ('mood', 'Mood'), ('keyword', 'Keyword'), ('instrument', 'Instrument')], max_length=20)),
+                ('slug', models.CharField(help_text='Normalized value: lowercase with collapsed whitespace.', max_length=100)),
+                ('name', models.CharField(help_text='Display value, as first seen on a track.', max_length=100)),
+            ],
+            options={
+                'unique_together': {('kind', 'slug')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TrackTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_tags', to='music.tag')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_tags', to='music.track')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'track'], name='tag_track_idx')],
+                'unique_together': {('track', 'tag')},
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# Self-contained copy of music/tags.py normalization: migrations must not import app code
+TAG_FIELDS = {'genre': 'genres', 'mood': 'moods', 'keyword': 'keywords_tags', 'instrument': 'instruments'}
+BATCH_SIZE = 500
+
+
+def backfill_track_tags(apps, schema_editor):
+    Track = apps.get_model('music', 'Track')
+    Tag = apps.get_model('music', 'Tag')
+    TrackTag = apps.get_model('music', 'TrackTag')
+
+    tag_ids = {(kind, slug): pk for pk, kind, slug in Tag.objects.values_list('pk', 'kind', 'slug')}
+    tracks = Track.objects.only('track_id', *TAG_FIELDS.values()).order_by('pk')
+    batch = []
+    for track in tracks.iterator(chunk_size=BATCH_SIZE):
+        batch.append(track)
+        if len(batch) == BATCH_SIZE:
+            _backfill_batch(batch, tag_ids, Tag, TrackTag)
+            batch = []
+    if batch:
+        _backfill_batch(batch, tag_ids, Tag, TrackTag)
+
+
+def _backfill_batch(tracks, tag_ids, Tag, TrackTag):
+    pairs = set()
+    new_tags = {}
+    for track in tracks:
+        for kind, field in TAG_FIELDS.items():
+            for value in getattr(track, field) or []:
+                if not isinstance(value, str):
+                    continue
+                name = ' '.join(value.split())[:100]
+                if not name:
+                    continue
+                key = (kind, name.lower())
+                if key not in tag_ids:
+                    new_tags.setdefault(key, name)
+                pairs.add((track.track_id, key))
+    if new_tags:
+        Tag.objects.bulk_create([Tag(kind=kind, slug=slug, name=name) for (kind, slug), name in new_tags.items()])
+        slugs = {slug for _, slug in new_tags}
+        tag_ids.update({
+            (kind, slug): pk for pk, kind, slug in Tag.objects.filter(slug__in=slugs).values_list('pk', 'kind', 'slug')
+        })
+    TrackTag.objects.bulk_create(
+        [TrackTag(track_id=track_id, tag_id=tag_ids[key]) for track_id, key in pairs], ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0019_tag_tracktag'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_track_tags, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,9 @@ from django.conf import settings
 from common.models import Contact
 from custom_users.models import CustomUser
 from django.utils import timezone
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 
 class Track(models.Model):
@@ -28,6 +31,8 @@ class Track(models.Model):
                                         help_text="The vinyl thumbnail image of the song.") 
     cover_art = models.ImageField(upload_to='cover_arts/', blank=True, null=True,
                                   help_text="The cover art image of the song.")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False,
+                                  help_text="Resized AVIF/WebP/JPEG variants of the images above (see music/images.py).")
     title = models.CharField(max_length=255,
                              help_text="The primary title of the song.")
     alternate_titles = models.JSONField(default=list, blank=True, null=True,
@@ -128,6 +133,13 @@ class TrackStorageFile(models.Model):
     Represents an audio file and its path. Check TrackLicenseOptions for a joint table between Track and TrackStorageFile.
     """
     # includes samples, stems with vocals, mix
+    class ProbeStatus(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        OK = 'OK', 'OK'
+        MISMATCH = 'MISMATCH', 'Format mismatch'
+        UNSUPPORTED = 'UNSUPPORTED', 'Unsupported'
+        FAILED = 'FAILED', 'Failed'
+
     track_storage_file_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False,
                                     help_text="Unique identifier for the track storage file.")
     description = models.CharField(max_length=255, blank=True, null=True,
@@ -140,12 +152,172 @@ class TrackStorageFile(models.Model):
                                   help_text="The bit rate of the audio file of the song (in kbps).")
     file_size = models.BigIntegerField(blank=True, null=True,
                                   help_text="The file size of the audio file of the song (in bytes).")
+    # Filled in by the ingest probe (music/audio_probe.py) from the file headers
+    sample_rate = models.PositiveIntegerField(blank=True, null=True,
+                                  help_text="The sample rate of the audio file (in Hz).")
+    bit_depth = models.PositiveSmallIntegerField(blank=True, null=True,
+                                  help_text="The bit depth of the audio file (lossless formats only).")
+    channels = models.PositiveSmallIntegerField(blank=True, null=True,
+                                  help_text="The number of audio channels.")
+    duration_seconds = models.FloatField(blank=True, null=True,
+                                  help_text="The duration of the audio file (in seconds).")
+    probe_status = models.CharField(max_length=12, choices=ProbeStatus.choices, default=ProbeStatus.PENDING,
+                                  help_text="Result of the last metadata probe.")
+    probe_issues = models.JSONField(default=list, blank=True,
+                                  help_text="Mismatches between the probed file and its file format, or the probe error.")
+    probed_at = models.DateTimeField(blank=True, null=True,
+                                  help_text="When the file was last probed.")
     created_date = models.DateTimeField(auto_now_add=True,
                                      help_text="The date the file was created/uploaded.")
 
     def __str__(self):
         return str(self.track_storage_file_id) + " - " + str(self.created_date)
 
+class TrackAsset(models.Model):
+    """
+    A file derived from a track's master audio for the storefront player (waveform peaks, preview clip).
+    Regenerated by music/assets.py whenever the source file changes.
+    """
+    class Kind(models.TextChoices):
+        WAVEFORM = 'WAVEFORM', 'Waveform peaks'
+        PREVIEW = 'PREVIEW', 'Preview clip'
+
+    track_asset_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False,
+                                    help_text="Unique identifier for the track asset.")
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='assets',
+                              help_text="The track the asset was derived from.")
+    kind = models.CharField(max_length=10, choices=Kind.choices,
+                            help_text="The type of derived asset.")
+    file = models.FileField(upload_to='track_assets',
+                            help_text="The derived file. Names carry a content hash so they can be cached forever.")
+    content_type = models.CharField(max_length=50,
+                                    help_text="MIME type served for the asset.")
+    content_hash = models.CharField(max_length=64,
+                                    help_text="SHA-256 of the file, used as the ETag.")
+    file_size = models.PositiveIntegerField(default=0,
+                                    help_text="The size of the asset (in bytes).")
+    source = models.ForeignKey(TrackStorageFile, on_delete=models.SET_NULL, null=True, blank=True, related_name='derived_assets',
+                               help_text="The storage file the asset was generated from.")
+    created_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['track', 'kind'], name='unique_track_asset_kind'),
+        ]
+
+    def __str__(self):
+        return f"{self.track_id} - {self.kind}"
+
+
+class TrackListing(models.Model):
+    """
+    Denormalized storefront row per track: track fields plus cheapest price, available formats,
+    primary artist and artwork/preview derivatives. Maintained by music/listing.py whenever the
+    catalog changes, so the grid is served from this table alone.
+    """
+    track = models.OneToOneField(Track, on_delete=models.CASCADE, primary_key=True, related_name='listing')
+    title = models.CharField(max_length=255)
+    artists_features_line = models.CharField(max_length=255, blank=True, null=True)
+    primary_artist = models.CharField(max_length=255, blank=True, default='',
+                                      help_text="Display name of the main credited artist.")
+    release_date = models.DateField()
+    explicit_content = models.BooleanField(default=False)
+    bpm = models.IntegerField(blank=True, null=True)
+    key = models.CharField(max_length=50, blank=True, null=True)
+    duration_seconds = models.IntegerField(blank=True, null=True)
+    genres = models.JSONField(default=list, blank=True)
+    moods = models.JSONField(default=list, blank=True)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True,
+                                    help_text="Cheapest license price for the track (null if it can't be licensed).")
+    currency = models.CharField(max_length=10, blank=True, default='')
+    formats = models.JSONField(default=list, blank=True,
+                               help_text="Names of the file formats the track is sold in.")
+    image_variants = models.JSONField(default=dict, blank=True,
+                                      help_text="Thumbnail and cover art entries copied from Track.image_variants.")
+    preview_name = models.CharField(max_length=255, blank=True, default='',
+                                    help_text="Storage name of the preview clip.")
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-release_date', 'track'], name='track_listing_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.track_id})"
+
+
+class Tag(models.Model):
+    """
+    One normalized value of a Track JSON list field (genres, moods, keywords_tags, instruments).
+    Kept in sync by music/tags.py so tracks can be filtered and faceted through TrackTag indexes.
+    """
+    class Kind(models.TextChoices):
+        GENRE = 'genre', 'Genre'
+        MOOD = 'mood', 'Mood'
+        KEYWORD = 'keyword', 'Keyword'
+        INSTRUMENT = 'instrument', 'Instrument'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    slug = models.CharField(max_length=100,
+                            help_text="Normalized value: lowercase with collapsed whitespace.")
+    name = models.CharField(max_length=100,
+                            help_text="Display value, as first seen on a track.")
+
+    class Meta:
+        unique_together = [('kind', 'slug')]
+
+    def __str__(self):
+        return f"{self.kind}:{self.name}"
+
+
+class TrackTag(models.Model):
+    """A track carrying a tag. unique_together indexes (track, tag); tag_track_idx serves the tag lookups."""
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='track_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='track_tags')
+
+    class Meta:
+        unique_together = [('track', 'tag')]
+        indexes = [
+            models.Index(fields=['tag', 'track'], name='tag_track_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.track_id} - {self.tag_id}"
+
+
+class TrackFeatures(models.Model):
+    """
+    Encoded musical attributes of a track (tempo, key, time signature, genres, moods, instruments, tags)
+    as a sparse unit vector. Written by music/similarity.py; the signature tells it which tracks changed.
+    """
+    track = models.OneToOneField(Track, on_delete=models.CASCADE, primary_key=True, related_name='features')
+    vector = models.BinaryField(help_text="Packed sparse vector: uint16 dimensions followed by float32 weights.")
+    signature = models.CharField(max_length=64,
+                                 help_text="Hash of the attribute values the vector was encoded from.")
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Features of {self.track_id}"
+
+
+class SimilarTrack(models.Model):
+    """Precomputed nearest neighbour of a track by cosine similarity of their TrackFeatures"""
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='similar_tracks')
+    similar = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(help_text="Cosine similarity, 0 to 1.")
+
+    class Meta:
+        unique_together = [('track', 'similar')]
+        indexes = [
+            models.Index(fields=['track', '-score'], name='similar_track_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.track_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
 class Library(models.Model):
     """
     Represents a collection of tracks for the website.
@@ -155,13 +327,34 @@ class Library(models.Model):
     library_owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='library')
     library_name = models.CharField(max_length=255, null=False, blank=False, default='Library',
                                     help_text="The name of the library.")
-    tracks = models.ManyToManyField(Track, related_name='libraries')
+    tracks = models.ManyToManyField(Track, related_name='libraries', through='LibraryTrack')
     note = models.TextField(blank=True, null=True,
                             help_text="Additional notes or comments about the library.")
     
     def __str__(self):
         return str(self.library_id) + " - " + str(self.library_name)
 
+class LibraryTrack(models.Model):
+    """
+    Membership of a track in a library (the Library.tracks through table).
+    Written in bulk by the library tracks endpoint; the id doubles as the "added" order for cursor pagination.
+    """
+    library = models.ForeignKey(Library, on_delete=models.CASCADE, related_name='library_tracks')
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='library_tracks')
+    added_date = models.DateTimeField(default=timezone.now,
+                                      help_text="When the track was added to the library.")
+
+    class Meta:
+        db_table = 'music_library_tracks'
+        unique_together = [('library', 'track')]
+        indexes = [
+            models.Index(fields=['library', 'id'], name='library_track_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.library_id} - {self.track_id}"
+
+
 class MusicProfessional(models.Model):
     """A person/entity in the music industry who can contribute to or license tracks"""
     professional_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False,
@@ -260,6 +453,143 @@ class Publishing(models.Model):
         return str(self.publishing_id) + " " + str(self.track) + " " + str(self.publishing_date.strftime('%Y-%m-%d'))
 
 
+class CatalogImport(models.Model):
+    """
+    A bulk catalog import run from a CSV/JSONL manifest (see music.catalog_import).
+    rows_processed is the resume checkpoint: it is committed in the same transaction as each batch.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        RUNNING = 'RUNNING', 'Running'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    import_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False,
+                                 help_text="Unique identifier for the import.")
+    manifest_path = models.CharField(max_length=1024,
+                                     help_text="Server path of the CSV or JSONL manifest.")
+    audio_root = models.CharField(max_length=1024,
+                                  help_text="Server directory the manifest file paths are relative to.")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    rows_processed = models.PositiveIntegerField(default=0,
+                                                 help_text="Manifest rows already handled (imported or rejected). Resume starts after this row.")
+    tracks_created = models.PositiveIntegerField(default=0)
+    files_uploaded = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True,
+                              help_text="Per-row errors as {'row': n, 'error': '...'} (capped).")
+    last_error = models.TextField(blank=True, null=True,
+                                  help_text="The error that stopped the import, if it failed.")
+    created_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_date']
+
+    def __str__(self):
+        return f"{self.import_id} - {self.status} ({self.rows_processed} rows)"
+
+
+# Resize new or replaced track images in the background. The task saves only image_variants.
+@receiver(post_save, sender=Track)
+def build_track_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & {'thumbnail', 'vinyl_thumbnail', 'cover_art'}:
+        return
+    from music.images import stale_image_fields
+    if stale_image_fields(instance):
+        from music.tasks import update_image_variants_task
+        track_id = str(instance.track_id)
+        transaction.on_commit(lambda: update_image_variants_task.delay(track_id))
+
+
+# Mirror the JSON tag lists into Tag/TrackTag (music/tags.py)
+@receiver(post_save, sender=Track)
+def sync_tags_on_track_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & {'genres', 'moods', 'keywords_tags', 'instruments'}:
+        return
+    from music.tags import sync_track_tags
+    sync_track_tags([instance])
+
+
+# Any change along Contribution -> Contributor -> MusicProfessional -> Contact -> SocialMediaLink
+# (or a track's title) retires the cached credits graphs (music/credits.py)
+CREDITS_TRACK_FIELDS = {'title', 'artists_features_line'}
+
+
+@receiver([post_save, post_delete], sender=Contribution)
+@receiver([post_save, post_delete], sender=Contributor)
+@receiver([post_save, post_delete], sender=MusicProfessional)
+@receiver([post_save, post_delete], sender=Contact)
+@receiver([post_save, post_delete], sender=SocialMediaLink)
+@receiver([post_save, post_delete], sender=Track)
+def invalidate_cached_credits(sender, update_fields=None, **kwargs):
+    if sender is Track and update_fields is not None and not set(update_fields) & CREDITS_TRACK_FIELDS:
+        return
+    from music.credits import invalidate_credits
+    invalidate_credits()
+
+
+# Keep the TrackListing read model (music/listing.py) in step with everything it copies.
+# License options and prices are handled in licenses/models.py.
+def _schedule_listing_refresh(track_ids):
+    from music.listing import schedule_listing_refresh
+    schedule_listing_refresh(track_ids)
+
+
+@receiver(post_save, sender=Track)
+def refresh_listing_on_track_change(sender, instance, **kwargs):
+    _schedule_listing_refresh([instance.track_id])
+
+
+@receiver([post_save, post_delete], sender=Contribution)
+@receiver([post_save, post_delete], sender=TrackAsset)
+def refresh_listing_on_track_child_change(sender, instance, **kwargs):
+    _schedule_listing_refresh([instance.track_id])
+
+
+@receiver(post_save, sender=TrackStorageFile)
+def refresh_listing_on_storage_file_change(sender, instance, created, update_fields=None, **kwargs):
+    # only the format is listed - probe results and uploads don't change the row
+    if not created and (update_fields is None or 'file_format' in update_fields):
+        _schedule_listing_refresh(instance.track_license_options.values_list('track_id', flat=True))
+
+
+@receiver(post_save, sender=FileFormat)
+def refresh_listing_on_format_change(sender, instance, created, **kwargs):
+    if not created:
+        _schedule_listing_refresh(
+            Track.objects.filter(track_license_options__track_storage_file__file_format=instance).values_list('track_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Contributor)
+def refresh_listing_on_contributor_change(sender, instance, created, **kwargs):
+    if not created:
+        _schedule_listing_refresh(instance.contributions.values_list('track_id', flat=True))
+
+
+@receiver(post_save, sender=MusicProfessional)
+@receiver(post_save, sender=Contact)
+def refresh_listing_on_credit_name_change(sender, instance, created, **kwargs):
+    if created:
+        return
+    professional_filter = {'contributor__music_professional': instance} if sender is MusicProfessional \
+        else {'contributor__music_professional__contact': instance}
+    _schedule_listing_refresh(Contribution.objects.filter(**professional_filter).values_list('track_id', flat=True))
+
+
+# Probe every new or replaced audio file in the background once the upload is committed.
+# The probe itself saves with update_fields that don't include file_path, so it doesn't re-trigger.
+@receiver(post_save, sender=TrackStorageFile)
+def probe_uploaded_storage_file(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'file_path' not in update_fields:
+        return
+    from music.tasks import probe_storage_files_task
+    storage_file_id = str(instance.track_storage_file_id)
+    transaction.on_commit(lambda: probe_storage_files_task.delay([storage_file_id]))
+
+
 # # --- Main Song Model ---
 # isrc code for sound recording
 #UPC code for releaase
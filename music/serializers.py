@@ -1,13 +1,37 @@
 from rest_framework import serializers
-from .models import Track, Publisher, Contributor, Publishing, Contribution, Library, SocialMediaLink, MusicProfessional, FileFormat, TrackStorageFile
+from .models import Track, Publisher, Contributor, Publishing, Contribution, Library, SocialMediaLink, MusicProfessional, FileFormat, TrackStorageFile, CatalogImport, TrackAsset, LibraryTrack, TrackListing, Tag
+from django.core.files.storage import default_storage
+from .images import IMAGE_FIELDS, srcset_map
+from .listing import LISTING_IMAGE_FIELDS
 # from licenses.serializers import LicenseTypeSerializer
 
 # Serializer for Track
 class TrackSerializer(serializers.ModelSerializer):
     # Nested serializers for related objects to access in the track api endpoint
+    # Player assets (content-hashed URLs, null until generated). Reads the prefetched assets.
+    waveform_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
+    # srcset-ready responsive variants per image field, e.g. images["cover_art"]["srcset"]["webp"]
+    images = serializers.SerializerMethodField()
+
     class Meta:
         model = Track
         fields = '__all__'
+
+    def _asset_url(self, obj, kind):
+        for asset in obj.assets.all():
+            if asset.kind == kind:
+                return asset.file.url
+        return None
+
+    def get_waveform_url(self, obj):
+        return self._asset_url(obj, TrackAsset.Kind.WAVEFORM)
+
+    def get_preview_url(self, obj):
+        return self._asset_url(obj, TrackAsset.Kind.PREVIEW)
+
+    def get_images(self, obj):
+        return {field_name: srcset_map(obj.image_variants, field_name) for field_name in IMAGE_FIELDS}
     
     
     # def get_contributions(self, obj):
@@ -44,10 +68,30 @@ class ContributionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class LibrarySerializer(serializers.ModelSerializer):
+    # Membership is paged/edited through /libraries/{id}/tracks/ - only accept an initial list on write
+    tracks = serializers.PrimaryKeyRelatedField(many=True, queryset=Track.objects.all(), write_only=True, required=False)
+    track_count = serializers.SerializerMethodField()
+
     class Meta:
         model = Library
         fields = '__all__'
 
+    def get_track_count(self, obj):
+        count = getattr(obj, 'track_count', None)  # annotated by LibraryViewSet
+        return obj.library_tracks.count() if count is None else count
+
+
+class LibraryTrackSerializer(serializers.ModelSerializer):
+    track = TrackSerializer(read_only=True)
+
+    class Meta:
+        model = LibraryTrack
+        fields = ['track', 'added_date']
+
+
+class LibraryTrackIdsSerializer(serializers.Serializer):
+    track_ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=5000)
+
 class SocialMediaLinkSerializer(serializers.ModelSerializer):
     class Meta:
         model = SocialMediaLink
@@ -70,4 +114,35 @@ class TrackStorageFileSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     
-    
\ No newline at end of file
+    
+
+
+class CatalogImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CatalogImport
+        fields = '__all__'
+        read_only_fields = [field.name for field in CatalogImport._meta.fields]
+
+
+class TagSerializer(serializers.ModelSerializer):
+    track_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Tag
+        fields = ['kind', 'slug', 'name', 'track_count']
+
+
+class TrackListingSerializer(serializers.ModelSerializer):
+    track_id = serializers.UUIDField(read_only=True)
+    images = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrackListing
+        exclude = ['track', 'image_variants', 'preview_name']
+
+    def get_images(self, obj):
+        return {field_name: srcset_map(obj.image_variants, field_name) for field_name in LISTING_IMAGE_FIELDS}
+
+    def get_preview_url(self, obj):
+        return default_storage.url(obj.preview_name) if obj.preview_name else None
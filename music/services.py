@@ -0,0 +1,142 @@
+import os
+
+from django.db import transaction
+from django.utils import timezone
+
+from .audio_probe import ProbeError, UnsupportedAudio, probe
+from .listing import schedule_listing_refresh
+from .models import Track, TrackStorageFile
+
+# Ingest stage for uploaded audio: probe the headers of a TrackStorageFile (never the whole file),
+# store duration/bit rate/sample rate/bit depth/size on it, flag mismatches with its FileFormat and
+# copy duration (and BPM when the file is tagged) onto the tracks that sell it.
+
+# Probed container -> FileFormat names it may be stored as
+CONTAINER_FORMATS = {
+    'wav': {'WAV'},
+    'aiff': {'AIFF'},
+    'flac': {'FLAC'},
+    'mp3': {'MP3'},
+    'ogg': {'OGG'},
+    'm4a': {'M4A', 'ALAC'},
+}
+# Bundles/partial audio - checked against nothing and never used for the track duration
+PARTIAL_FORMATS = {'Stems', 'Sample'}
+
+
+def _range_reader(field_file):
+    """
+    read(offset, length) for a stored file.
+    On S3 each read is a ranged GET, so only header bytes leave the bucket; locally it's seek + read.
+    """
+    storage = field_file.storage
+    bucket = getattr(storage, 'bucket', None)
+    if bucket is not None:
+        from storages.utils import clean_name
+        obj = bucket.Object(storage._normalize_name(clean_name(field_file.name)))
+
+        def read(offset, length):
+            if length <= 0:
+                return b''
+            return obj.get(Range=f"bytes={offset}-{offset + length - 1}")['Body'].read()
+        return read, None
+
+    f = storage.open(field_file.name, 'rb')
+
+    def read(offset, length):
+        f.seek(offset)
+        return f.read(length)
+    return read, f
+
+
+def check_against_format(info, file_format, file_name):
+    """List the ways the probed file disagrees with its FileFormat"""
+    issues = []
+    if file_format.name in PARTIAL_FORMATS:
+        return issues
+    expected = CONTAINER_FORMATS.get(info['container'], set())
+    if file_format.name not in expected:
+        issues.append(f"File is {info['container'].upper()} but its format is {file_format.name}")
+    extension = os.path.splitext(file_name)[1].lower()
+    if file_format.extension and extension != file_format.extension.lower():
+        issues.append(f"Extension {extension or '(none)'} does not match {file_format.extension}")
+    if file_format.sample_rate and info.get('sample_rate') and info['sample_rate'] != file_format.sample_rate:
+        issues.append(f"Sample rate {info['sample_rate']} Hz, expected {file_format.sample_rate} Hz")
+    if file_format.bit_depth and info.get('bit_depth') and info['bit_depth'] != file_format.bit_depth:
+        issues.append(f"Bit depth {info['bit_depth']}, expected {file_format.bit_depth}")
+    return issues
+
+
+def _blob_missing(exc):
+    """True if the stored file itself is gone (locally or on S3), as opposed to a transient I/O error"""
+    if isinstance(exc, FileNotFoundError):
+        return True
+    try:
+        from botocore.exceptions import ClientError
+    except ImportError:
+        return False
+    return isinstance(exc, ClientError) and exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+
+def probe_storage_file(storage_file):
+    """Probe one TrackStorageFile and store the results. Returns the probe info (or None if it failed)."""
+    info = None
+    handle = None
+    try:
+        storage_file.file_size = storage_file.file_path.size
+        read, handle = _range_reader(storage_file.file_path)
+        info = probe(read, storage_file.file_size)
+    except UnsupportedAudio as e:
+        storage_file.probe_status = TrackStorageFile.ProbeStatus.UNSUPPORTED
+        storage_file.probe_issues = [str(e)]
+    except (ProbeError, ValueError, IndexError) as e:
+        storage_file.probe_status = TrackStorageFile.ProbeStatus.FAILED
+        storage_file.probe_issues = [str(e) or e.__class__.__name__]
+    except Exception as e:
+        # Other storage errors (timeouts, resets) propagate so probe_storage_files_task retries
+        if not _blob_missing(e):
+            raise
+        storage_file.probe_status = TrackStorageFile.ProbeStatus.FAILED
+        storage_file.probe_issues = [f"File not found: {storage_file.file_path.name}"]
+    finally:
+        if handle is not None:
+            handle.close()
+
+    if info:
+        storage_file.duration_seconds = info['duration_seconds']
+        storage_file.bit_rate = info['bit_rate']
+        storage_file.sample_rate = info['sample_rate']
+        storage_file.bit_depth = info['bit_depth']
+        storage_file.channels = info['channels']
+        storage_file.probe_issues = check_against_format(info, storage_file.file_format, storage_file.file_path.name)
+        storage_file.probe_status = (
+            TrackStorageFile.ProbeStatus.MISMATCH if storage_file.probe_issues else TrackStorageFile.ProbeStatus.OK
+        )
+    storage_file.probed_at = timezone.now()
+
+    with transaction.atomic():
+        storage_file.save(update_fields=[
+            'file_size', 'duration_seconds', 'bit_rate', 'sample_rate', 'bit_depth', 'channels',
+            'probe_status', 'probe_issues', 'probed_at',
+        ])
+        if info and storage_file.file_format.name not in PARTIAL_FORMATS:
+            values = {}
+            if info['duration_seconds']:
+                values['duration_seconds'] = int(round(info['duration_seconds']))
+            if info['bpm']:
+                values['bpm'] = info['bpm']
+            if values:
+                tracks = Track.objects.filter(track_license_options__track_storage_file=storage_file)
+                track_ids = list(tracks.values_list('track_id', flat=True))
+                tracks.update(**values)
+                schedule_listing_refresh(track_ids)
+    return info
+
+
+def probe_storage_files(storage_file_ids):
+    """Probe several files; returns {status: count}"""
+    counts = {}
+    for storage_file in TrackStorageFile.objects.select_related('file_format').filter(track_storage_file_id__in=storage_file_ids):
+        probe_storage_file(storage_file)
+        counts[storage_file.probe_status] = counts.get(storage_file.probe_status, 0) + 1
+    return counts
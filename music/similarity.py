@@ -0,0 +1,266 @@
+import hashlib
+import heapq
+import json
+import math
+import re
+import struct
+import zlib
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import SimilarTrack, Track, TrackFeatures
+
+# Similar-track recommendations from musical attributes
+# Every track is encoded as a sparse unit vector over a fixed dimension layout:
+#   tempo           TEMPO_BINS cyclic bins over one tempo octave (70 and 140 BPM land together: half/double time)
+#   key             circle-of-fifths position (relative minor = its major) with the neighbouring fifths at half weight
+#   mode            major / minor
+#   time signature  and hashed buckets for genres, moods, instruments and keyword tags
+# Each group is normalised on its own and scaled by GROUP_WEIGHTS, so a track with ten tags doesn't
+# drown out its tempo. Cosine similarity is then a sparse dot product, computed through an inverted
+# index (dimension -> tracks) so a track is only ever compared with tracks it shares a feature with.
+#
+# update_similar_tracks() keeps the top SIMILAR_TRACKS_COUNT neighbours per track in SimilarTrack.
+# Incremental runs only encode new/changed tracks (by attribute signature) and patch the lists of the
+# tracks they now rank into; a full run rebuilds everything (and drops neighbours of deleted tracks).
+
+ENCODING_VERSION = 1
+ATTRIBUTE_FIELDS = ('bpm', 'key', 'time_signature', 'genres', 'moods', 'instruments', 'keywords_tags')
+
+TEMPO_BINS = 14
+TEMPO_OCTAVE_BASE = 70.0
+HASH_BUCKETS = 256
+TIME_SIGNATURE_BUCKETS = 8
+
+GROUP_SIZES = (
+    ('tempo', TEMPO_BINS), ('key', 12), ('mode', 2), ('time_signature', TIME_SIGNATURE_BUCKETS),
+    ('genres', HASH_BUCKETS), ('moods', HASH_BUCKETS), ('instruments', HASH_BUCKETS), ('keywords_tags', HASH_BUCKETS),
+)
+# group -> first dimension
+LAYOUT = {name: sum(size for _, size in GROUP_SIZES[:i]) for i, (name, _) in enumerate(GROUP_SIZES)}
+DIMENSIONS = sum(size for _, size in GROUP_SIZES)
+
+GROUP_WEIGHTS = {
+    'genres': 1.0,
+    'moods': 0.8,
+    'tempo': 0.7,
+    'instruments': 0.6,
+    'key': 0.5,
+    'keywords_tags': 0.5,
+    'mode': 0.3,
+    'time_signature': 0.3,
+}
+
+# Neighbours below this score aren't worth recommending
+MIN_SCORE = 0.05
+
+NOTE_PITCHES = {'c': 0, 'd': 2, 'e': 4, 'f': 5, 'g': 7, 'a': 9, 'b': 11}
+KEY_PATTERN = re.compile(r'^\s*([a-g])\s*([#♯b♭]?)\s*(.*)$', re.IGNORECASE)
+
+
+def neighbour_count():
+    return getattr(settings, 'SIMILAR_TRACKS_COUNT', 20)
+
+
+# ---------------- encoding ----------------
+def parse_key(value):
+    """'F# minor' -> (pitch class, is_minor); None when unparseable"""
+    match = KEY_PATTERN.match(value or '')
+    if not match:
+        return None
+    note, accidental, mode = match.groups()
+    pitch = NOTE_PITCHES[note.lower()]
+    if accidental in ('#', '♯'):
+        pitch += 1
+    elif accidental in ('b', '♭'):
+        pitch -= 1
+    mode = mode.strip().lower()
+    if mode in ('m', 'min') or mode.startswith('minor'):
+        return pitch % 12, True
+    if mode in ('', 'maj', 'major') or mode.startswith('major'):
+        return pitch % 12, False
+    return None
+
+
+def _bucket(value, size):
+    return zlib.crc32(value.strip().lower().encode('utf-8')) % size
+
+
+def _tempo_group(bpm):
+    if not bpm or bpm <= 0:
+        return {}
+    position = (math.log2(bpm / TEMPO_OCTAVE_BASE) % 1.0) * TEMPO_BINS
+    low = int(position) % TEMPO_BINS
+    high = (low + 1) % TEMPO_BINS
+    fraction = position - int(position)
+    group = {low: 1.0 - fraction}
+    group[high] = group.get(high, 0.0) + fraction
+    return group
+
+
+def _key_groups(key):
+    parsed = parse_key(key)
+    if parsed is None:
+        return {}, {}
+    pitch, minor = parsed
+    if minor:
+        pitch = (pitch + 3) % 12  # relative major
+    fifths = pitch * 7 % 12
+    return {fifths: 1.0, (fifths + 1) % 12: 0.5, (fifths - 1) % 12: 0.5}, {int(minor): 1.0}
+
+
+def _hashed_group(values, size):
+    group = {}
+    for value in values or []:
+        if isinstance(value, str) and value.strip():
+            bucket = _bucket(value, size)
+            group[bucket] = group.get(bucket, 0.0) + 1.0
+    return group
+
+
+def encode(attributes):
+    """Sparse unit vector {dimension: weight} for a dict of ATTRIBUTE_FIELDS values"""
+    key, mode = _key_groups(attributes.get('key'))
+    time_signature = attributes.get('time_signature')
+    groups = {
+        'tempo': _tempo_group(attributes.get('bpm')),
+        'key': key,
+        'mode': mode,
+        'time_signature': {_bucket(time_signature, TIME_SIGNATURE_BUCKETS): 1.0} if time_signature else {},
+        'genres': _hashed_group(attributes.get('genres'), HASH_BUCKETS),
+        'moods': _hashed_group(attributes.get('moods'), HASH_BUCKETS),
+        'instruments': _hashed_group(attributes.get('instruments'), HASH_BUCKETS),
+        'keywords_tags': _hashed_group(attributes.get('keywords_tags'), HASH_BUCKETS),
+    }
+    vector = {}
+    for name, group in groups.items():
+        norm = math.sqrt(sum(weight * weight for weight in group.values()))
+        if not norm:
+            continue
+        offset = LAYOUT[name]
+        for dimension, weight in group.items():
+            vector[offset + dimension] = weight / norm * GROUP_WEIGHTS[name]
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {dimension: weight / norm for dimension, weight in vector.items()} if norm else {}
+
+
+def signature(attributes):
+    payload = json.dumps([ENCODING_VERSION] + [attributes.get(field) for field in ATTRIBUTE_FIELDS], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def pack(vector):
+    dimensions = sorted(vector)
+    return struct.pack(f'<{len(dimensions)}H{len(dimensions)}f', *dimensions, *(vector[d] for d in dimensions))
+
+
+def unpack(data):
+    count = len(data) // 6
+    values = struct.unpack(f'<{count}H{count}f', bytes(data))
+    return dict(zip(values[:count], values[count:]))
+
+
+# ---------------- neighbours ----------------
+class SimilarityIndex:
+    """Inverted index over sparse unit vectors; scores() is cosine similarity against every overlapping track"""
+
+    def __init__(self, vectors):
+        self.postings = defaultdict(list)
+        for track_id, vector in vectors.items():
+            for dimension, weight in vector.items():
+                self.postings[dimension].append((track_id, weight))
+
+    def scores(self, vector, exclude=None):
+        totals = defaultdict(float)
+        for dimension, weight in vector.items():
+            for track_id, other in self.postings.get(dimension, ()):
+                totals[track_id] += weight * other
+        totals.pop(exclude, None)
+        return totals
+
+
+def top_neighbours(scores, k):
+    return dict(heapq.nlargest(k, ((t, s) for t, s in scores.items() if s >= MIN_SCORE), key=itemgetter(1)))
+
+
+def update_similar_tracks(full=False, k=None):
+    """
+    Encode new/changed tracks and refresh the neighbour lists they affect (everything when full).
+    Returns counts of encoded tracks and rewritten neighbour lists.
+    """
+    k = k or neighbour_count()
+    stored = {
+        track_id: (sig, vector)
+        for track_id, sig, vector in TrackFeatures.objects.values_list('track_id', 'signature', 'vector').iterator(chunk_size=2000)
+    }
+    vectors, signatures, changed = {}, {}, []
+    for track_id, *values in Track.objects.values_list('track_id', *ATTRIBUTE_FIELDS).iterator(chunk_size=2000):
+        attributes = dict(zip(ATTRIBUTE_FIELDS, values))
+        sig = signature(attributes)
+        previous = stored.get(track_id)
+        if full or previous is None or previous[0] != sig:
+            vectors[track_id] = encode(attributes)
+            signatures[track_id] = sig
+            changed.append(track_id)
+        else:
+            vectors[track_id] = unpack(previous[1])
+    if not changed:
+        return {'encoded': 0, 'updated': 0}
+
+    index = SimilarityIndex(vectors)
+    neighbours, members = defaultdict(dict), defaultdict(set)
+    if not full:
+        for track_id, similar_id, score in SimilarTrack.objects.values_list('track_id', 'similar_id', 'score').iterator(chunk_size=5000):
+            neighbours[track_id][similar_id] = score
+            members[similar_id].add(track_id)
+
+    changed_set = set(changed)
+    touched, stale = set(changed), set()
+    for track_id in changed:
+        scores = index.scores(vectors[track_id], exclude=track_id)
+        neighbours[track_id] = top_neighbours(scores, k)
+        if full:
+            continue
+        # Patch the lists of unchanged tracks this one ranks into (or drops out of)
+        for other in members[track_id] | set(scores):
+            if other in changed_set or other not in vectors:
+                continue
+            current = neighbours[other]
+            score = scores.get(other, 0.0)
+            previous = current.pop(track_id, None)
+            if previous is not None and score < previous:
+                stale.add(other)  # something outside the list may now outrank it
+            elif score >= MIN_SCORE and (len(current) < k or score > min(current.values())):
+                current[track_id] = score
+                if len(current) > k:
+                    del current[min(current, key=current.get)]
+                touched.add(other)
+
+    for track_id in stale:
+        neighbours[track_id] = top_neighbours(index.scores(vectors[track_id], exclude=track_id), k)
+    touched |= stale
+
+    touched = list(touched)
+    with transaction.atomic():
+        TrackFeatures.objects.filter(track_id__in=changed).delete()
+        TrackFeatures.objects.bulk_create(
+            [TrackFeatures(track_id=t, vector=pack(vectors[t]), signature=signatures[t]) for t in changed],
+            batch_size=1000,
+        )
+        if full:
+            SimilarTrack.objects.all().delete()
+        else:
+            for start in range(0, len(touched), 500):
+                SimilarTrack.objects.filter(track_id__in=touched[start:start + 500]).delete()
+        SimilarTrack.objects.bulk_create(
+            [
+                SimilarTrack(track_id=track_id, similar_id=similar_id, score=score)
+                for track_id in touched
+                for similar_id, score in neighbours[track_id].items()
+            ],
+            batch_size=1000,
+        )
+    return {'encoded': len(changed), 'updated': len(touched)}
@@ -0,0 +1,148 @@
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Tag, Track, TrackTag
+
+# Normalized tags
+# Track.genres / moods / keywords_tags / instruments stay the source of truth; every value is mirrored
+# as a Tag (kind + normalized slug) linked through TrackTag, so tag filters and facets run on indexed
+# joins instead of JSON containment. Saves sync through the Track post_save signal, bulk writes
+# (catalog import) call sync_track_tags() themselves, migration 0020 backfilled existing tracks.
+#
+# Filters: each `tag` query parameter must match (AND); comma-separated values inside one are
+# alternatives (OR).  ?tag=genre:trap,genre:drill&tag=mood:dark
+
+TAG_FIELDS = {
+    Tag.Kind.GENRE: 'genres',
+    Tag.Kind.MOOD: 'moods',
+    Tag.Kind.KEYWORD: 'keywords_tags',
+    Tag.Kind.INSTRUMENT: 'instruments',
+}
+BATCH_SIZE = 500
+
+
+def normalize(value):
+    """(slug, display name) for a raw list value, None for blanks and non-strings"""
+    if not isinstance(value, str):
+        return None
+    name = ' '.join(value.split())[:100]
+    return (name.lower(), name) if name else None
+
+
+def track_tag_values(track):
+    """{(kind, slug): name} for the values in a track's JSON fields"""
+    values = {}
+    for kind, field in TAG_FIELDS.items():
+        for value in getattr(track, field) or []:
+            normalized = normalize(value)
+            if normalized:
+                values.setdefault((kind, normalized[0]), normalized[1])
+    return values
+
+
+def _tag_ids(names):
+    """Tag ids for {(kind, slug): name}, creating the missing tags"""
+    if not names:
+        return {}
+
+    def lookup(keys):
+        slugs = {slug for _, slug in keys}
+        return {
+            (kind, slug): pk
+            for pk, kind, slug in Tag.objects.filter(slug__in=slugs).values_list('pk', 'kind', 'slug')
+            if (kind, slug) in keys
+        }
+    ids = lookup(names.keys())
+    missing = {key: name for key, name in names.items() if key not in ids}
+    if missing:
+        # ignore_conflicts: a concurrent save may create the same tag first
+        Tag.objects.bulk_create(
+            [Tag(kind=kind, slug=slug, name=name) for (kind, slug), name in missing.items()], ignore_conflicts=True,
+        )
+        ids.update(lookup(missing.keys()))
+    return ids
+
+
+def sync_track_tags(tracks):
+    """Make the TrackTag rows of the given tracks match their JSON fields (at most 5 queries)"""
+    wanted = {track.track_id: track_tag_values(track) for track in tracks}
+    if not wanted:
+        return
+    names = {}
+    for values in wanted.values():
+        for key, name in values.items():
+            names.setdefault(key, name)
+    tag_ids = _tag_ids(names)
+
+    desired = {(track_id, tag_ids[key]) for track_id, values in wanted.items() for key in values}
+    existing = {
+        (track_id, tag_id): pk
+        for pk, track_id, tag_id in TrackTag.objects.filter(track_id__in=wanted).values_list('pk', 'track_id', 'tag_id')
+    }
+    stale = [pk for pair, pk in existing.items() if pair not in desired]
+    if stale:
+        TrackTag.objects.filter(pk__in=stale).delete()
+    added = [TrackTag(track_id=track_id, tag_id=tag_id) for track_id, tag_id in desired if (track_id, tag_id) not in existing]
+    if added:
+        TrackTag.objects.bulk_create(added, ignore_conflicts=True)
+
+
+def sync_all_track_tags():
+    """Resync every track in batches; returns the number of tracks"""
+    track_ids = list(Track.objects.values_list('track_id', flat=True))
+    for start in range(0, len(track_ids), BATCH_SIZE):
+        batch = track_ids[start:start + BATCH_SIZE]
+        sync_track_tags(Track.objects.filter(track_id__in=batch).only('track_id', *TAG_FIELDS.values()))
+    return len(track_ids)
+
+
+# ---------------- querying ----------------
+def parse_tag_filters(params):
+    """['genre:trap,genre:drill', 'mood:dark'] -> [[('genre', 'trap'), ('genre', 'drill')], [('mood', 'dark')]]"""
+    groups = []
+    for param in params:
+        group = []
+        for token in param.split(','):
+            kind, separator, value = token.partition(':')
+            kind = kind.strip().lower()
+            normalized = normalize(value)
+            if not separator or kind not in Tag.Kind.values or not normalized:
+                raise ValidationError({'tag': f"Expected kind:value with kind one of {', '.join(Tag.Kind.values)}, got '{token}'"})
+            group.append((kind, normalized[0]))
+        groups.append(group)
+    return groups
+
+
+def tagged_track_ids(group):
+    """Subquery of the tracks carrying any tag of the group"""
+    match = Q()
+    for kind, slug in group:
+        match |= Q(tag__kind=kind, tag__slug=slug)
+    return TrackTag.objects.filter(match).values('track_id')
+
+
+def filter_by_tags(queryset, groups, track_field='track_id'):
+    for group in groups:
+        queryset = queryset.filter(**{f'{track_field}__in': tagged_track_ids(group)})
+    return queryset
+
+
+def tag_facets(groups=(), kind=None, limit=50):
+    """Per kind, the most used tags (with track counts) among the tracks matching the tag filters"""
+    rows = TrackTag.objects.all()
+    for group in groups:
+        rows = rows.filter(track_id__in=tagged_track_ids(group))
+    if kind:
+        rows = rows.filter(tag__kind=kind)
+    counts = (
+        rows
+        .values('tag__kind', 'tag__slug', 'tag__name')
+        .annotate(count=Count('track_id'))
+        .order_by('-count', 'tag__slug')
+    )
+    facets = {kind: [] for kind in ([kind] if kind else Tag.Kind.values)}
+    for row in counts:
+        bucket = facets[row['tag__kind']]
+        if len(bucket) < limit:
+            bucket.append({'slug': row['tag__slug'], 'name': row['tag__name'], 'count': row['count']})
+    return facets
@@ -0,0 +1,84 @@
+from celery import shared_task
+import logging
+
+from .catalog_import import run_import
+from .assets import SOURCE_PREFERENCE, AssetError, generate_track_assets
+from .images import update_image_variants
+from .models import CatalogImport, Track
+from .services import probe_storage_files
+from .similarity import update_similar_tracks
+
+logger = logging.getLogger(__name__)
+
+
+# No autoretry: a failed import keeps its checkpoint and is resumed explicitly
+# (POST /catalog-imports/<id>/resume/ or `manage.py import_catalog --resume <id>`)
+@shared_task
+def import_catalog_task(import_id):
+    job = CatalogImport.objects.get(import_id=import_id)
+    if job.status == CatalogImport.Status.COMPLETED:
+        return {"import_id": str(job.import_id), "status": job.status}
+    job = run_import(job, log=logger.info)
+    logger.info(f"Catalog import {job.import_id} finished: {job.tracks_created} tracks, {job.error_count} row errors")
+    return {"import_id": str(job.import_id), "status": job.status, "tracks_created": job.tracks_created}
+
+
+# Header-only metadata probe for uploaded audio (see music/services.py). Enqueued after each upload commit.
+@shared_task(
+    autoretry_for=(OSError,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 3},
+)
+def probe_storage_files_task(storage_file_ids):
+    counts = probe_storage_files(storage_file_ids)
+    logger.info(f"Probed {sum(counts.values())} storage file(s): {counts}")
+
+    # A new or replaced full mix changes the track's player assets
+    track_ids = (
+        Track.objects
+        .filter(
+            track_license_options__track_storage_file__in=storage_file_ids,
+            track_license_options__track_storage_file__file_format__name__in=SOURCE_PREFERENCE,
+        )
+        .values_list('track_id', flat=True)
+        .distinct()
+    )
+    for track_id in track_ids:
+        generate_track_assets_task.delay(str(track_id))
+    return counts
+
+
+# Waveform peaks + preview clip for the storefront player (see music/assets.py)
+@shared_task(
+    autoretry_for=(OSError,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 3},
+)
+def generate_track_assets_task(track_id):
+    track = Track.objects.get(track_id=track_id)
+    try:
+        assets = generate_track_assets(track)
+    except AssetError as e:
+        logger.warning(f"No player assets for track {track_id}: {e}")
+        return {"track_id": track_id, "error": str(e)}
+    return {"track_id": track_id, "assets": [asset.kind for asset in assets]}
+
+
+# Responsive AVIF/WebP/JPEG variants of the track images (see music/images.py)
+@shared_task(
+    autoretry_for=(OSError,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 3},
+)
+def update_image_variants_task(track_id):
+    track = Track.objects.get(track_id=track_id)
+    fields = update_image_variants(track)
+    return {"track_id": track_id, "fields": fields}
+
+
+# Precomputed similar tracks (see music/similarity.py). Incremental every 15 minutes, full rebuild nightly.
+@shared_task
+def update_similar_tracks_task(full=False):
+    counts = update_similar_tracks(full=full)
+    logger.info(f"Similar tracks: encoded {counts['encoded']} track(s), rewrote {counts['updated']} neighbour list(s)")
+    return counts
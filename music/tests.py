@@ -1,8 +1,12 @@
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
-from .models import Track, FileFormat, TrackStorageFile, Library, MusicProfessional, Contributor, SocialMediaLink, Contribution, Publisher, Publishing
+from .models import Track, FileFormat, TrackStorageFile, Library, MusicProfessional, Contributor, SocialMediaLink, Contribution, Publisher, Publishing, CatalogImport
+from django.core.files.uploadedfile import SimpleUploadedFile
+import json
+import os
 import uuid
+from unittest import mock
 from common.models import Contact
 from custom_users.models import CustomUser
 
@@ -364,4 +368,737 @@ class PublishingAPITestCase(APITestCase):
             track=self.track,
             contribution=self.contribution,
             note="Test publishing"
-        )
\ No newline at end of file
+        )
+
+class CatalogImportTestCase(APITestCase):
+    def setUp(self):
+        """Create a temp catalog directory with audio files and the lookup rows the manifest refers to."""
+        import tempfile
+        from decimal import Decimal
+        from licenses.models import License_type
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=self.media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.audio_dir = os.path.join(self.tmp.name, 'audio')
+        os.makedirs(self.audio_dir)
+        for i in range(5):
+            with open(os.path.join(self.audio_dir, f'song{i}.mp3'), 'wb') as f:
+                f.write(b'ID3' + bytes(100 * (i + 1)))
+
+        FileFormat.objects.create(name='MP3', mime_type='audio/mpeg', extension='.mp3', compression='lossy')
+        self.license_type = License_type.objects.create(
+            license_type_name='Basic', license_template='Template', license_term='1 Year',
+            transferability='Non-Transferable', price=Decimal('29.99'), download_limit='Unlimited',
+            streaming_limit='Unlimited', monetized_radio_plays='Unlimited', video_rights='Yes',
+            royalty_payment='No'
+        )
+        self.existing_contact = Contact.objects.create(first_name='Ada', last_name='Beat', email='Ada@Example.com')
+
+    def write_manifest(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_csv_import_creates_catalog_and_records_row_errors(self):
+        from licenses.models import TrackLicenseOptions
+        from .catalog_import import run_import
+
+        contributors = json.dumps([{'email': 'ada@example.com', 'role': 'Producer', 'contribution_type': 'Creative'}])
+        rows = [
+            ['Song 0', 'Hip Hop|Trap', '90', 'song0.mp3', 'MP3', 'Basic', contributors],
+            ['', '', '', 'song1.mp3', 'MP3', 'Basic', ''],  # missing title
+            ['Song 2', '', '', 'missing.mp3', 'MP3', 'Basic', ''],  # missing audio
+            ['Song 3', '["Jazz"]', 'fast', 'song3.mp3', 'MP3', 'Basic', ''],  # bad bpm
+            ['Song 4', '', '', 'song4.mp3', 'MP3', 'Basic', contributors],
+        ]
+        lines = ['title,genres,bpm,file,file_format,license_types,contributors']
+        for row in rows:
+            lines.append(','.join('"' + value.replace('"', '""') + '"' for value in row))
+        manifest = self.write_manifest('catalog.csv', '\n'.join(lines) + '\n')
+
+        job = CatalogImport.objects.create(manifest_path=manifest, audio_root=self.audio_dir)
+        job = run_import(job, batch_size=2, upload_workers=2)
+
+        self.assertEqual(job.status, CatalogImport.Status.COMPLETED)
+        self.assertEqual(job.rows_processed, 5)
+        self.assertEqual(job.tracks_created, 2)
+        self.assertEqual(job.files_uploaded, 2)
+        self.assertEqual([error['row'] for error in job.errors], [2, 3, 4])
+
+        track = Track.objects.get(title='Song 0')
+        self.assertEqual(track.genres, ['Hip Hop', 'Trap'])
+        self.assertEqual(track.bpm, 90)
+        storage_file = TrackStorageFile.objects.get(track_license_options__track=track)
+        self.assertEqual(storage_file.file_size, 103)
+        self.assertTrue(storage_file.file_path.storage.exists(storage_file.file_path.name))
+        self.assertEqual(TrackLicenseOptions.objects.filter(license_type=self.license_type).count(), 2)
+
+        # Existing contact (case-insensitive email) is reused and the contributor is shared by both tracks
+        self.assertEqual(Contact.objects.count(), 1)
+        self.assertEqual(Contributor.objects.count(), 1)
+        self.assertEqual(Contribution.objects.filter(contributor__music_professional__contact=self.existing_contact).count(), 2)
+
+    def test_jsonl_import_resumes_from_checkpoint(self):
+        from .catalog_import import run_import
+
+        lines = [
+            json.dumps({'title': f'Song {i}', 'files': [{'path': f'song{i}.mp3', 'format': 'MP3', 'license_types': ['Basic']}]})
+            for i in range(5)
+        ]
+        manifest = self.write_manifest('catalog.jsonl', '\n'.join(lines) + '\n')
+
+        # Simulate a crash after the first batch of two rows was committed
+        job = CatalogImport.objects.create(
+            manifest_path=manifest, audio_root=self.audio_dir, status=CatalogImport.Status.FAILED, rows_processed=2
+        )
+        job = run_import(job, batch_size=2)
+
+        self.assertEqual(job.status, CatalogImport.Status.COMPLETED)
+        self.assertEqual(job.rows_processed, 5)
+        self.assertEqual(sorted(Track.objects.values_list('title', flat=True)), ['Song 2', 'Song 3', 'Song 4'])
+
+    def test_import_api_requires_staff(self):
+        url = reverse('catalog-imports-list')
+        response = self.client.get(url)
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+        staff = CustomUser.objects.create_user(username='staff', email='staff@example.com', password='pw', is_staff=True)
+        self.client.force_authenticate(staff)
+        with self.settings(CATALOG_IMPORT_ROOT=self.tmp.name):
+            manifest = SimpleUploadedFile('catalog.csv', b'title,file,file_format\nSong 0,song0.mp3,MP3\n')
+            response = self.client.post(url, {'manifest': manifest, 'audio_dir': 'audio'}, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data['status'], CatalogImport.Status.PENDING)
+
+            manifest = SimpleUploadedFile('catalog.csv', b'title\n')
+            response = self.client.post(url, {'manifest': manifest, 'audio_dir': '../'}, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AudioProbeTestCase(APITestCase):
+    """Header-only metadata probe for uploaded audio files."""
+
+    @staticmethod
+    def wav_bytes(seconds=2, sample_rate=44100, channels=2, sample_width=2):
+        import io
+        import wave
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as w:
+            w.setnchannels(channels)
+            w.setsampwidth(sample_width)
+            w.setframerate(sample_rate)
+            w.writeframes(bytes(sample_rate * channels * sample_width * seconds))
+        return buffer.getvalue()
+
+    @staticmethod
+    def mp3_bytes(frames=100, bpm='128'):
+        # ID3v2.3 tag with a TBPM frame, then CBR MPEG-1 Layer III frames (128kbps, 44.1kHz, stereo)
+        text = b'\x00' + bpm.encode()
+        frame = b'TBPM' + len(text).to_bytes(4, 'big') + b'\x00\x00' + text
+        tag = b'ID3\x03\x00\x00' + bytes([0, 0, 0, len(frame)]) + frame
+        audio_frame = b'\xff\xfb\x90\x00' + bytes(417 - 4)
+        return tag + audio_frame * frames
+
+    @staticmethod
+    def flac_bytes(seconds=3, sample_rate=48000, bits=24):
+        packed = (sample_rate << 44) | (1 << 41) | ((bits - 1) << 36) | (sample_rate * seconds)
+        streaminfo = (4096).to_bytes(2, 'big') * 2 + bytes(6) + packed.to_bytes(8, 'big') + bytes(16)
+        return b'fLaC' + bytes([0x80, 0, 0, 34]) + streaminfo + bytes(1000)
+
+    def test_probe_reads_container_headers(self):
+        from .audio_probe import probe
+
+        def probe_bytes(data):
+            return probe(lambda offset, length: data[offset:offset + length], len(data))
+
+        wav = probe_bytes(self.wav_bytes(seconds=2))
+        self.assertEqual((wav['container'], wav['sample_rate'], wav['bit_depth'], wav['channels']), ('wav', 44100, 16, 2))
+        self.assertAlmostEqual(wav['duration_seconds'], 2.0)
+        self.assertEqual(wav['bit_rate'], 1411)
+
+        mp3 = probe_bytes(self.mp3_bytes(frames=100))
+        self.assertEqual((mp3['container'], mp3['sample_rate'], mp3['bit_rate'], mp3['bpm']), ('mp3', 44100, 128, 128))
+        self.assertAlmostEqual(mp3['duration_seconds'], 100 * 417 * 8 / 128000, places=3)
+
+        flac = probe_bytes(self.flac_bytes(seconds=3))
+        self.assertEqual((flac['container'], flac['sample_rate'], flac['bit_depth'], flac['channels']), ('flac', 48000, 24, 2))
+        self.assertAlmostEqual(flac['duration_seconds'], 3.0)
+
+    def test_probe_only_reads_headers(self):
+        from .audio_probe import HEAD_BYTES, probe
+
+        data = self.wav_bytes(seconds=10)
+        reads = []
+
+        def read(offset, length):
+            reads.append(length)
+            return data[offset:offset + length]
+
+        probe(read, len(data))
+        self.assertLessEqual(sum(reads), HEAD_BYTES)
+        self.assertGreater(len(data), HEAD_BYTES * 10)
+
+    def test_probe_storage_file_updates_file_and_tracks(self):
+        import tempfile
+        from django.core.files.base import ContentFile
+        from licenses.models import License_type, TrackLicenseOptions
+        from .services import probe_storage_file
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        with self.settings(MEDIA_ROOT=media.name):
+            wav_format = FileFormat.objects.create(name='WAV', mime_type='audio/wav', extension='.wav',
+                                                   compression='lossless', bit_depth=24, sample_rate=48000)
+            license_type = License_type.objects.create(
+                license_type_name='Basic', license_template='Template', license_term='1 Year',
+                transferability='Non-Transferable', price='29.99', download_limit='Unlimited',
+                streaming_limit='Unlimited', monetized_radio_plays='Unlimited', video_rights='Yes',
+                royalty_payment='No'
+            )
+            track = Track.objects.create(title='Probe Me')
+            storage_file = TrackStorageFile(file_format=wav_format)
+            storage_file.file_path.save('probe.wav', ContentFile(self.wav_bytes(seconds=3)), save=False)
+            storage_file.save()
+            TrackLicenseOptions.objects.create(track=track, track_storage_file=storage_file, license_type=license_type)
+
+            probe_storage_file(storage_file)
+
+            storage_file.refresh_from_db()
+            self.assertEqual(storage_file.file_size, storage_file.file_path.size)
+            self.assertEqual((storage_file.sample_rate, storage_file.bit_depth, storage_file.bit_rate), (44100, 16, 1411))
+            # 16-bit/44.1kHz file stored under a 24-bit/48kHz format is flagged
+            self.assertEqual(storage_file.probe_status, TrackStorageFile.ProbeStatus.MISMATCH)
+            self.assertEqual(len(storage_file.probe_issues), 2)
+            track.refresh_from_db()
+            self.assertEqual(track.duration_seconds, 3)
+            self.assertEqual(track.bpm, 120)  # untagged WAV keeps its bpm
+
+    def test_missing_file_is_marked_failed(self):
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        with self.settings(MEDIA_ROOT=media.name):
+            wav_format = FileFormat.objects.create(name='WAV', mime_type='audio/wav', extension='.wav', compression='lossless')
+            missing = TrackStorageFile.objects.create(file_path='track_storage_files/missing.wav', file_format=wav_format)
+
+            call_command('probe_audio_files', stdout=StringIO())  # the backfill keeps going past the missing file
+
+            missing.refresh_from_db()
+            self.assertEqual(missing.probe_status, TrackStorageFile.ProbeStatus.FAILED)
+            self.assertEqual(len(missing.probe_issues), 1)
+
+            # A missing S3 object is failed as well; a transient I/O error propagates so the task retries
+            from botocore.exceptions import ClientError
+            from django.core.files.base import ContentFile
+            from .services import probe_storage_file
+
+            stored = TrackStorageFile(file_format=wav_format)
+            stored.file_path.save('stored.wav', ContentFile(b'RIFF' + bytes(40)), save=False)
+            stored.save()
+            no_such_key = ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'gone'}}, 'GetObject')
+            with mock.patch('music.services._range_reader', side_effect=no_such_key):
+                probe_storage_file(stored)
+            self.assertEqual(stored.probe_status, TrackStorageFile.ProbeStatus.FAILED)
+            with mock.patch('music.services._range_reader', side_effect=ConnectionResetError):
+                with self.assertRaises(ConnectionResetError):
+                    probe_storage_file(TrackStorageFile.objects.get(pk=stored.pk))
+            self.assertNotEqual(TrackStorageFile.objects.get(pk=stored.pk).probe_issues, [])
+
+    def test_unrecognized_file_is_marked_unsupported(self):
+        from .audio_probe import UnsupportedAudio, probe
+
+        data = b'PK\x03\x04' + bytes(100)
+        with self.assertRaises(UnsupportedAudio):
+            probe(lambda offset, length: data[offset:offset + length], len(data))
+
+
+class TrackAssetTestCase(APITestCase):
+    """Waveform peaks and preview clips derived from a track's master."""
+
+    def setUp(self):
+        import tempfile
+        from django.core.files.base import ContentFile
+        from licenses.models import License_type, TrackLicenseOptions
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media.name, FFMPEG_BINARY='ffmpeg-not-installed', PREVIEW_CLIP_SECONDS=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        wav_format = FileFormat.objects.create(name='WAV', mime_type='audio/wav', extension='.wav', compression='lossless')
+        license_type = License_type.objects.create(
+            license_type_name='Basic', license_template='Template', license_term='1 Year',
+            transferability='Non-Transferable', price='29.99', download_limit='Unlimited',
+            streaming_limit='Unlimited', monetized_radio_plays='Unlimited', video_rights='Yes',
+            royalty_payment='No'
+        )
+        self.track = Track.objects.create(title='Waveform Track')
+        storage_file = TrackStorageFile(file_format=wav_format)
+        storage_file.file_path.save('master.wav', ContentFile(self.sine_wav(seconds=4)), save=False)
+        storage_file.save()
+        TrackLicenseOptions.objects.create(track=self.track, track_storage_file=storage_file, license_type=license_type)
+
+    @staticmethod
+    def sine_wav(seconds, sample_rate=44100):
+        # 24-bit stereo, silent first half then a full-scale square wave
+        import io
+        import wave
+        frames = bytearray()
+        for i in range(sample_rate * seconds):
+            value = 0 if i < sample_rate * seconds // 2 else (0x7FFFFF if (i // 50) % 2 else -0x800000)
+            frames += value.to_bytes(3, 'little', signed=True) * 2
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as w:
+            w.setnchannels(2)
+            w.setsampwidth(3)
+            w.setframerate(sample_rate)
+            w.writeframes(bytes(frames))
+        return buffer.getvalue()
+
+    def test_generate_assets_and_serve_them(self):
+        import io
+        import wave
+        from .assets import PEAK_LEVELS, decode_peaks, generate_track_assets
+        from .models import TrackAsset
+
+        generate_track_assets(self.track)
+
+        waveform = TrackAsset.objects.get(track=self.track, kind=TrackAsset.Kind.WAVEFORM)
+        self.assertLess(waveform.file_size, 12 * 1024)
+        with waveform.file.open('rb') as f:
+            duration, levels = decode_peaks(f.read())
+        self.assertAlmostEqual(duration, 4.0)
+        self.assertEqual(sorted(levels), list(PEAK_LEVELS))
+        peaks = levels[256]
+        self.assertEqual(len(peaks), 512)
+        self.assertEqual((peaks[0], peaks[1]), (0, 0))  # silent start
+        self.assertEqual((peaks[-2], peaks[-1]), (-128, 127))  # loud end
+
+        preview = TrackAsset.objects.get(track=self.track, kind=TrackAsset.Kind.PREVIEW)
+        with preview.file.open('rb') as f, wave.open(io.BytesIO(f.read())) as clip:
+            self.assertEqual((clip.getnchannels(), clip.getsampwidth(), clip.getframerate()), (1, 1, 22050))
+            self.assertAlmostEqual(clip.getnframes() / clip.getframerate(), 2.0, places=2)
+
+        url = reverse('tracks-waveform', kwargs={'pk': self.track.pk})
+        response = self.client.get(url, {'points': 1024})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['peaks']), 2048)
+        self.assertEqual(response['ETag'], f'"{waveform.content_hash}"')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{waveform.content_hash}"')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(reverse('tracks-preview', kwargs={'pk': self.track.pk}))
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response['Location'], preview.file.url)
+
+        with self.assertNumQueries(2):  # tracks + prefetched assets
+            response = self.client.get(reverse('tracks-list'))
+        self.assertEqual(response.data[0]['waveform_url'], waveform.file.url)
+
+    def test_regenerating_unchanged_source_keeps_asset(self):
+        from .assets import generate_track_assets
+
+        first = {asset.kind: asset.file.name for asset in generate_track_assets(self.track)}
+        second = {asset.kind: asset.file.name for asset in generate_track_assets(self.track)}
+        self.assertEqual(first, second)
+
+    def test_missing_asset_is_404(self):
+        response = self.client.get(reverse('tracks-waveform', kwargs={'pk': self.track.pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TrackImageVariantTestCase(APITestCase):
+    """Responsive image variants for track artwork."""
+
+    def setUp(self):
+        import tempfile
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media.name, IMAGE_VARIANT_WIDTHS=(160, 640))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    @staticmethod
+    def image_file(name, size, color):
+        import io
+        from django.core.files.base import ContentFile
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, color).save(buffer, format='PNG')
+        return ContentFile(buffer.getvalue(), name=name)
+
+    def test_variants_are_generated_and_serialized(self):
+        from django.core.files.storage import default_storage
+        from .images import update_image_variants, variant_formats
+
+        track = Track.objects.create(title='Artwork', cover_art=self.image_file('cover.png', (1000, 500), (255, 0, 0, 128)),
+                                     thumbnail=self.image_file('thumb.png', (120, 120), (0, 0, 255, 255)))
+        self.assertEqual(sorted(update_image_variants(track)), ['cover_art', 'thumbnail'])
+
+        cover = track.image_variants['cover_art']
+        self.assertEqual((cover['width'], cover['height']), (1000, 500))
+        self.assertEqual(set(cover['variants']), set(variant_formats()))
+        self.assertEqual([(v['width'], v['height']) for v in cover['variants']['jpeg']], [(160, 80), (640, 320)])
+        # Smaller than every width: a single variant at the original size, never upscaled
+        self.assertEqual([v['width'] for v in track.image_variants['thumbnail']['variants']['webp']], [120])
+        self.assertEqual(update_image_variants(track), [])  # up to date
+
+        response = self.client.get(reverse('tracks-detail', kwargs={'pk': track.pk}))
+        images = response.data['images']
+        self.assertIsNone(images['vinyl_thumbnail'])
+        jpeg_names = [v['name'] for v in cover['variants']['jpeg']]
+        self.assertEqual(images['cover_art']['srcset']['jpeg'],
+                         f"{default_storage.url(jpeg_names[0])} 160w, {default_storage.url(jpeg_names[1])} 640w")
+        self.assertEqual(images['cover_art']['src'], default_storage.url(jpeg_names[1]))
+
+        # Replacing the upload rebuilds the variants under new names and removes the old files
+        old_names = jpeg_names
+        track.cover_art = self.image_file('cover2.png', (800, 800), (0, 255, 0, 255))
+        track.save()
+        self.assertEqual(update_image_variants(track), ['cover_art'])
+        self.assertNotIn(old_names[0], [v['name'] for v in track.image_variants['cover_art']['variants']['jpeg']])
+        self.assertFalse(any(default_storage.exists(name) for name in old_names))
+
+
+class LibraryTracksAPITestCase(APITestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(username="owner@example.com", email="owner@example.com")
+        self.library = Library.objects.create(library_owner=user, library_name="Big Library")
+        self.tracks = [Track.objects.create(title=f"Track {i:02d}") for i in range(25)]
+        self.url = reverse('libraries-tracks', kwargs={'pk': self.library.pk})
+
+    def test_bulk_add_and_remove(self):
+        track_ids = [str(track.pk) for track in self.tracks[:20]]
+        missing = str(uuid.uuid4())
+        with self.assertNumQueries(4):  # library, tracks, existing memberships, one bulk insert
+            response = self.client.post(self.url, {"track_ids": track_ids + [missing]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["added"], 20)
+        self.assertEqual(response.data["missing"], [missing])
+
+        response = self.client.post(self.url, {"track_ids": track_ids[:5] + [str(self.tracks[20].pk)]}, format='json')
+        self.assertEqual((response.data["added"], response.data["already_in_library"]), (1, 5))
+        self.assertEqual(self.library.tracks.count(), 21)
+
+        response = self.client.delete(self.url, {"track_ids": track_ids[:10]}, format='json')
+        self.assertEqual(response.data["removed"], 10)
+        self.assertEqual(self.library.tracks.count(), 11)
+
+        response = self.client.get(reverse('libraries-detail', kwargs={'pk': self.library.pk}))
+        self.assertEqual(response.data["track_count"], 11)
+        self.assertNotIn("tracks", response.data)
+
+    def test_cursor_pagination_newest_first(self):
+        for track in self.tracks:
+            self.library.tracks.add(track)
+
+        seen = []
+        response = self.client.get(self.url, {"page_size": 10})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [entry["track"]["title"] for entry in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(seen, [f"Track {i:02d}" for i in reversed(range(25))])
+
+    def test_invalid_payload(self):
+        response = self.client.post(self.url, {"track_ids": ["not-a-uuid"]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CreditsAPITestCase(APITestCase):
+    def setUp(self):
+        from .credits import credits_cache
+        credits_cache().clear()
+        self.track = Track.objects.create(title="Credited Track")
+        self.other_track = Track.objects.create(title="Second Track")
+        self.professionals = []
+        for i, role in enumerate(["Producer", "Singer", "Engineer"]):
+            contact = Contact.objects.create(first_name=f"First{i}", last_name="Last", sudo_name=f"Alias {i}", email=f"p{i}@example.com")
+            professional = MusicProfessional.objects.create(contact=contact, pro_affiliation="BMI")
+            SocialMediaLink.objects.create(music_professional=professional, platform="Instagram", url=f"https://instagram.com/p{i}")
+            SocialMediaLink.objects.create(music_professional=professional, platform="X", url=f"https://x.com/p{i}")
+            contributor = Contributor.objects.create(music_professional=professional, role=role)
+            Contribution.objects.create(contributor=contributor, track=self.track, contribution_type="Creative")
+            Contribution.objects.create(contributor=contributor, track=self.other_track, contribution_type="Technical")
+            self.professionals.append(professional)
+
+    def test_track_credits_fixed_queries_and_cached(self):
+        url = reverse('tracks-credits', kwargs={'pk': self.track.pk})
+        with self.assertNumQueries(3):  # track, contribution chain join, social links
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        credits = response.data["credits"]
+        self.assertEqual(len(credits), 3)
+        engineer = credits[0]
+        self.assertEqual(engineer["name"], "Alias 2")
+        self.assertEqual(engineer["contributions"][0]["role"], "Engineer")
+        self.assertEqual([link["platform"] for link in engineer["social_media_links"]], ["Instagram", "X"])
+        self.assertNotIn("email", engineer)
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_professional_credits_and_invalidation(self):
+        url = reverse('music-professionals-credits', kwargs={'pk': self.professionals[0].pk})
+        with self.assertNumQueries(3):  # professional+contact, social links, contributions+tracks
+            response = self.client.get(url)
+        self.assertEqual([entry["title"] for entry in response.data["credits"]], ["Credited Track", "Second Track"])
+
+        contact = self.professionals[0].contact
+        contact.sudo_name = "Renamed"
+        contact.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data["professional"]["name"], "Renamed")
+        track_response = self.client.get(reverse('tracks-credits', kwargs={'pk': self.track.pk}))
+        self.assertIn("Renamed", [entry["name"] for entry in track_response.data["credits"]])
+
+    def test_unknown_ids_are_404(self):
+        response = self.client.get(reverse('tracks-credits', kwargs={'pk': uuid.uuid4()}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TrackListingTestCase(APITestCase):
+    def setUp(self):
+        from licenses.models import License_type
+        self.wav = FileFormat.objects.create(name='WAV', mime_type='audio/wav', extension='.wav', compression='lossless')
+        self.mp3 = FileFormat.objects.create(name='MP3', mime_type='audio/mpeg', extension='.mp3', compression='lossy')
+
+        def license_type(name, price):
+            return License_type.objects.create(
+                license_type_name=name, license_template='Template', license_term='1 Year',
+                transferability='Non-Transferable', price=price, download_limit='Unlimited',
+                streaming_limit='Unlimited', monetized_radio_plays='Unlimited', video_rights='Yes',
+                royalty_payment='No'
+            )
+        self.basic = license_type('Basic', '29.99')
+        self.premium = license_type('Premium', '99.99')
+
+    def add_option(self, track, file_format, license_type):
+        from licenses.models import TrackLicenseOptions
+        storage_file = TrackStorageFile.objects.create(file_path=f'track_storage_files/{uuid.uuid4()}', file_format=file_format)
+        return TrackLicenseOptions.objects.create(track=track, track_storage_file=storage_file, license_type=license_type)
+
+    def test_listing_rows_follow_catalog_changes(self):
+        from datetime import date
+        from .listing import refresh_track_listings
+        from .models import TrackListing
+
+        # One transaction: the refresh queued by these writes runs once, on commit
+        with mock.patch('music.tasks.probe_storage_files_task.delay'), self.captureOnCommitCallbacks(execute=True):
+            track = Track.objects.create(title='Listed', release_date=date(2025, 1, 1))
+            self.add_option(track, self.wav, self.premium)
+            self.add_option(track, self.mp3, self.basic)
+            contact = Contact.objects.create(first_name='Jo', last_name='Beats', sudo_name='JoB', email='jo@example.com')
+            producer = Contributor.objects.create(music_professional=MusicProfessional.objects.create(contact=contact), role='Producer')
+            Contribution.objects.create(contributor=producer, track=track, contribution_type='Creative')
+        self.assertEqual(refresh_track_listings([track.track_id]), 1)
+
+        listing = TrackListing.objects.get(track=track)
+        self.assertEqual((listing.title, str(listing.min_price), listing.formats), ('Listed', '29.99', ['MP3', 'WAV']))
+        self.assertEqual(listing.primary_artist, 'JoB')
+
+        # Price, credit name and track edits each refresh the affected row only
+        with self.captureOnCommitCallbacks(execute=True):
+            self.basic.price = '19.99'
+            self.basic.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            contact.sudo_name = 'Jo B.'
+            contact.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            track.title = 'Renamed'
+            track.save()
+        listing.refresh_from_db()
+        self.assertEqual((listing.title, str(listing.min_price), listing.primary_artist), ('Renamed', '19.99', 'Jo B.'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            track.delete()
+        self.assertFalse(TrackListing.objects.exists())
+
+    def test_refresh_runs_once_per_transaction(self):
+        from django.db import transaction
+        from .listing import _PendingRefresh
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                track = Track.objects.create(title='Listed')
+                self.add_option(track, self.wav, self.basic)
+                self.add_option(track, self.mp3, self.premium)
+                track.title = 'Renamed'
+                track.save()
+        refreshes = [callback for callback in callbacks if isinstance(callback, _PendingRefresh)]
+        self.assertEqual(len(refreshes), 1)
+        self.assertEqual(refreshes[0].track_ids, {track.track_id})
+
+    def test_list_endpoint_single_query(self):
+        from datetime import date
+        from .listing import rebuild_all_listings
+
+        for i in range(30):
+            track = Track.objects.create(title=f'Track {i:02d}', release_date=date(2025, 1, 1 + i % 28))
+            self.add_option(track, self.mp3, self.basic if i % 2 else self.premium)
+        self.assertEqual(rebuild_all_listings(), 30)
+
+        url = reverse('track-listings-list')
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'page_size': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 10)
+        dates = [row['release_date'] for row in response.data['results']]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+        response = self.client.get(url, {'max_price': '50', 'page_size': 100})
+        self.assertEqual(len(response.data['results']), 15)
+        self.assertEqual(self.client.get(url, {'max_price': 'cheap'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SimilarTracksTestCase(APITestCase):
+    def make_track(self, title, bpm, key, genres, moods, instruments=()):
+        return Track.objects.create(
+            title=title, bpm=bpm, key=key, genres=genres, moods=moods, instruments=list(instruments), keywords_tags=[],
+        )
+
+    def setUp(self):
+        self.trap = self.make_track('Trap A', 140, 'A minor', ['Trap'], ['Dark'], ['808'])
+        self.trap_half_time = self.make_track('Trap B', 70, 'C Major', ['Trap'], ['Dark'], ['808'])
+        self.jazz = self.make_track('Jazz', 96, 'F# Major', ['Jazz'], ['Warm'], ['Piano'])
+
+    def test_encoding(self):
+        from .similarity import LAYOUT, encode, pack, parse_key, unpack
+
+        self.assertEqual(parse_key('A minor'), (9, True))
+        self.assertEqual(parse_key('Bb Major'), (10, False))
+        self.assertEqual(parse_key('F#m'), (6, True))
+        self.assertIsNone(parse_key('Atonal'))
+
+        vector = encode({'bpm': 140, 'key': 'A minor', 'genres': ['Trap'], 'moods': ['Dark']})
+        self.assertAlmostEqual(sum(weight * weight for weight in vector.values()), 1.0)
+        # Half time and the relative major share tempo and key dimensions; only the mode differs
+        related = encode({'bpm': 70, 'key': 'C Major', 'genres': ['trap '], 'moods': ['dark']})
+        self.assertEqual(set(vector) ^ set(related), {LAYOUT['mode'], LAYOUT['mode'] + 1})
+        decoded = unpack(pack(vector))
+        self.assertEqual(set(decoded), set(vector))
+        self.assertAlmostEqual(decoded[min(vector)], vector[min(vector)], places=6)
+
+    def test_incremental_update(self):
+        from .models import SimilarTrack
+        from .similarity import update_similar_tracks
+
+        self.assertEqual(update_similar_tracks(k=2)['encoded'], 3)
+        ranked = list(SimilarTrack.objects.filter(track=self.trap).order_by('-score').values_list('similar_id', flat=True))
+        self.assertEqual(ranked[0], self.trap_half_time.track_id)
+        self.assertEqual(update_similar_tracks(k=2), {'encoded': 0, 'updated': 0})
+
+        # A new closer match only re-encodes itself and pushes the weakest neighbour out
+        twin = self.make_track('Trap A2', 140, 'A minor', ['Trap'], ['Dark'], ['808'])
+        counts = update_similar_tracks(k=2)
+        self.assertEqual(counts['encoded'], 1)
+        ranked = list(SimilarTrack.objects.filter(track=self.trap).order_by('-score').values_list('similar_id', flat=True))
+        self.assertEqual(ranked, [twin.track_id, self.trap_half_time.track_id])
+
+        # Changing a track's attributes drops it from lists it no longer belongs in
+        twin.genres, twin.moods, twin.instruments, twin.bpm, twin.key = ['Jazz'], ['Warm'], ['Piano'], 96, 'F# Major'
+        twin.save()
+        update_similar_tracks(k=2)
+        incremental = {(t, s): round(score, 5) for t, s, score in SimilarTrack.objects.values_list('track_id', 'similar_id', 'score')}
+        update_similar_tracks(full=True, k=2)
+        full = {(t, s): round(score, 5) for t, s, score in SimilarTrack.objects.values_list('track_id', 'similar_id', 'score')}
+        self.assertEqual(incremental, full)
+
+    def test_similar_endpoint(self):
+        from .listing import rebuild_all_listings
+        from .similarity import update_similar_tracks
+
+        update_similar_tracks()
+        rebuild_all_listings()
+        url = reverse('tracks-similar', args=[self.trap.track_id])
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'limit': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(results[0]['title'], 'Trap B')
+        self.assertEqual([r['score'] for r in results], sorted((r['score'] for r in results), reverse=True))
+
+        self.assertEqual(self.client.get(url, {'limit': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(SIMILAR_TRACKS_COUNT=3):  # the default limit never exceeds what is stored
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse('tracks-similar', args=[uuid.uuid4()])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/v1/tracks/not-a-uuid/similar/').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TagTestCase(APITestCase):
+    def setUp(self):
+        self.trap = Track.objects.create(title='Trap', genres=['Trap', 'Hip-Hop'], moods=['Dark'], instruments=['808'])
+        self.drill = Track.objects.create(title='Drill', genres=['Drill '], moods=['dark', 'Aggressive'])
+        self.lofi = Track.objects.create(title='Lofi', genres=['Lo-Fi', 'hip-hop'], moods=['Chill'], keywords_tags=['study'])
+
+    def test_tags_follow_json_fields(self):
+        from .models import Tag, TrackTag
+
+        # Values are normalized: 'Hip-Hop'/'hip-hop' and 'Dark'/'dark' share one tag each
+        self.assertEqual(Tag.objects.get(kind='genre', slug='hip-hop').name, 'Hip-Hop')
+        self.assertEqual(TrackTag.objects.filter(tag__kind='mood', tag__slug='dark').count(), 2)
+        self.assertEqual(TrackTag.objects.filter(track=self.trap).count(), 4)
+
+        self.trap.genres = ['Trap']
+        self.trap.save(update_fields=['genres'])
+        self.assertEqual(
+            set(TrackTag.objects.filter(track=self.trap).values_list('tag__slug', flat=True)), {'trap', 'dark', '808'}
+        )
+
+        self.trap.moods = ['Dark', 'Chill']
+        with self.assertNumQueries(1):  # only the UPDATE: no tag field was saved
+            self.trap.save(update_fields=['title'])
+        self.assertFalse(TrackTag.objects.filter(track=self.trap, tag__slug='chill').exists())
+
+    def test_backfill_and_resync(self):
+        from .models import TrackTag
+        from .tags import sync_all_track_tags
+
+        TrackTag.objects.all().delete()
+        self.assertEqual(sync_all_track_tags(), 3)
+        self.assertEqual(TrackTag.objects.count(), 11)
+
+    def test_and_or_filters(self):
+        from .listing import rebuild_all_listings
+        rebuild_all_listings()
+
+        url = reverse('tracks-list')
+        titles = lambda response: sorted(track['title'] for track in response.data)
+        self.assertEqual(titles(self.client.get(url, {'tag': 'genre:hip-hop'})), ['Lofi', 'Trap'])
+        self.assertEqual(titles(self.client.get(url, {'tag': ['genre:HIP-HOP', 'mood:dark']})), ['Trap'])
+        self.assertEqual(titles(self.client.get(url, {'tag': ['genre:trap,genre:drill', 'mood:dark']})), ['Drill', 'Trap'])
+        self.assertEqual(titles(self.client.get(url, {'tag': 'genre:unknown'})), [])
+        self.assertEqual(self.client.get(url, {'tag': 'tempo:fast'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('track-listings-list'), {'tag': 'mood:chill'})
+        self.assertEqual([row['title'] for row in response.data['results']], ['Lofi'])
+
+    def test_facets(self):
+        url = reverse('tags-facets')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['genre'][0], {'slug': 'hip-hop', 'name': 'Hip-Hop', 'count': 2})
+        self.assertEqual(response.data['keyword'], [{'slug': 'study', 'name': 'study', 'count': 1}])
+
+        response = self.client.get(url, {'kind': 'mood', 'tag': 'genre:hip-hop'})
+        self.assertEqual(list(response.data), ['mood'])
+        self.assertEqual({row['slug']: row['count'] for row in response.data['mood']}, {'dark': 1, 'chill': 1})
+
+        response = self.client.get(reverse('tags-list'), {'kind': 'genre'})
+        self.assertEqual(response.data[0]['slug'], 'hip-hop')
+        self.assertEqual(response.data[0]['track_count'], 2)
+        self.assertEqual(self.client.get(url, {'kind': 'colour'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,7 +1,7 @@
 # music/urls.py (Example)
 from django.urls import path
 from rest_framework import routers
-from .views import TrackViewSet, PublisherViewSet, ContributorViewSet, LibraryViewSet, ContributionViewSet, PublishingViewSet, FileFormatViewSet, TrackStorageFileViewSet, MusicProfessionalViewSet, SocialMediaLinkViewSet, FileFormatViewSet
+from .views import TrackViewSet, PublisherViewSet, ContributorViewSet, LibraryViewSet, ContributionViewSet, PublishingViewSet, FileFormatViewSet, TrackStorageFileViewSet, MusicProfessionalViewSet, SocialMediaLinkViewSet, FileFormatViewSet, CatalogImportViewSet, TrackListingViewSet, TagViewSet
 from django.urls import include
 
 router = routers.DefaultRouter()
@@ -15,6 +15,9 @@ router.register(r'contributions', ContributionViewSet, basename='contributions')
 router.register(r'libraries', LibraryViewSet, basename='libraries')
 router.register(r'publishers', PublisherViewSet, basename='publishers')
 router.register(r'publishings', PublishingViewSet, basename='publishings')
+router.register(r'catalog-imports', CatalogImportViewSet, basename='catalog-imports')
+router.register(r'track-listings', TrackListingViewSet, basename='track-listings')
+router.register(r'tags', TagViewSet, basename='tags')
 urlpatterns = [
     path('', include(router.urls)),
     # You might have custom paths here too
@@ -4,23 +4,114 @@ from django.shortcuts import render
 from rest_framework import generics 
 from .models import Track, Publisher, Contributor, Publishing, Contribution, Library, SocialMediaLink, MusicProfessional, FileFormat, TrackStorageFile
 from .serializers import TrackSerializer, PublisherSerializer, ContributorSerializer, PublishingSerializer, ContributionSerializer, LibrarySerializer, SocialMediaLinkSerializer, MusicProfessionalSerializer, FileFormatSerializer, TrackStorageFileSerializer 
+from .models import CatalogImport, TrackAsset, LibraryTrack, TrackListing, SimilarTrack, Tag
+from .serializers import TrackListingSerializer, TagSerializer
+from .tags import filter_by_tags, parse_tag_filters, tag_facets
+from decimal import Decimal, InvalidOperation
+from rest_framework.exceptions import ValidationError
+from .serializers import LibraryTrackSerializer, LibraryTrackIdsSerializer
+from django.db.models import Count
+from rest_framework.pagination import CursorPagination
+from .assets import decode_peaks
+from .credits import track_credits, professional_credits
+from .serializers import CatalogImportSerializer
 from rest_framework import viewsets 
 from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, HttpResponseRedirect, Http404
 from django.shortcuts import get_object_or_404
 from .models import Track
 from django.http import FileResponse
 from django.urls import reverse
+from django.conf import settings
+from django.db import transaction
+import os
+import uuid
 
 class TrackViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
-    queryset = Track.objects.all()
+    queryset = Track.objects.prefetch_related('assets')
     serializer_class = TrackSerializer
     pagination_class = None
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            # ?tag=genre:trap,genre:drill&tag=mood:dark (see music/tags.py)
+            queryset = filter_by_tags(queryset, parse_tag_filters(self.request.query_params.getlist("tag")))
+        return queryset
+
+    def _asset_or_404(self, kind):
+        asset = TrackAsset.objects.filter(track_id=self.kwargs["pk"], kind=kind).first()
+        if asset is None:
+            raise Http404("Asset not generated yet")
+        return asset
+
+    def _cached(self, response, asset):
+        # The URL is stable while the content changes, so clients revalidate with the content hash
+        response["ETag"] = f'"{asset.content_hash}"'
+        response["Cache-Control"] = "public, max-age=3600"
+        return response
+
+    @action(detail=True, methods=["get"])
+    def waveform(self, request, pk=None):
+        """
+        GET /tracks/{id}/waveform/ -> binary peaks file (all resolutions, see music/assets.py)
+        GET /tracks/{id}/waveform/?points=1024 -> one resolution as JSON
+        """
+        asset = self._asset_or_404(TrackAsset.Kind.WAVEFORM)
+        if request.headers.get("If-None-Match") == f'"{asset.content_hash}"':
+            return self._cached(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), asset)
+
+        with asset.file.open("rb") as f:
+            data = f.read()
+        points = request.query_params.get("points")
+        if not points:
+            return self._cached(HttpResponse(data, content_type=asset.content_type), asset)
+
+        duration, levels = decode_peaks(data)
+        if not points.isdigit() or int(points) not in levels:
+            return Response({"error": f"points must be one of {sorted(levels)}"}, status=status.HTTP_400_BAD_REQUEST)
+        return self._cached(Response({
+            "duration": duration,
+            "points": int(points),
+            "peaks": levels[int(points)].tolist(),
+        }), asset)
+
+    @action(detail=True, methods=["get"])
+    def credits(self, request, pk=None):
+        """GET /tracks/{id}/credits/ -> every credited professional with roles and social links"""
+        return Response(track_credits(pk))
+
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk=None):
+        """GET /tracks/{id}/similar/?limit=10 -> precomputed nearest tracks as listing rows with their score"""
+        track = generics.get_object_or_404(Track.objects.only("track_id"), pk=pk)
+        limit = request.query_params.get("limit", str(min(10, settings.SIMILAR_TRACKS_COUNT)))
+        if not limit.isdigit() or not 1 <= int(limit) <= settings.SIMILAR_TRACKS_COUNT:
+            return Response({"error": f"limit must be between 1 and {settings.SIMILAR_TRACKS_COUNT}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        scores = dict(
+            SimilarTrack.objects
+            .filter(track=track)
+            .order_by("-score", "similar_id")
+            .values_list("similar_id", "score")[:int(limit)]
+        )
+        listings = TrackListing.objects.in_bulk(list(scores))
+        results = [
+            {**TrackListingSerializer(listings[track_id]).data, "score": round(score, 4)}
+            for track_id, score in scores.items() if track_id in listings
+        ]
+        return Response({"track_id": str(track.track_id), "results": results})
+
+    @action(detail=True, methods=["get"])
+    def preview(self, request, pk=None):
+        """GET /tracks/{id}/preview/ -> redirect to the content-addressed preview clip"""
+        asset = self._asset_or_404(TrackAsset.Kind.PREVIEW)
+        return self._cached(HttpResponseRedirect(asset.file.url), asset)
+
     def list(self, request, *args, **kwargs):
         print("DEBUG: TrackViewSet.list called")
         print(f"DEBUG: Request: {request.method} {request.path}")
@@ -106,12 +197,61 @@ class ContributionViewSet(viewsets.ModelViewSet):
             traceback.print_exc()
             raise
 
+class LibraryTrackCursorPagination(CursorPagination):
+    # Most recently added first; (library, id) is indexed so every page is one index range scan
+    ordering = "-id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
 class LibraryViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
-    queryset = Library.objects.all()
+    queryset = Library.objects.annotate(track_count=Count("library_tracks"))
     serializer_class = LibrarySerializer
     pagination_class = None
 
+    @action(detail=True, methods=["get", "post", "delete"], url_path="tracks")
+    def tracks(self, request, pk=None):
+        """
+        GET    /libraries/{id}/tracks/?cursor=...&page_size=50 -> cursor-paginated tracks, newest first
+        POST   /libraries/{id}/tracks/ {"track_ids": [...]}   -> add tracks (one bulk insert)
+        DELETE /libraries/{id}/tracks/ {"track_ids": [...]}   -> remove tracks (one bulk delete)
+        """
+        library = get_object_or_404(Library.objects.only("library_id"), pk=pk)
+
+        if request.method == "GET":
+            entries = (
+                LibraryTrack.objects
+                .filter(library=library)
+                .select_related("track")
+                .prefetch_related("track__assets")
+            )
+            paginator = LibraryTrackCursorPagination()
+            page = paginator.paginate_queryset(entries, request, view=self)
+            return paginator.get_paginated_response(LibraryTrackSerializer(page, many=True).data)
+
+        serializer = LibraryTrackIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        track_ids = set(serializer.validated_data["track_ids"])
+
+        if request.method == "DELETE":
+            removed, _ = LibraryTrack.objects.filter(library=library, track_id__in=track_ids).delete()
+            return Response({"removed": removed})
+
+        existing_tracks = set(Track.objects.filter(track_id__in=track_ids).values_list("track_id", flat=True))
+        already_added = set(
+            LibraryTrack.objects.filter(library=library, track_id__in=existing_tracks).values_list("track_id", flat=True)
+        )
+        new_entries = [LibraryTrack(library=library, track_id=track_id) for track_id in existing_tracks - already_added]
+        # ignore_conflicts covers a concurrent request adding the same track
+        LibraryTrack.objects.bulk_create(new_entries, ignore_conflicts=True)
+        return Response({
+            "added": len(new_entries),
+            "already_in_library": len(already_added),
+            "missing": sorted(str(track_id) for track_id in track_ids - existing_tracks),
+        }, status=status.HTTP_201_CREATED if new_entries else status.HTTP_200_OK)
+
     def list(self, request, *args, **kwargs):
         print("DEBUG: LibraryViewSet.list called")
         print(f"DEBUG: Request: {request.method} {request.path}")
@@ -148,6 +288,11 @@ class MusicProfessionalViewSet(viewsets.ModelViewSet):
     serializer_class = MusicProfessionalSerializer
     pagination_class = None
 
+    @action(detail=True, methods=["get"])
+    def credits(self, request, pk=None):
+        """GET /music-professionals/{id}/credits/ -> the professional and every track they're credited on"""
+        return Response(professional_credits(pk))
+
     def list(self, request, *args, **kwargs):
         print("DEBUG: MusicProfessionalViewSet.list called")
         print(f"DEBUG: Request: {request.method} {request.path}")
@@ -195,3 +340,112 @@ class TrackStorageFileViewSet(viewsets.ModelViewSet):
             import traceback
             traceback.print_exc()
             raise
+
+
+class CatalogImportViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Bulk catalog imports (staff only - imports read from the server's CATALOG_IMPORT_ROOT).
+    POST a manifest upload plus the audio directory (relative to CATALOG_IMPORT_ROOT); the import runs in celery.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    queryset = CatalogImport.objects.all()
+    serializer_class = CatalogImportSerializer
+    pagination_class = None
+
+    def _import_root(self):
+        return os.path.realpath(settings.CATALOG_IMPORT_ROOT)
+
+    def create(self, request, *args, **kwargs):
+        manifest = request.FILES.get("manifest")
+        if not manifest:
+            return Response({"error": "manifest file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        extension = os.path.splitext(manifest.name)[1].lower()
+        if extension not in (".csv", ".jsonl", ".ndjson"):
+            return Response({"error": "manifest must be a .csv or .jsonl file"}, status=status.HTTP_400_BAD_REQUEST)
+
+        root = self._import_root()
+        audio_root = os.path.realpath(os.path.join(root, request.data.get("audio_dir", "")))
+        if not (audio_root == root or audio_root.startswith(root + os.sep)) or not os.path.isdir(audio_root):
+            return Response({"error": "audio_dir must be an existing directory inside the import root"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Stream the manifest to disk in chunks so the worker can read it row by row
+        manifest_dir = os.path.join(root, "manifests")
+        os.makedirs(manifest_dir, exist_ok=True)
+        manifest_path = os.path.join(manifest_dir, f"{uuid.uuid4()}{extension}")
+        with open(manifest_path, "wb") as f:
+            for chunk in manifest.chunks():
+                f.write(chunk)
+
+        job = CatalogImport.objects.create(manifest_path=manifest_path, audio_root=audio_root)
+        self._enqueue(job)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["post"])
+    def resume(self, request, pk=None):
+        job = self.get_object()
+        if job.status in (CatalogImport.Status.COMPLETED, CatalogImport.Status.RUNNING):
+            return Response({"error": f"Import is {job.status.lower()}"}, status=status.HTTP_400_BAD_REQUEST)
+        self._enqueue(job)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    def _enqueue(self, job):
+        from .tasks import import_catalog_task
+        transaction.on_commit(lambda: import_catalog_task.delay(str(job.import_id)))
+
+
+class TrackListingCursorPagination(CursorPagination):
+    # Newest releases first, matching track_listing_order_idx
+    ordering = ("-release_date", "track_id")
+    page_size = 48
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class TrackListingViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Storefront grid served from the TrackListing read model (one indexed scan, no joins).
+    GET /track-listings/?cursor=...&page_size=48&max_price=50&tag=genre:trap,genre:drill&tag=mood:dark
+    """
+    permission_classes = [permissions.AllowAny]
+    queryset = TrackListing.objects.all()
+    serializer_class = TrackListingSerializer
+    pagination_class = TrackListingCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        max_price = self.request.query_params.get("max_price")
+        if max_price:
+            try:
+                queryset = queryset.filter(min_price__lte=Decimal(max_price))
+            except InvalidOperation:
+                raise ValidationError({"max_price": "Must be a number"})
+        return filter_by_tags(queryset, parse_tag_filters(self.request.query_params.getlist("tag")))
+
+
+class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    GET /tags/?kind=genre -> tags with their track counts
+    GET /tags/facets/?kind=genre&limit=20&tag=mood:dark -> per kind, the most used tags among the filtered tracks
+    """
+    permission_classes = [permissions.AllowAny]
+    serializer_class = TagSerializer
+    pagination_class = None
+
+    def _kind(self):
+        kind = self.request.query_params.get("kind")
+        if kind and kind not in Tag.Kind.values:
+            raise ValidationError({"kind": f"Must be one of {', '.join(Tag.Kind.values)}"})
+        return kind
+
+    def get_queryset(self):
+        queryset = Tag.objects.annotate(track_count=Count("track_tags")).order_by("kind", "-track_count", "slug")
+        kind = self._kind()
+        return queryset.filter(kind=kind) if kind else queryset
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        limit = request.query_params.get("limit", "50")
+        if not limit.isdigit() or not 1 <= int(limit) <= 500:
+            raise ValidationError({"limit": "Must be between 1 and 500"})
+        groups = parse_tag_filters(request.query_params.getlist("tag"))
+        return Response(tag_facets(groups, kind=self._kind(), limit=int(limit)))
@@ -1,7 +1,10 @@
 from django.contrib import admin
+from django.db import transaction
 from django_summernote.admin import SummernoteModelAdmin
-from .models import NewsletterCategory, Subscriber, Subscription, Newsletter
-from .tasks import send_newsletter_task
+from .models import NewsletterCategory, Subscriber, Subscription, Newsletter, Segment
+from .delivery import delivery_progress, progress_annotations, retry_failed
+from .segments import materialize_segment
+from .tasks import materialize_segment_task, send_newsletter_task
 
 @admin.register(NewsletterCategory)
 class NewsletterCategoryAdmin(admin.ModelAdmin):
@@ -23,16 +26,72 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'source', 'category')
     search_fields = ('subscriber__email',)
 
+@admin.register(Segment)
+class SegmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'audience_size', 'materialized_at', 'updated_at')
+    search_fields = ('name', 'description')
+    filter_horizontal = ('any_categories', 'all_categories')
+    readonly_fields = ('audience_size', 'materialized_at')
+    actions = ['refresh_audience']
+
+    def save_related(self, request, form, formsets, change):
+        # The definition is complete once the M2M fields are saved; rebuild the audience in celery
+        super().save_related(request, form, formsets, change)
+        segment_id = form.instance.segment_id
+        transaction.on_commit(lambda: materialize_segment_task.delay(segment_id))
+
+    def refresh_audience(self, request, queryset):
+        """Rebuild the materialized audience of the selected segments now."""
+        for segment in queryset:
+            added, removed = materialize_segment(segment)
+            self.message_user(request, f"{segment.name}: +{added} / -{removed} subscribers.")
+
+    refresh_audience.short_description = "Refresh audience now"
+
 @admin.register(Newsletter)
 class NewsletterAdmin(SummernoteModelAdmin):
-    list_display = ('subject', 'status', 'created_date', 'sent_at')
+    list_display = ('subject', 'status', 'audience', 'progress', 'created_date', 'sent_at')
     list_filter = ('status', 'created_date')
+    list_select_related = ('segment', 'target_category')
     search_fields = ('subject',)
     summernote_fields = ('content',)
-    actions = ['send_newsletter']
+    readonly_fields = ('audience', 'progress')
+    actions = ['send_newsletter', 'retry_failed_deliveries']
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        match = request.resolver_match
+        if match is None or not match.url_name.endswith('_changelist'):
+            return queryset
+        # Delivery ledger counts for the whole changelist page in the same query; the bodies are
+        # not shown there and would only widen the GROUP BY
+        return queryset.defer('content', 'rendered_html', 'rendered_text').annotate(**{
+            f'delivery_{name}': expression for name, expression in progress_annotations().items()
+        })
+
+    @admin.display(description="Audience")
+    def audience(self, obj):
+        # Segment sizes are stored when the segment is materialized - no audience query here
+        if obj.segment_id:
+            size = obj.segment.audience_size
+            return f"{obj.segment.name} ({size if size is not None else 'not built yet'})"
+        return obj.target_category.name if obj.target_category_id else "All subscribers"
+
+    @admin.display(description="Progress")
+    def progress(self, obj):
+        counts = (
+            {name: getattr(obj, f'delivery_{name}') for name in progress_annotations()}
+            if hasattr(obj, 'delivery_total') else delivery_progress(obj)
+        )
+        if not counts['total']:
+            return "-"
+        return (
+            f"{counts['sent']}/{counts['total']} sent, {counts['queued']} queued, "
+            f"{counts['failed']} failed, {counts['skipped']} skipped"
+        )
 
     def send_newsletter(self, request, queryset):
-        """Send selected newsletters via Celery task."""
+        """Send selected newsletters via Celery task (a newsletter still SENDING resumes its unfinished chunks)."""
         count = 0
         for newsletter in queryset:
             if newsletter.status == Newsletter.Status.SENT:
@@ -45,4 +104,16 @@ class NewsletterAdmin(SummernoteModelAdmin):
         if count > 0:
             self.message_user(request, f"Queued {count} newsletter(s) for sending.")
     
-    send_newsletter.short_description = "Send selected newsletters"
\ No newline at end of file
+    send_newsletter.short_description = "Send selected newsletters"
+
+    def retry_failed_deliveries(self, request, queryset):
+        """Requeue the failed ledger rows of the selected newsletters and send them again."""
+        requeued = 0
+        for newsletter in queryset:
+            count = retry_failed(newsletter)
+            if count:
+                send_newsletter_task.delay(newsletter.newsletter_id)
+                requeued += count
+        self.message_user(request, f"Requeued {requeued} failed deliveries.")
+
+    retry_failed_deliveries.short_description = "Retry failed deliveries"
@@ -0,0 +1,193 @@
+import csv
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .models import NewsletterCategory, Subscriber, Subscription
+
+# Bulk subscriber import/export (POST/GET /api/v1/newsletter/subscribers/import|export/)
+# Import streams a CSV or JSONL upload row by row: emails are normalized and deduplicated in memory,
+# then written NEWSLETTER_IMPORT_BATCH_SIZE at a time with bulk_create(ignore_conflicts=True) - existing
+# subscribers and subscriptions are left as they are (an imported list never resubscribes someone who
+# unsubscribed). Rows that can't be imported are reported with their row number instead of failing
+# the upload. Export streams the table in chunks, so memory stays flat whatever its size.
+
+IMPORT_EXTENSIONS = ('.csv', '.jsonl', '.ndjson')
+EXPORT_FIELDS = ['email', 'is_active', 'is_verified', 'subscribed_at', 'unsubscribed_at', 'categories']
+
+
+def import_batch_size():
+    return getattr(settings, 'NEWSLETTER_IMPORT_BATCH_SIZE', 1000)
+
+
+def read_upload(upload):
+    """Stream (row number, dict) pairs from an uploaded CSV/JSONL file without loading it whole"""
+    extension = os.path.splitext(upload.name)[1].lower()
+    if extension not in IMPORT_EXTENSIONS:
+        raise ValueError("File must be a .csv or .jsonl file")
+    upload.seek(0)
+    text = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        if extension == '.csv':
+            # row 1 is the header
+            yield from enumerate(csv.DictReader(text), start=2)
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = {'__error__': f"Invalid JSON: {e}"}
+                yield line_number, row if isinstance(row, dict) else {'__error__': "Expected a JSON object"}
+    finally:
+        text.detach()  # leave the upload's file open for Django to clean up
+
+
+def _category_slugs(value):
+    if value in (None, ''):
+        return []
+    if isinstance(value, list):
+        return [str(slug).strip() for slug in value if str(slug).strip()]
+    return [slug.strip() for slug in str(value).replace(';', ',').split(',') if slug.strip()]
+
+
+class SubscriberImport:
+    """One import run; `run(rows)` returns the summary reported to the client"""
+
+    def __init__(self, source=Subscription.SubscriptionSource.MANUAL, batch_size=None):
+        self.source = source
+        self.batch_size = batch_size or import_batch_size()
+        self.max_errors = getattr(settings, 'NEWSLETTER_IMPORT_MAX_REPORTED_ERRORS', 500)
+        categories = NewsletterCategory.objects.filter(is_active=True).values_list('slug', 'category_id', 'is_default')
+        self.category_ids = {slug: category_id for slug, category_id, _ in categories}
+        self.default_category_ids = {category_id for _, category_id, is_default in categories if is_default}
+        self.flushed = set()
+        self.pending = {}  # email -> category ids, flushed every batch_size emails
+        self.summary = {
+            'rows': 0, 'created': 0, 'existing': 0, 'duplicates': 0,
+            'subscriptions_created': 0, 'error_count': 0, 'errors': [],
+        }
+
+    def error(self, row_number, message, email=None):
+        self.summary['error_count'] += 1
+        if len(self.summary['errors']) < self.max_errors:
+            self.summary['errors'].append({'row': row_number, 'email': email, 'error': message})
+
+    def add(self, row_number, row):
+        self.summary['rows'] += 1
+        if '__error__' in row:
+            self.error(row_number, row['__error__'])
+            return
+        raw_email = row.get('email')
+        email = str(raw_email or '').strip().lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            self.error(row_number, "Invalid email address", raw_email)
+            return
+        slugs = _category_slugs(row.get('categories'))
+        unknown = [slug for slug in slugs if slug not in self.category_ids]
+        if unknown:
+            self.error(row_number, f"Unknown categories: {', '.join(unknown)}", email)
+            return
+        category_ids = {self.category_ids[slug] for slug in slugs} or self.default_category_ids
+
+        if email in self.pending or email in self.flushed:
+            self.summary['duplicates'] += 1
+        self.pending.setdefault(email, set()).update(category_ids)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        emails = list(self.pending)
+        with transaction.atomic():
+            existing = set(Subscriber.objects.filter(email__in=emails).values_list('email', flat=True))
+            Subscriber.objects.bulk_create(
+                [Subscriber(email=email) for email in emails if email not in existing],
+                ignore_conflicts=True,
+            )
+            subscriber_ids = dict(Subscriber.objects.filter(email__in=emails).values_list('email', 'subscriber_id'))
+            ids = list(subscriber_ids.values())
+            subscriptions = [
+                Subscription(subscriber_id=subscriber_ids[email], category_id=category_id, source=self.source)
+                for email, category_ids in self.pending.items()
+                for category_id in category_ids
+            ]
+            existing_subscriptions = Subscription.objects.filter(subscriber_id__in=ids).count()
+            Subscription.objects.bulk_create(subscriptions, ignore_conflicts=True, batch_size=self.batch_size)
+            created_subscriptions = (
+                Subscription.objects.filter(subscriber_id__in=ids).count() - existing_subscriptions
+            )
+        # Duplicates of an email flushed in an earlier batch count as existing here
+        self.summary['created'] += len(set(emails) - existing)
+        self.summary['existing'] += len(existing - self.flushed)
+        self.summary['subscriptions_created'] += created_subscriptions
+        self.flushed.update(emails)
+        self.pending = {}
+
+    def run(self, rows):
+        for row_number, row in rows:
+            self.add(row_number, row)
+        self.flush()
+        return self.summary
+
+
+def export_queryset(active=None, category_slug=None):
+    subscribers = Subscriber.objects.order_by('subscribed_at', 'subscriber_id').prefetch_related(
+        Prefetch(
+            'subscriptions',
+            queryset=Subscription.objects.filter(is_active=True).select_related('category').only(
+                'subscriber_id', 'category__slug',
+            ),
+            to_attr='active_subscriptions',
+        )
+    )
+    if active is not None:
+        subscribers = subscribers.filter(is_active=active)
+    if category_slug:
+        subscribers = subscribers.filter(
+            subscriptions__category__slug=category_slug, subscriptions__is_active=True,
+        )
+    return subscribers
+
+
+def export_records(subscribers):
+    chunk_size = getattr(settings, 'NEWSLETTER_EXPORT_CHUNK_SIZE', 2000)
+    for subscriber in subscribers.iterator(chunk_size=chunk_size):
+        yield {
+            'email': subscriber.email,
+            'is_active': subscriber.is_active,
+            'is_verified': subscriber.is_verified,
+            'subscribed_at': subscriber.subscribed_at.isoformat(),
+            'unsubscribed_at': subscriber.unsubscribed_at.isoformat() if subscriber.unsubscribed_at else '',
+            'categories': sorted(s.category.slug for s in subscriber.active_subscriptions),
+        }
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(subscribers):
+    writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for record in export_records(subscribers):
+        record['categories'] = ','.join(record['categories'])
+        yield writer.writerow(record)
+
+
+def export_jsonl(subscribers):
+    for record in export_records(subscribers):
+        yield json.dumps(record) + '\n'
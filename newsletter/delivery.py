@@ -0,0 +1,242 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from analytics.tracking import tracking_token
+from core.email_backends import is_message_rejection
+from core.email_service import EmailService
+
+from .models import Newsletter, NewsletterDelivery, NewsletterSendChunk, Subscriber
+from .rendering import TRACKING_TOKEN_TAG, UNSUBSCRIBE_URL_TAG, render_newsletter, tracking_campaign
+from .segments import materialize_segment, segment_audience
+
+# Newsletter fan-out
+# plan_send() writes the delivery ledger: one NewsletterDelivery row per eligible subscriber (in id
+# order, bulk-inserted NEWSLETTER_LEDGER_BATCH_SIZE rows at a time), grouped into chunks of
+# NEWSLETTER_CHUNK_SIZE. Every chunk is sent by its own Celery task (dispatched as a group), which
+# opens one mail connection and sends the chunk's QUEUED rows NEWSLETTER_BATCH_SIZE at a time,
+# marking each row SENT or FAILED right after its batch. Re-running the send only dispatches
+# unfinished chunks, and those only send rows still QUEUED - a crash costs a delta send, not a
+# full-list resend. The last chunk to finish marks the newsletter SENT.
+# A chunk task first claims its chunk (PENDING -> SENDING in one UPDATE), so a duplicate task sends
+# nothing; only the task's own retry, or a run after NEWSLETTER_CHUNK_LEASE_SECONDS, takes over a
+# SENDING chunk. A refused message marks its row FAILED, but a transport error (mail server or
+# SendGrid unreachable) leaves the remaining rows QUEUED and the chunk SENDING, and propagates so
+# the task is retried.
+# The campaign is rendered once, when the send is planned (newsletter/rendering.py), with an
+# UNSUBSCRIBE_URL_TAG placeholder that is substituted per recipient - by SendGrid itself when the
+# backend sends personalization batches, in which case a batch is as large as one API call allows.
+
+
+def chunk_size():
+    return getattr(settings, 'NEWSLETTER_CHUNK_SIZE', 1000)
+
+
+def batch_size():
+    return getattr(settings, 'NEWSLETTER_BATCH_SIZE', 100)
+
+
+def ledger_batch_size():
+    return getattr(settings, 'NEWSLETTER_LEDGER_BATCH_SIZE', 1000)
+
+
+def chunk_lease():
+    return timedelta(seconds=getattr(settings, 'NEWSLETTER_CHUNK_LEASE_SECONDS', 3600))
+
+
+def eligible_subscribers(newsletter):
+    """Recipients of the newsletter (for a segment, its stored audience)"""
+    if newsletter.segment_id:
+        return segment_audience(newsletter.segment)
+    subscribers = Subscriber.objects.filter(is_active=True)
+    if newsletter.target_category_id:
+        subscribers = subscribers.filter(
+            subscriptions__category_id=newsletter.target_category_id,
+            subscriptions__is_active=True,
+        )
+    return subscribers
+
+
+def plan_send(newsletter):
+    """Write the delivery ledger and chunks of a newsletter that has none yet; returns all its chunks"""
+    with transaction.atomic():
+        newsletter = Newsletter.objects.select_for_update().get(pk=newsletter.pk)
+        if not newsletter.send_chunks.exists():
+            if newsletter.segment_id:
+                # Applies only the difference, so it is cheap when the audience is already up to date
+                materialize_segment(newsletter.segment)
+            recipients = eligible_subscribers(newsletter).order_by('subscriber_id').values_list('subscriber_id', 'email')
+            index, pending = 0, []
+            for recipient in recipients.iterator(chunk_size=ledger_batch_size()):
+                pending.append(recipient)
+                if len(pending) == chunk_size():
+                    _write_chunk(newsletter, index, pending)
+                    index, pending = index + 1, []
+            if pending:
+                _write_chunk(newsletter, index, pending)
+            render(newsletter)
+        if newsletter.status != Newsletter.Status.SENT:
+            newsletter.status = Newsletter.Status.SENDING
+            newsletter.save(update_fields=['status', 'updated_at'])
+    return list(newsletter.send_chunks.all())
+
+
+def _write_chunk(newsletter, index, recipients):
+    chunk = NewsletterSendChunk.objects.create(newsletter=newsletter, index=index, recipient_count=len(recipients))
+    NewsletterDelivery.objects.bulk_create(
+        (
+            NewsletterDelivery(newsletter=newsletter, chunk=chunk, subscriber_id=subscriber_id, email=email)
+            for subscriber_id, email in recipients
+        ),
+        batch_size=ledger_batch_size(),
+    )
+
+
+def render(newsletter):
+    """Compile the campaign and store it on the newsletter"""
+    rendered = render_newsletter(newsletter)
+    newsletter.rendered_html, newsletter.rendered_text = rendered.html, rendered.text
+    Newsletter.objects.filter(pk=newsletter.pk).update(rendered_html=rendered.html, rendered_text=rendered.text)
+
+
+def unsubscribe_url(subscriber, base_url):
+    return f"{base_url}/newsletter/unsubscribe/{subscriber.unsubscribe_token}/"
+
+
+def _substitutions(newsletter, delivery, base_url):
+    return {
+        UNSUBSCRIBE_URL_TAG: unsubscribe_url(delivery.subscriber, base_url),
+        TRACKING_TOKEN_TAG: tracking_token(tracking_campaign(newsletter), delivery.subscriber_id),
+    }
+
+
+def _flush(newsletter, connection, deliveries, base_url):
+    """Send one batch of ledger rows and record each row's outcome; returns the number sent"""
+    try:
+        accepted = set(EmailService.send_newsletter(
+            subject=newsletter.subject,
+            message=newsletter.rendered_text,
+            recipient_list=[delivery.email for delivery in deliveries],
+            html_message=newsletter.rendered_html,
+            substitutions={delivery.email: _substitutions(newsletter, delivery, base_url) for delivery in deliveries},
+            connection=connection,
+        ))
+    except Exception as e:
+        # SendGrid refusing the whole batch fails its rows; transport errors leave them QUEUED for the retry
+        if not is_message_rejection(e):
+            raise
+        accepted = set()
+    sent_ids = [delivery.pk for delivery in deliveries if delivery.email in accepted]
+    failed_ids = [delivery.pk for delivery in deliveries if delivery.email not in accepted]
+
+    now = timezone.now()
+    NewsletterDelivery.objects.filter(pk__in=sent_ids).update(
+        status=NewsletterDelivery.Status.SENT, sent_at=now, updated_at=now, attempts=F('attempts') + 1,
+    )
+    NewsletterDelivery.objects.filter(pk__in=failed_ids).update(
+        status=NewsletterDelivery.Status.FAILED, updated_at=now, attempts=F('attempts') + 1,
+    )
+    return len(sent_ids)
+
+
+def claim_chunk(chunk_id, resume=False):
+    """Move a chunk to SENDING if no other task holds it (`resume`: the task's own retry); True if claimed"""
+    now = timezone.now()
+    claimable = Q(status=NewsletterSendChunk.Status.PENDING) | Q(
+        status=NewsletterSendChunk.Status.SENDING, started_at__lt=now - chunk_lease(),
+    )
+    if resume:
+        claimable |= Q(status=NewsletterSendChunk.Status.SENDING)
+    return bool(
+        NewsletterSendChunk.objects.filter(claimable, pk=chunk_id)
+        .update(status=NewsletterSendChunk.Status.SENDING, started_at=now)
+    )
+
+
+def send_chunk(chunk_id, resume=False):
+    """Send the QUEUED ledger rows of one chunk over a single connection; returns messages sent by this run"""
+    if not claim_chunk(chunk_id, resume):
+        return 0
+    chunk = NewsletterSendChunk.objects.select_related('newsletter').get(pk=chunk_id)
+    newsletter = chunk.newsletter
+    if not newsletter.rendered_html:
+        render(newsletter)
+
+    # Subscribers who left, or unsubscribed from the newsletter's category or segment, since the send was
+    # planned (unsubscribing prunes segment memberships, so a segment's stored audience is current)
+    chunk.deliveries.filter(status=NewsletterDelivery.Status.QUEUED).exclude(
+        subscriber_id__in=eligible_subscribers(newsletter).values('subscriber_id'),
+    ).update(status=NewsletterDelivery.Status.SKIPPED, updated_at=timezone.now())
+    queued = (
+        chunk.deliveries.filter(status=NewsletterDelivery.Status.QUEUED)
+        .select_related('subscriber')
+        .only('email', 'subscriber__unsubscribe_token')
+        .order_by('pk')
+    )
+
+    base_url = getattr(settings, 'PUBLIC_BASE_URL', 'http://localhost:8000')
+    sent = 0
+    # Not fail_silently: a dead or dropped connection raises (so the task retries with the rest still
+    # QUEUED), while _flush and the backends record refused messages as FAILED
+    connection = get_connection()
+    connection.open()
+    size = getattr(connection, 'personalization_batch_size', None) or batch_size()
+    try:
+        last_pk = 0
+        while batch := list(queued.filter(pk__gt=last_pk)[:size]):
+            sent += _flush(newsletter, connection, batch, base_url)
+            last_pk = batch[-1].pk
+    finally:
+        connection.close()
+
+    chunk.status = NewsletterSendChunk.Status.DONE
+    chunk.completed_at = timezone.now()
+    chunk.save(update_fields=['status', 'completed_at'])
+    finish_if_complete(newsletter)
+    return sent
+
+
+def delivery_progress(newsletter):
+    """Ledger counts per status, in one aggregate query"""
+    return newsletter.deliveries.aggregate(**progress_annotations(prefix=''))
+
+
+def progress_annotations(prefix='deliveries__'):
+    """Count() expressions for each delivery status (prefix 'deliveries__' to annotate newsletters)"""
+    annotations = {'total': Count(f'{prefix}pk')}
+    for status in NewsletterDelivery.Status:
+        annotations[status.value.lower()] = Count(f'{prefix}pk', filter=Q(**{f'{prefix}status': status}))
+    return annotations
+
+
+def retry_failed(newsletter):
+    """Queue the FAILED rows again and reopen their chunks; returns the number of rows requeued"""
+    with transaction.atomic():
+        chunk_ids = set(
+            newsletter.deliveries.filter(status=NewsletterDelivery.Status.FAILED).values_list('chunk_id', flat=True)
+        )
+        requeued = newsletter.deliveries.filter(status=NewsletterDelivery.Status.FAILED).update(
+            status=NewsletterDelivery.Status.QUEUED, updated_at=timezone.now(),
+        )
+        if requeued:
+            NewsletterSendChunk.objects.filter(pk__in=chunk_ids).update(
+                status=NewsletterSendChunk.Status.PENDING, completed_at=None,
+            )
+            Newsletter.objects.filter(pk=newsletter.pk).update(status=Newsletter.Status.SENDING, updated_at=timezone.now())
+    return requeued
+
+
+def finish_if_complete(newsletter):
+    """Mark the newsletter SENT once no chunk is left (safe when chunks finish concurrently)"""
+    if newsletter.send_chunks.exclude(status=NewsletterSendChunk.Status.DONE).exists():
+        return False
+    return bool(
+        Newsletter.objects
+        .filter(pk=newsletter.pk)
+        .exclude(status=Newsletter.Status.SENT)
+        .update(status=Newsletter.Status.SENT, sent_at=timezone.now(), updated_at=timezone.now())
+    )
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletter', '0004_alter_newsletter_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='newsletter',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='DRAFT', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='NewsletterSendChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('first_subscriber_id', models.UUIDField()),
+                ('last_subscriber_id', models.UUIDField()),
+                ('last_sent_subscriber_id', models.UUIDField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('DONE', 'Done')], default='PENDING', max_length=10)),
+                ('recipient_count', models.PositiveIntegerField(default=0, help_text='Eligible recipients when the send was planned.')),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('newsletter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='send_chunks', to='newsletter.newsletter')),
+            ],
+            options={
+                'ordering': ['newsletter', 'index'],
+                'unique_together': {('newsletter', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletter', '0005_newsletter_send_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletter',
+            name='rendered_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='rendered_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
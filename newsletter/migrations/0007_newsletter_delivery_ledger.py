@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletter', '0006_newsletter_rendered'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='newslettersendchunk',
+            name='failed_count',
+        ),
+        migrations.RemoveField(
+            model_name='newslettersendchunk',
+            name='first_subscriber_id',
+        ),
+        migrations.RemoveField(
+            model_name='newslettersendchunk',
+            name='last_sent_subscriber_id',
+        ),
+        migrations.RemoveField(
+            model_name='newslettersendchunk',
+            name='last_subscriber_id',
+        ),
+        migrations.RemoveField(
+            model_name='newslettersendchunk',
+            name='sent_count',
+        ),
+        migrations.CreateModel(
+            name='NewsletterDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(help_text='Address at the time the send was planned.', max_length=254)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('SENT', 'Sent'), ('FAILED', 'Failed'), ('SKIPPED', 'Skipped')], default='QUEUED', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='newsletter.newslettersendchunk')),
+                ('newsletter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='newsletter.newsletter')),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='newsletter_deliveries', to='newsletter.subscriber')),
+            ],
+            options={
+                'verbose_name_plural': 'Newsletter deliveries',
+                'indexes': [models.Index(fields=['chunk', 'status'], name='delivery_chunk_status_idx'), models.Index(fields=['newsletter', 'status'], name='delivery_newsletter_status_idx')],
+                'unique_together': {('newsletter', 'subscriber')},
+            },
+        ),
+    ]
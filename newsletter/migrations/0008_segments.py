@@ -0,0 +1,72 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:46
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletter', '0007_newsletter_delivery_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Segment',
+            fields=[
+                ('segment_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('sources', models.JSONField(blank=True, default=list, help_text='Only subscriptions from these signup sources (e.g. ["CHECKOUT"]). Leave empty for any.')),
+                ('subscribed_after', models.DateTimeField(blank=True, null=True)),
+                ('subscribed_before', models.DateTimeField(blank=True, null=True)),
+                ('audience_size', models.PositiveIntegerField(blank=True, editable=False, null=True)),
+                ('materialized_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SegmentMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['category', 'is_active', 'subscriber'], name='subscription_category_idx'),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='all_categories',
+            field=models.ManyToManyField(blank=True, help_text='Subscribed to every one of these (intersection).', related_name='segments_all', to='newsletter.newslettercategory'),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='any_categories',
+            field=models.ManyToManyField(blank=True, help_text='Subscribed to at least one of these (union). Leave blank for any category.', related_name='segments_any', to='newsletter.newslettercategory'),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='segment',
+            field=models.ForeignKey(blank=True, help_text="Optional: Send to this segment's audience instead (not combined with a target category).", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='newsletters', to='newsletter.segment'),
+        ),
+        migrations.AddField(
+            model_name='segmentmember',
+            name='segment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='newsletter.segment'),
+        ),
+        migrations.AddField(
+            model_name='segmentmember',
+            name='subscriber',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segment_memberships', to='newsletter.subscriber'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='segmentmember',
+            unique_together={('segment', 'subscriber')},
+        ),
+    ]
@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 
 
@@ -99,6 +100,10 @@ class Subscription(models.Model):
     class Meta:
         unique_together = ['subscriber', 'category']
         ordering = ['-subscribed_at']
+        indexes = [
+            # Audience queries: active subscribers of a category
+            models.Index(fields=['category', 'is_active', 'subscriber'], name='subscription_category_idx'),
+        ]
 
     def __str__(self):
         return f"{self.category} ->{self.is_active} + " + " " + f"{self.source}"
@@ -111,17 +116,81 @@ class Subscription(models.Model):
         self.subscriptions.update(is_active=False)
 
 
+class Segment(models.Model):
+    """
+    A reusable audience: active subscribers with an active subscription to any of `any_categories`
+    and to all of `all_categories`, optionally only subscriptions from `sources` and within the
+    subscription date range. The matching subscriber ids are materialized into SegmentMember
+    (newsletter/segments.py), so sends and size previews never re-run the query.
+    """
+    segment_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=100, unique=True)
+    description = models.TextField(blank=True)
+    any_categories = models.ManyToManyField(
+        NewsletterCategory,
+        blank=True,
+        related_name='segments_any',
+        help_text="Subscribed to at least one of these (union). Leave blank for any category."
+    )
+    all_categories = models.ManyToManyField(
+        NewsletterCategory,
+        blank=True,
+        related_name='segments_all',
+        help_text="Subscribed to every one of these (intersection)."
+    )
+    sources = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Only subscriptions from these signup sources (e.g. [\"CHECKOUT\"]). Leave empty for any."
+    )
+    subscribed_after = models.DateTimeField(null=True, blank=True)
+    subscribed_before = models.DateTimeField(null=True, blank=True)
+
+    # Materialized audience
+    audience_size = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    materialized_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    created_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        unknown = set(self.sources or []) - set(Subscription.SubscriptionSource.values)
+        if unknown:
+            raise ValidationError({'sources': f"Unknown sources: {', '.join(sorted(unknown))}"})
+        if self.subscribed_after and self.subscribed_before and self.subscribed_after >= self.subscribed_before:
+            raise ValidationError({'subscribed_before': "Must be after subscribed_after."})
+
+
+class SegmentMember(models.Model):
+    """One subscriber of a segment's materialized audience."""
+    segment = models.ForeignKey(Segment, on_delete=models.CASCADE, related_name='members')
+    subscriber = models.ForeignKey(Subscriber, on_delete=models.CASCADE, related_name='segment_memberships')
+
+    class Meta:
+        unique_together = ['segment', 'subscriber']
+
+
 class Newsletter(models.Model):
     """Newsletter campaign to be sent to subscribers."""
     
     class Status(models.TextChoices):
         DRAFT = 'DRAFT', 'Draft'
+        SENDING = 'SENDING', 'Sending'
         SENT = 'SENT', 'Sent'
         FAILED = 'FAILED', 'Failed'
 
     newsletter_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     subject = models.CharField(max_length=255)
     content = models.TextField(help_text="Content of the newsletter. Supports rich text.")
+    # Compiled once when a send is planned (newsletter/rendering.py); per-recipient tags still in place
+    rendered_html = models.TextField(blank=True, editable=False)
+    rendered_text = models.TextField(blank=True, editable=False)
     
     status = models.CharField(
         max_length=10,
@@ -137,6 +206,14 @@ class Newsletter(models.Model):
         blank=True,
         help_text="Optional: Send only to subscribers of this category. Leave blank to send to all active subscribers."
     )
+    segment = models.ForeignKey(
+        Segment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='newsletters',
+        help_text="Optional: Send to this segment's audience instead (not combined with a target category)."
+    )
     
     # Timestamps
     created_date = models.DateTimeField(auto_now_add=True)
@@ -147,4 +224,66 @@ class Newsletter(models.Model):
         ordering = ['-created_date']
 
     def __str__(self):
-        return self.subject
\ No newline at end of file
+        return self.subject
+
+    def clean(self):
+        if self.segment_id and self.target_category_id:
+            raise ValidationError("Choose either a target category or a segment, not both.")
+
+class NewsletterSendChunk(models.Model):
+    """
+    One slice of a newsletter send: a group of delivery ledger rows sent by one Celery task over
+    one connection.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        SENDING = 'SENDING', 'Sending'
+        DONE = 'DONE', 'Done'
+
+    newsletter = models.ForeignKey(Newsletter, on_delete=models.CASCADE, related_name='send_chunks')
+    index = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    recipient_count = models.PositiveIntegerField(default=0, help_text="Eligible recipients when the send was planned.")
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['newsletter', 'index']
+        ordering = ['newsletter', 'index']
+
+    def __str__(self):
+        return f"{self.newsletter} #{self.index} ({self.status})"
+
+
+class NewsletterDelivery(models.Model):
+    """
+    Delivery ledger: one row per recipient of a newsletter send, written when the send is planned.
+    Only QUEUED rows are (re)sent, so a resumed send never mails anyone twice.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        SENT = 'SENT', 'Sent'
+        FAILED = 'FAILED', 'Failed'
+        SKIPPED = 'SKIPPED', 'Skipped'
+
+    newsletter = models.ForeignKey(Newsletter, on_delete=models.CASCADE, related_name='deliveries')
+    chunk = models.ForeignKey(NewsletterSendChunk, on_delete=models.CASCADE, related_name='deliveries')
+    subscriber = models.ForeignKey(Subscriber, on_delete=models.CASCADE, related_name='newsletter_deliveries')
+    email = models.EmailField(help_text="Address at the time the send was planned.")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['newsletter', 'subscriber']
+        indexes = [
+            models.Index(fields=['chunk', 'status'], name='delivery_chunk_status_idx'),
+            models.Index(fields=['newsletter', 'status'], name='delivery_newsletter_status_idx'),
+        ]
+        verbose_name_plural = "Newsletter deliveries"
+
+    def __str__(self):
+        return f"{self.newsletter} -> {self.email} ({self.status})"
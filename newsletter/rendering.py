@@ -0,0 +1,180 @@
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+import bleach
+import cssselect2
+import html5lib
+import tinycss2
+from bleach.css_sanitizer import ALLOWED_CSS_PROPERTIES, CSSSanitizer
+from django.template.loader import render_to_string
+
+from analytics.tracking import open_pixel_url, track_links, tracking_enabled
+
+# Newsletter rendering
+# A campaign is compiled once per send (plan_send stores the result on the newsletter): the summernote
+# HTML is sanitized, wrapped in the emails/newsletter.html layout and its stylesheet inlined into style
+# attributes (mail clients drop <style> blocks), and a real plain-text alternative is generated from it.
+# Recipient-specific values are left as tags (UNSUBSCRIBE_URL_TAG) - the only per-recipient work is
+# replacing them, which SendGrid does server-side for personalization batches. With tracking enabled
+# the HTML links go through the click redirect and an open pixel is added, both carrying
+# TRACKING_TOKEN_TAG (analytics/tracking.py); the plain-text part keeps the original links.
+
+UNSUBSCRIBE_URL_TAG = '-unsubscribe_url-'
+TRACKING_TOKEN_TAG = '-tracking_token-'
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'center', 'code', 'div', 'em', 'font', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'small', 'span', 'strike', 'strong',
+    'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    '*': ['style', 'class', 'align', 'dir', 'title'],
+    'a': ['href', 'target', 'rel'],
+    'img': ['src', 'alt', 'width', 'height'],
+    'font': ['color', 'face', 'size'],
+    'table': ['width', 'border', 'cellpadding', 'cellspacing', 'bgcolor'],
+    'td': ['width', 'colspan', 'rowspan', 'valign', 'bgcolor'],
+    'th': ['width', 'colspan', 'rowspan', 'valign', 'bgcolor'],
+}
+# Removed along with their contents (bleach would keep the text of a stripped <script>)
+STRIPPED_ELEMENTS = re.compile(r'<(script|style|iframe|object|template)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+ALLOWED_PROTOCOLS = {'http', 'https', 'mailto'}
+CSS_SANITIZER = CSSSanitizer(
+    allowed_css_properties=ALLOWED_CSS_PROPERTIES | {
+        'margin', 'margin-top', 'margin-bottom', 'margin-left', 'margin-right', 'padding', 'padding-top',
+        'padding-bottom', 'padding-left', 'padding-right', 'border', 'border-radius', 'text-decoration',
+        'line-height', 'max-width', 'font-family', 'font-size', 'font-style', 'text-transform',
+    }
+)
+
+
+@dataclass(frozen=True)
+class RenderedNewsletter:
+    html: str
+    text: str
+
+
+def sanitize_html(content):
+    """Editor HTML reduced to tags, attributes, URL schemes and CSS properties that are safe in mail"""
+    return bleach.clean(
+        STRIPPED_ELEMENTS.sub('', content),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        protocols=ALLOWED_PROTOCOLS,
+        css_sanitizer=CSS_SANITIZER,
+        strip=True,
+        strip_comments=True,
+    )
+
+
+def _declarations(css):
+    return [
+        (declaration.lower_name, tinycss2.serialize(declaration.value).strip())
+        for declaration in tinycss2.parse_blocks_contents(css, skip_whitespace=True, skip_comments=True)
+        if declaration.type == 'declaration'
+    ]
+
+
+def inline_css(document):
+    """
+    Move the document's <style> rules into style attributes (existing inline styles win).
+    At-rules such as @media cannot be inlined and stay in a <style> block.
+    """
+    root = html5lib.parse(document, namespaceHTMLElements=False)
+    matcher = cssselect2.Matcher()
+    kept = []
+    for style in root.iter('style'):
+        for rule in tinycss2.parse_stylesheet(style.text or '', skip_whitespace=True, skip_comments=True):
+            if rule.type == 'at-rule':
+                kept.append(rule.serialize())
+            elif rule.type == 'qualified-rule':
+                declarations = _declarations(rule.content)
+                for selector in cssselect2.compile_selector_list(rule.prelude):
+                    matcher.add_selector(selector, declarations)
+    for parent in list(root.iter()):
+        for child in list(parent):
+            if child.tag == 'style':
+                parent.remove(child)
+
+    for element in cssselect2.ElementWrapper.from_html_root(root).iter_subtree():
+        matches = sorted(match for match in matcher.match(element) if match[2] is None)
+        if not matches:
+            continue
+        properties = {}
+        for _, _, _, declarations in matches:
+            properties.update(declarations)
+        properties.update(_declarations(element.etree_element.get('style', '')))
+        element.etree_element.set('style', '; '.join(f"{name}: {value}" for name, value in properties.items()))
+
+    if kept:
+        head = root.find('head')
+        style = head.makeelement('style', {})
+        style.text = '\n'.join(kept)
+        head.append(style)
+    return '<!DOCTYPE html>\n' + html5lib.serialize(
+        root, tree='etree', omit_optional_tags=False, quote_attr_values='always',
+    )
+
+
+class _TextExtractor(HTMLParser):
+    BLOCKS = {
+        'blockquote', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'ol', 'p', 'pre', 'table', 'tr', 'ul',
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'br':
+            self.parts.append('\n')
+        elif tag == 'li':
+            self.parts.append('\n- ')
+        elif tag in ('td', 'th'):
+            self.parts.append(' ')
+        elif tag in self.BLOCKS:
+            self.parts.append('\n\n')
+        if tag == 'a':
+            self.links.append((dict(attrs).get('href'), len(self.parts)))
+
+    def handle_endtag(self, tag):
+        if tag in self.BLOCKS:
+            self.parts.append('\n\n')
+        elif tag == 'a' and self.links:
+            href, start = self.links.pop()
+            label = ''.join(self.parts[start:]).strip()
+            if href and href != label and not href.startswith('mailto:'):
+                self.parts.append(f" ({href})")
+
+    def handle_data(self, data):
+        self.parts.append(re.sub(r'\s+', ' ', data))
+
+    def text(self):
+        lines = [line.strip() for line in ''.join(self.parts).split('\n')]
+        return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def html_to_text(content):
+    """Plain-text alternative of sanitized HTML: paragraphs, list items and link targets kept"""
+    parser = _TextExtractor()
+    parser.feed(content)
+    parser.close()
+    return parser.text()
+
+
+def tracking_campaign(newsletter):
+    return f"newsletter:{newsletter.pk}"
+
+
+def render_newsletter(newsletter):
+    content = sanitize_html(newsletter.content)
+    context = {'subject': newsletter.subject, 'unsubscribe_url': UNSUBSCRIBE_URL_TAG}
+    html_context = {**context, 'content': content}
+    if tracking_enabled():
+        html_context.update(content=track_links(content, TRACKING_TOKEN_TAG), open_pixel_url=open_pixel_url(TRACKING_TOKEN_TAG))
+    return RenderedNewsletter(
+        html=inline_css(render_to_string('emails/newsletter.html', html_context)),
+        text=render_to_string('emails/newsletter.txt', {**context, 'content': html_to_text(content)}).strip() + '\n',
+    )
@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Segment, SegmentMember, Subscriber, Subscription
+
+# Segment engine
+# segment_subscribers() turns a Segment definition into one query: the qualifying subscriptions
+# (active, optionally filtered by source and subscription date) give a union subquery for
+# any_categories and a GROUP BY ... HAVING COUNT(DISTINCT category) subquery for all_categories.
+# materialize_segment() stores the result as SegmentMember rows, applying only the difference to the
+# previous audience. Sends then read the members through the (segment, subscriber) unique index, and
+# the admin shows the stored audience_size. Segments are refreshed by refresh_segments_task (every
+# 15 minutes, see core/celery.py), when edited, and whenever a send is planned. In between,
+# unsubscribing drops the subscriber's memberships right away (prune_memberships), so chunks sent
+# later skip them without re-running the definition.
+
+
+def qualifying_subscriptions(segment):
+    subscriptions = Subscription.objects.filter(is_active=True)
+    if segment.sources:
+        subscriptions = subscriptions.filter(source__in=segment.sources)
+    if segment.subscribed_after:
+        subscriptions = subscriptions.filter(subscribed_at__gte=segment.subscribed_after)
+    if segment.subscribed_before:
+        subscriptions = subscriptions.filter(subscribed_at__lt=segment.subscribed_before)
+    return subscriptions
+
+
+def segment_subscribers(segment):
+    """Active subscribers matching the segment definition (evaluated live)"""
+    subscriptions = qualifying_subscriptions(segment)
+    any_ids = list(segment.any_categories.values_list('pk', flat=True))
+    all_ids = list(segment.all_categories.values_list('pk', flat=True))
+
+    subscribers = Subscriber.objects.filter(is_active=True)
+    if any_ids or not all_ids:
+        union = subscriptions.filter(category_id__in=any_ids) if any_ids else subscriptions
+        subscribers = subscribers.filter(subscriber_id__in=union.values('subscriber_id'))
+    if all_ids:
+        intersection = (
+            subscriptions.filter(category_id__in=all_ids)
+            .values('subscriber_id')
+            .annotate(categories=Count('category_id', distinct=True))
+            .filter(categories=len(all_ids))
+            .values('subscriber_id')
+        )
+        subscribers = subscribers.filter(subscriber_id__in=intersection)
+    return subscribers
+
+
+def materialize_segment(segment, batch_size=1000):
+    """Store the segment's current audience; returns (added, removed)"""
+    with transaction.atomic():
+        segment = Segment.objects.select_for_update().get(pk=segment.pk)
+        current = set(segment_subscribers(segment).values_list('subscriber_id', flat=True))
+        stored = set(segment.members.values_list('subscriber_id', flat=True))
+        removed = list(stored - current)
+        for start in range(0, len(removed), batch_size):
+            segment.members.filter(subscriber_id__in=removed[start:start + batch_size]).delete()
+        SegmentMember.objects.bulk_create(
+            (SegmentMember(segment=segment, subscriber_id=subscriber_id) for subscriber_id in current - stored),
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        Segment.objects.filter(pk=segment.pk).update(audience_size=len(current), materialized_at=timezone.now())
+    return len(current - stored), len(removed)
+
+
+def segment_audience(segment):
+    """Active subscribers of the segment's materialized audience (an indexed join, no re-evaluation)"""
+    return Subscriber.objects.filter(is_active=True, segment_memberships__segment=segment)
+
+
+def prune_memberships(subscriber):
+    """Drop a subscriber who unsubscribed from the stored audiences they no longer qualify for"""
+    with transaction.atomic():
+        for segment in Segment.objects.filter(members__subscriber=subscriber):
+            if subscriber.is_active and segment_subscribers(segment).filter(pk=subscriber.pk).exists():
+                continue
+            segment.members.filter(subscriber=subscriber).delete()
+            Segment.objects.filter(pk=segment.pk, audience_size__gt=0).update(audience_size=F('audience_size') - 1)
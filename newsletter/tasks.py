@@ -1,17 +1,20 @@
-from celery import shared_task
-from django.utils import timezone
+from celery import group, shared_task
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from .models import Newsletter, Subscriber
+from .delivery import delivery_progress, finish_if_complete, plan_send, send_chunk
+from .models import Newsletter, NewsletterSendChunk, Segment, Subscriber
+from .segments import materialize_segment
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Send newsletter to subscribers
-@shared_task
-def send_newsletter_task(newsletter_id):
+# Send newsletter to subscribers: write the delivery ledger and fan its chunks out as a Celery group
+# (see newsletter/delivery.py). Running it again for a SENDING newsletter resumes the unfinished chunks.
+@shared_task(bind=True)
+def send_newsletter_task(self, newsletter_id):
     """
     Celery task to send a newsletter to all eligible subscribers.
+    Called directly (shell, tests) the chunks are sent in-process and the ledger's sent count is returned;
+    as a task it returns the number of recipients handed to the chunk tasks.
     """
     try:
         newsletter = Newsletter.objects.get(newsletter_id=newsletter_id)
@@ -19,53 +22,35 @@ def send_newsletter_task(newsletter_id):
         logger.error(f"Newsletter {newsletter_id} not found.")
         return
 
-    # Update status to indicate processing (optional, or just keep as DRAFT until done)
-    # For now, we'll update to SENT at the end.
-
-    # Filter subscribers
-    subscribers = Subscriber.objects.filter(is_active=True)
-    if newsletter.target_category:
-        # Filter by category subscription
-        subscribers = subscribers.filter(
-            subscriptions__category=newsletter.target_category,
-            subscriptions__is_active=True
-        )
+    chunks = plan_send(newsletter)
+    pending = [chunk for chunk in chunks if chunk.status != NewsletterSendChunk.Status.DONE]
+    if not pending:
+        finish_if_complete(newsletter)
+        return delivery_progress(newsletter)['sent']
 
-    sent_count = 0
-    base_url = getattr(settings, 'PUBLIC_BASE_URL', 'http://localhost:8000')
+    fan_out = group(send_newsletter_chunk_task.s(chunk.pk) for chunk in pending)
+    if self.request.called_directly:
+        fan_out.apply()
+        sent_count = delivery_progress(newsletter)['sent']
+        logger.info(f"Newsletter {newsletter.subject} sent to {sent_count} subscribers.")
+        return sent_count
 
-    for subscriber in subscribers:
-        try:
-            # Generate unsubscribe link
-            unsubscribe_url = f"{base_url}/newsletter/unsubscribe/{subscriber.unsubscribe_token}/"
-            
-            # Append unsubscribe link to content
-            # Simple append for now. In a real app, you might want a proper HTML template.
-            html_content = newsletter.content + f'<br><br><hr><p><small><a href="{unsubscribe_url}">Unsubscribe</a></small></p>'
-            
-            # Create email
-            msg = EmailMultiAlternatives(
-                subject=newsletter.subject,
-                body=html_content, # Text content fallback could be stripped HTML
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[subscriber.email]
-            )
-            msg.attach_alternative(html_content, "text/html")
-            
-            # Send
-            msg.send()
-            sent_count += 1
-            
-        except Exception as e:
-            logger.error(f"Failed to send newsletter {newsletter.subject} to {subscriber.email}: {str(e)}")
+    fan_out.apply_async()
+    recipients = sum(chunk.recipient_count for chunk in pending)
+    logger.info(f"Newsletter {newsletter.subject}: {len(pending)} chunk(s) queued for {recipients} subscribers.")
+    return recipients
 
-    # Update newsletter status
-    newsletter.status = Newsletter.Status.SENT
-    newsletter.sent_at = timezone.now()
-    newsletter.save()
 
-    logger.info(f"Newsletter {newsletter.subject} sent to {sent_count} subscribers.")
-    return sent_count
+# One chunk over one mail connection. SMTP and requests errors are OSErrors: the retry takes the
+# chunk over again (it is still SENDING) and only sends rows still QUEUED.
+@shared_task(
+    bind=True,
+    autoretry_for=(OSError,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 5},
+)
+def send_newsletter_chunk_task(self, chunk_id):
+    return send_chunk(chunk_id, resume=self.request.retries > 0)
 
 # Send confirmation email to new subscribers
 @shared_task
@@ -92,4 +77,23 @@ def send_subscription_confirmation_email(subscriber_id):
             'categories': list(categories),
             'unsubscribe_url': f"{settings.PUBLIC_BASE_URL}/api/v1/newsletter/unsubscribe/?email={subscriber.email}&token={subscriber.unsubscribe_token}"
         }
-    )
\ No newline at end of file
+    )
+
+
+# Materialized segment audiences (newsletter/segments.py): one segment after an edit, all of them on a schedule
+@shared_task
+def materialize_segment_task(segment_id):
+    try:
+        segment = Segment.objects.get(segment_id=segment_id)
+    except Segment.DoesNotExist:
+        logger.error(f"Segment {segment_id} not found.")
+        return
+    added, removed = materialize_segment(segment)
+    logger.info(f"Segment {segment.name}: +{added} -{removed} subscribers.")
+    return added, removed
+
+
+@shared_task
+def refresh_segments_task():
+    for segment in Segment.objects.iterator():
+        materialize_segment(segment)
@@ -1,7 +1,27 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import EmailMultiAlternatives
+from django.urls import reverse
 from django.utils import timezone
-from .models import Newsletter, NewsletterCategory, Subscriber, Subscription
+from rest_framework.test import APITestCase
+from core.email_backends import (
+    HybridEmailBackend, SendGridBackend, reset_sendgrid_client, sendgrid_breaker, sendgrid_metrics,
+)
+from core.email_service import EmailService
+
+from .models import Newsletter, NewsletterCategory, NewsletterDelivery, Segment, Subscriber, Subscription
+from .delivery import delivery_progress
 from .tasks import send_newsletter_task
 import uuid
 
@@ -69,3 +89,646 @@ class NewsletterTests(TestCase):
         
         self.assertEqual(count, 2) # Only sub1 and sub2 (in Weekly Updates)
         # sub4 is in Promos, sub3 is inactive
+
+
+@override_settings(NEWSLETTER_CHUNK_SIZE=2, NEWSLETTER_BATCH_SIZE=1)
+class NewsletterFanOutTests(TestCase):
+    def setUp(self):
+        self.subscribers = [Subscriber.objects.create(email=f"fan{i}@example.com") for i in range(5)]
+        self.newsletter = Newsletter.objects.create(subject="Fan-out", content="<p>Hi</p>")
+
+    def test_chunks_share_one_connection_each(self):
+        from django.core.mail import get_connection
+        from .models import NewsletterSendChunk
+
+        connections = []
+
+        def tracked_connection(*args, **kwargs):
+            connection = get_connection(*args, **kwargs)
+            connections.append(connection)
+            return connection
+
+        with mock.patch('newsletter.delivery.get_connection', side_effect=tracked_connection):
+            count = send_newsletter_task(self.newsletter.newsletter_id)
+
+        self.assertEqual(count, 5)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(s.email for s in self.subscribers))
+        self.assertEqual(len(connections), 3)  # 5 recipients in chunks of 2
+        chunks = list(self.newsletter.send_chunks.all())
+        self.assertEqual([c.recipient_count for c in chunks], [2, 2, 1])
+        self.assertTrue(all(c.status == NewsletterSendChunk.Status.DONE for c in chunks))
+        self.assertEqual(
+            delivery_progress(self.newsletter),
+            {'total': 5, 'queued': 0, 'sent': 5, 'failed': 0, 'skipped': 0},
+        )
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.status, Newsletter.Status.SENT)
+
+    def test_resume_sends_only_queued_rows(self):
+        from .delivery import plan_send
+        from .models import NewsletterSendChunk
+
+        chunks = plan_send(self.newsletter)
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.status, Newsletter.Status.SENDING)
+        self.assertEqual(self.newsletter.deliveries.count(), 5)
+        # First chunk finished, second one crashed after its first recipient
+        deliveries = list(self.newsletter.deliveries.order_by('pk'))
+        NewsletterDelivery.objects.filter(pk__in=[d.pk for d in deliveries[:3]]).update(status=NewsletterDelivery.Status.SENT)
+        NewsletterSendChunk.objects.filter(pk=chunks[0].pk).update(status=NewsletterSendChunk.Status.DONE)
+        NewsletterSendChunk.objects.filter(pk=chunks[1].pk).update(
+            status=NewsletterSendChunk.Status.SENDING, started_at=timezone.now() - timezone.timedelta(hours=2),
+        )
+        # ...and one of the remaining subscribers has left since
+        Subscriber.objects.filter(pk=deliveries[4].subscriber_id).update(is_active=False)
+
+        count = send_newsletter_task(self.newsletter.newsletter_id)
+
+        self.assertEqual(count, 4)
+        self.assertEqual([m.to for m in mail.outbox], [[deliveries[3].email]])
+        self.assertEqual(self.newsletter.send_chunks.count(), 3)  # the plan is reused, not rebuilt
+        self.assertEqual(
+            delivery_progress(self.newsletter),
+            {'total': 5, 'queued': 0, 'sent': 4, 'failed': 0, 'skipped': 1},
+        )
+
+    def test_failed_rows_are_recorded_and_retried(self):
+        from .delivery import retry_failed
+
+        rejected = self.subscribers[1].email
+
+        def send_messages(messages):
+            return sum(1 for message in messages if message.to != [rejected])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            self.assertEqual(send_newsletter_task(self.newsletter.newsletter_id), 4)
+        self.assertEqual(self.newsletter.deliveries.get(status='FAILED').email, rejected)
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.status, Newsletter.Status.SENT)
+
+        self.assertEqual(retry_failed(self.newsletter), 1)
+        self.assertEqual(send_newsletter_task(self.newsletter.newsletter_id), 5)
+        self.assertEqual([m.to for m in mail.outbox], [[rejected]])
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.status, Newsletter.Status.SENT)
+
+    def test_outage_mid_chunk_is_retried(self):
+        import smtplib
+        from .delivery import plan_send, send_chunk
+        from .models import NewsletterSendChunk
+
+        chunk = plan_send(self.newsletter)[0]
+        first, second = chunk.deliveries.order_by('pk')
+
+        def send_messages(messages):
+            if messages[0].to == [second.email]:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            with self.assertRaises(smtplib.SMTPServerDisconnected):
+                send_chunk(chunk.pk)
+        chunk.refresh_from_db()
+        self.assertEqual(chunk.status, NewsletterSendChunk.Status.SENDING)
+        self.assertEqual(
+            dict(chunk.deliveries.values_list('email', 'status')),
+            {first.email: NewsletterDelivery.Status.SENT, second.email: NewsletterDelivery.Status.QUEUED},
+        )
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.status, Newsletter.Status.SENDING)
+
+        # A duplicate task leaves the claimed chunk alone; the task's own retry resumes it
+        self.assertEqual(send_chunk(chunk.pk), 0)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(send_chunk(chunk.pk, resume=True), 1)
+        self.assertEqual([m.to for m in mail.outbox], [[second.email]])
+        chunk.refresh_from_db()
+        self.assertEqual(chunk.status, NewsletterSendChunk.Status.DONE)
+
+    def test_no_recipients(self):
+        Subscriber.objects.update(is_active=False)
+        self.assertEqual(send_newsletter_task(self.newsletter.newsletter_id), 0)
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.status, Newsletter.Status.SENT)
+
+
+class StubSendGridServer:
+    """Local /v3/mail/send stand-in recording each request body and client port; answers `status` after `delay`"""
+
+    def __init__(self, status=202, delay=0.0):
+        self.status = status
+        self.delay = delay
+        self.requests = []
+        self.client_ports = []
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    stub.requests.append((self.path, json.loads(self.rfile.read(int(self.headers['Content-Length'])))))
+                    stub.client_ports.append(self.client_address[1])
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                self.send_response(stub.status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def transactional_messages(count):
+    return [EmailMultiAlternatives(f"Receipt {i}", "Thanks", to=[f"buyer{i}@example.com"]) for i in range(count)]
+
+
+class SendGridPersonalizationTests(TestCase):
+    def setUp(self):
+        self.stub = StubSendGridServer()
+        self.addCleanup(self.stub.close)
+        self.settings_override = override_settings(
+            SENDGRID_API_KEY='test-key', SENDGRID_API_HOST=self.stub.url, SENDGRID_FROM_EMAIL='news@example.com',
+            EMAIL_BACKEND='core.email_backends.SendGridBackend',
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        reset_sendgrid_client()
+        self.addCleanup(reset_sendgrid_client)
+        sendgrid_metrics.reset()
+
+    def test_recipients_packed_into_personalization_batches(self):
+        emails = [f"reader{i}@example.com" for i in range(2500)]
+        sent = EmailService.send_newsletter(
+            subject="Bulk",
+            message=None,
+            recipient_list=emails,
+            html_message='<p>Hi</p><a href="-unsubscribe_url-">Unsubscribe</a>',
+            substitutions={email: {'-unsubscribe_url-': f"https://example.com/u/{email}"} for email in emails},
+        )
+
+        self.assertEqual(sent, emails)
+        self.assertEqual([path for path, _ in self.stub.requests], ['/v3/mail/send'] * 3)
+        bodies = [body for _, body in self.stub.requests]
+        self.assertEqual([len(body['personalizations']) for body in bodies], [1000, 1000, 500])
+        first = bodies[0]['personalizations'][0]
+        self.assertEqual(first['to'], [{'email': 'reader0@example.com'}])
+        self.assertEqual(first['substitutions'], {'-unsubscribe_url-': 'https://example.com/u/reader0@example.com'})
+        self.assertEqual(bodies[2]['personalizations'][-1]['to'], [{'email': 'reader2499@example.com'}])
+        self.assertIn('-unsubscribe_url-', bodies[0]['content'][0]['value'])  # substituted by SendGrid, per recipient
+
+    def test_rejected_batch_counts_as_unsent(self):
+        self.stub.status = 500
+        sent = EmailService.send_newsletter(
+            "Bulk", None, ["a@example.com", "b@example.com"], html_message="<p>Hi</p>",
+            connection=SendGridBackend(fail_silently=True),
+        )
+        self.assertEqual(sent, [])
+        self.assertEqual(len(self.stub.requests), 1)
+
+    @override_settings(NEWSLETTER_BATCH_SIZE=1)
+    def test_newsletter_chunk_sent_in_one_call(self):
+        subscribers = [Subscriber.objects.create(email=f"fan{i}@example.com") for i in range(3)]
+        newsletter = Newsletter.objects.create(subject="Fan-out", content="<p>Hi</p>")
+
+        self.assertEqual(send_newsletter_task(newsletter.newsletter_id), 3)
+
+        # NEWSLETTER_BATCH_SIZE only applies to backends without personalizations
+        self.assertEqual(len(self.stub.requests), 1)
+        personalizations = self.stub.requests[0][1]['personalizations']
+        self.assertEqual(
+            {p['to'][0]['email']: p['substitutions']['-unsubscribe_url-'] for p in personalizations},
+            {s.email: f"{settings.PUBLIC_BASE_URL}/newsletter/unsubscribe/{s.unsubscribe_token}/" for s in subscribers},
+        )
+
+    @override_settings(SENDGRID_MAX_CONCURRENCY=1)
+    def test_sends_reuse_one_keep_alive_connection(self):
+        backend = SendGridBackend()
+        self.assertEqual(backend.send_messages(transactional_messages(3)), 3)
+        self.assertEqual(SendGridBackend().send_messages(transactional_messages(2)), 2)
+
+        self.assertEqual(len(self.stub.client_ports), 5)
+        self.assertEqual(len(set(self.stub.client_ports)), 1)
+        self.assertEqual(self.stub.requests[0][1]['personalizations'][0]['to'], [{'email': 'buyer0@example.com'}])
+        metrics = sendgrid_metrics.snapshot()
+        self.assertEqual((metrics['count'], metrics['failures']), (5, 0))
+        self.assertGreater(metrics['max_ms'], 0)
+
+    @override_settings(SENDGRID_MAX_CONCURRENCY=2)
+    def test_parallel_sends_capped_by_concurrency_limit(self):
+        self.stub.delay = 0.05
+        self.assertEqual(SendGridBackend().send_messages(transactional_messages(6)), 6)
+        self.assertEqual(self.stub.max_in_flight, 2)
+        self.assertLessEqual(len(set(self.stub.client_ports)), 2)
+
+
+@override_settings(SENDGRID_BREAKER_FAILURE_THRESHOLD=2, SENDGRID_BREAKER_RECOVERY_TIMEOUT=30)
+class HybridCircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.stub = StubSendGridServer(status=503)
+        self.addCleanup(self.stub.close)
+        self.settings_override = override_settings(SENDGRID_API_KEY='test-key', SENDGRID_API_HOST=self.stub.url)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        reset_sendgrid_client()
+        self.addCleanup(reset_sendgrid_client)
+        cache.clear()
+        smtp = mock.patch('django.core.mail.backends.smtp.EmailBackend.send_messages', side_effect=len)
+        self.smtp_send = smtp.start()
+        self.addCleanup(smtp.stop)
+
+    def test_open_breaker_routes_straight_to_smtp(self):
+        self.assertEqual(HybridEmailBackend().send_messages(transactional_messages(5)), 5)
+
+        # Two failures open the breaker; the other three never wait on SendGrid
+        self.assertEqual(len(self.stub.requests), 2)
+        self.assertEqual(self.smtp_send.call_count, 5)
+        self.assertEqual(sendgrid_breaker().state, 'open')
+        self.assertEqual(EmailService.get_backend_info()['sendgrid_circuit']['state'], 'open')
+
+    def test_partly_failed_smtp_fallback_is_recorded_per_recipient(self):
+        subscribers = [Subscriber.objects.create(email=f"fan{i}@example.com") for i in range(3)]
+        newsletter = Newsletter.objects.create(subject="Fallback", content="<p>Hi</p>")
+        self.smtp_send.side_effect = lambda messages: 0 if messages[0].to == [subscribers[1].email] else len(messages)
+
+        with self.settings(EMAIL_BACKEND='core.email_backends.HybridEmailBackend'):
+            self.assertEqual(send_newsletter_task(newsletter.newsletter_id), 2)
+
+        self.assertEqual(len(self.stub.requests), 1)  # the whole batch was rejected by SendGrid
+        self.assertEqual(
+            dict(newsletter.deliveries.values_list('email', 'status')),
+            {
+                subscribers[0].email: NewsletterDelivery.Status.SENT,
+                subscribers[1].email: NewsletterDelivery.Status.FAILED,
+                subscribers[2].email: NewsletterDelivery.Status.SENT,
+            },
+        )
+
+    def test_half_open_probe(self):
+        HybridEmailBackend().send_messages(transactional_messages(2))
+        self.stub.status = 202
+        later = time.time() + 31
+        with mock.patch('core.circuitbreaker.time.time', return_value=later):
+            breaker = sendgrid_breaker()
+            self.assertEqual(breaker.state, 'half_open')
+            self.assertTrue(breaker.allow_request())
+            self.assertFalse(breaker.allow_request())  # one probe at a time
+            breaker.record_success()
+            self.assertEqual(breaker.state, 'closed')
+
+        self.assertEqual(HybridEmailBackend().send_messages(transactional_messages(2)), 2)
+        self.assertEqual(len(self.stub.requests), 4)
+        self.assertEqual(self.smtp_send.call_count, 2)
+
+    def test_failed_probe_reopens(self):
+        breaker = sendgrid_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        with mock.patch('core.circuitbreaker.time.time', return_value=time.time() + 31):
+            self.assertTrue(breaker.allow_request())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, 'open')
+
+    def test_rejected_message_does_not_trip_breaker(self):
+        self.stub.status = 400
+        self.assertEqual(HybridEmailBackend().send_messages(transactional_messages(3)), 3)
+        self.assertEqual(len(self.stub.requests), 3)
+        self.assertEqual(sendgrid_breaker().state, 'closed')
+
+
+class NewsletterRenderingTests(TestCase):
+    @override_settings(EMAIL_TRACKING_ENABLED=False)  # tracked links are covered in analytics.tests
+    def test_render_sanitizes_inlines_and_builds_text(self):
+        from .rendering import render_newsletter
+
+        newsletter = Newsletter(
+            subject="Release day",
+            content=(
+                '<p style="color: red; position: fixed" onclick="steal()">New <b>album</b> out: '
+                '<a href="https://radicle.example/albums/1">listen</a></p><script>alert(1)</script>'
+                '<ul><li>Side A</li><li>Side B</li></ul><a href="javascript:alert(1)">bad</a>'
+            ),
+        )
+        rendered = render_newsletter(newsletter)
+
+        self.assertNotIn('script', rendered.html)
+        self.assertNotIn('alert', rendered.html)
+        self.assertNotIn('onclick', rendered.html)
+        self.assertNotIn('position', rendered.html)
+        self.assertNotIn('<style', rendered.html)  # inlined
+        self.assertIn('<p style="color: red;">', rendered.html)
+        self.assertIn('<a href="https://radicle.example/albums/1" style="color: #1a73e8">listen</a>', rendered.html)
+        self.assertIn('href="-unsubscribe_url-"', rendered.html)
+        self.assertEqual(
+            rendered.text,
+            "New album out: listen (https://radicle.example/albums/1)\n\n- Side A\n- Side B\n\nbad\n\n"
+            "Don't want these emails? Unsubscribe here: -unsubscribe_url-\n",
+        )
+
+    @override_settings(NEWSLETTER_CHUNK_SIZE=2)
+    def test_rendered_once_per_send(self):
+        from . import delivery
+
+        subscribers = [Subscriber.objects.create(email=f"fan{i}@example.com") for i in range(5)]
+        newsletter = Newsletter.objects.create(subject="Once", content="<p>Hello <i>fans</i></p>")
+
+        with mock.patch('newsletter.delivery.render_newsletter', wraps=delivery.render_newsletter) as render:
+            self.assertEqual(send_newsletter_task(newsletter.newsletter_id), 5)
+        self.assertEqual(render.call_count, 1)
+
+        message = next(m for m in mail.outbox if m.to == [subscribers[0].email])
+        unsubscribe_url = f"{settings.PUBLIC_BASE_URL}/newsletter/unsubscribe/{subscribers[0].unsubscribe_token}/"
+        self.assertTrue(message.body.startswith("Hello fans\n"))
+        self.assertIn(unsubscribe_url, message.body)
+        html, mimetype = message.alternatives[0]
+        self.assertEqual(mimetype, 'text/html')
+        self.assertIn(f'href="{unsubscribe_url}"', html)
+        self.assertNotIn('-unsubscribe_url-', html)
+
+
+class NewsletterAdminProgressTests(TestCase):
+    def test_changelist_shows_ledger_progress(self):
+        from django.contrib.auth import get_user_model
+
+        for i in range(3):
+            Subscriber.objects.create(email=f"fan{i}@example.com")
+        newsletter = Newsletter.objects.create(subject="Progress", content="<p>Hi</p>")
+        send_newsletter_task(newsletter.newsletter_id)
+        Newsletter.objects.create(subject="Draft", content="<p>Later</p>")
+
+        admin_user = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass',
+        )
+        self.client.force_login(admin_user)
+        response = self.client.get('/admin/newsletter/newsletter/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "3/3 sent, 0 queued, 0 failed, 0 skipped")
+
+
+@override_settings(NEWSLETTER_IMPORT_BATCH_SIZE=2)
+class SubscriberBulkTests(APITestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        self.weekly = NewsletterCategory.objects.create(name="Weekly", slug="weekly", is_default=True)
+        self.promos = NewsletterCategory.objects.create(name="Promos", slug="promos")
+        self.existing = Subscriber.objects.create(email="old@example.com", is_active=False)
+        Subscription.objects.create(subscriber=self.existing, category=self.weekly, is_active=False)
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass',
+        )
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, name, content):
+        return self.client.post(
+            reverse('newsletter-subscriber-import'),
+            {'file': SimpleUploadedFile(name, content.encode('utf-8'))},
+            format='multipart',
+        )
+
+    def test_csv_import(self):
+        response = self.upload('list.csv', (
+            "email,categories\n"
+            "New1@Example.com,promos\n"
+            " new2@example.com ,\n"
+            "not-an-email,weekly\n"
+            "new1@example.com,weekly\n"  # duplicate in a later batch: categories are merged
+            "old@example.com,promos\n"
+            "new3@example.com,jazz\n"
+        ))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: value for key, value in response.data.items() if key != 'errors'},
+            {'rows': 6, 'created': 2, 'existing': 1, 'duplicates': 1, 'subscriptions_created': 4, 'error_count': 2},
+        )
+        self.assertEqual(response.data['errors'], [
+            {'row': 4, 'email': 'not-an-email', 'error': 'Invalid email address'},
+            {'row': 7, 'email': 'new3@example.com', 'error': 'Unknown categories: jazz'},
+        ])
+        subscriptions = set(Subscription.objects.filter(is_active=True).values_list('subscriber__email', 'category__slug'))
+        self.assertEqual(subscriptions, {
+            ('new1@example.com', 'promos'), ('new1@example.com', 'weekly'), ('new2@example.com', 'weekly'),
+            ('old@example.com', 'promos'),
+        })
+        # An imported list never resubscribes someone who unsubscribed
+        self.existing.refresh_from_db()
+        self.assertFalse(self.existing.is_active)
+        self.assertFalse(Subscription.objects.get(subscriber=self.existing, category=self.weekly).is_active)
+
+    def test_jsonl_import(self):
+        response = self.upload('list.jsonl', (
+            '{"email": "a@example.com", "categories": ["weekly", "promos"]}\n'
+            '\n'
+            '{"email": "b@example.com"\n'
+            '{"email": "c@example.com"}\n'
+        ))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['subscriptions_created']), (2, 3))
+        self.assertEqual([error['row'] for error in response.data['errors']], [3])
+
+    def test_import_rejects_other_files_and_non_staff(self):
+        self.assertEqual(self.upload('list.xlsx', 'x').status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.upload('list.csv', 'email\na@example.com\n').status_code, (401, 403))
+        self.assertFalse(Subscriber.objects.filter(email='a@example.com').exists())
+
+    def test_export_streams_subscribers(self):
+        active = Subscriber.objects.create(email="fan@example.com")
+        Subscription.objects.create(subscriber=active, category=self.promos)
+        Subscription.objects.create(subscriber=active, category=self.weekly)
+
+        response = self.client.get(reverse('newsletter-subscriber-export'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['email'], row['is_active'], row['categories']) for row in rows], [
+            ('old@example.com', 'False', ''), ('fan@example.com', 'True', 'promos,weekly'),
+        ])
+
+        response = self.client.get(reverse('newsletter-subscriber-export'), {'output': 'jsonl', 'active': 'true', 'category': 'promos'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(r['email'], r['categories']) for r in records], [('fan@example.com', ['promos', 'weekly'])])
+
+
+class SubscribeViewTests(APITestCase):
+    def setUp(self):
+        self.weekly = NewsletterCategory.objects.create(name="Weekly", slug="weekly", is_default=True)
+        self.promos = NewsletterCategory.objects.create(name="Promos", slug="promos")
+        self.url = reverse('newsletter-subscribe')
+
+    def test_new_subscriber_confirmation_queued_on_commit(self):
+        with mock.patch('newsletter.tasks.send_subscription_confirmation_email.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                response = self.client.post(self.url, {'email': 'New@Example.com', 'source': 'CHECKOUT'}, format='json')
+            delay.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['categories'], ['Weekly'])
+        subscriber = Subscriber.objects.get(email='new@example.com')
+        delay.assert_called_once_with(subscriber.subscriber_id)
+        self.assertEqual(
+            list(subscriber.subscriptions.values_list('category__slug', 'source', 'is_active')),
+            [('weekly', 'CHECKOUT', True)],
+        )
+
+    def test_returning_subscriber_reactivated(self):
+        subscriber = Subscriber.objects.create(email='back@example.com', is_active=False, unsubscribed_at=timezone.now())
+        Subscription.objects.create(subscriber=subscriber, category=self.weekly, is_active=False, unsubscribed_at=timezone.now())
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, {'email': 'back@example.com', 'categories': ['weekly', 'promos']}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['is_new'])
+        self.assertEqual(callbacks, [])
+        subscriber.refresh_from_db()
+        self.assertTrue(subscriber.is_active)
+        self.assertIsNone(subscriber.unsubscribed_at)
+        self.assertEqual(
+            set(subscriber.subscriptions.values_list('category__slug', 'is_active', 'unsubscribed_at')),
+            {('weekly', True, None), ('promos', True, None)},
+        )
+
+
+class SegmentTests(TestCase):
+    def setUp(self):
+        self.rock = NewsletterCategory.objects.create(name="Rock", slug="rock")
+        self.jazz = NewsletterCategory.objects.create(name="Jazz", slug="jazz")
+        self.promos = NewsletterCategory.objects.create(name="Promos", slug="promos")
+        self.subscribers = {}
+        # email: [(category, source, days ago)]
+        for email, subscriptions in {
+            'rock@example.com': [(self.rock, 'FOOTER', 40)],
+            'jazz@example.com': [(self.jazz, 'CHECKOUT', 5)],
+            'both@example.com': [(self.rock, 'CHECKOUT', 3), (self.jazz, 'CHECKOUT', 3)],
+            'promo@example.com': [(self.promos, 'FOOTER', 1)],
+        }.items():
+            subscriber = Subscriber.objects.create(email=email)
+            self.subscribers[email] = subscriber
+            for category, source, days_ago in subscriptions:
+                subscription = Subscription.objects.create(subscriber=subscriber, category=category, source=source)
+                Subscription.objects.filter(pk=subscription.pk).update(subscribed_at=timezone.now() - timezone.timedelta(days=days_ago))
+        # Left entirely / left the category
+        gone = Subscriber.objects.create(email='gone@example.com', is_active=False)
+        Subscription.objects.create(subscriber=gone, category=self.rock)
+        left = Subscriber.objects.create(email='left@example.com')
+        Subscription.objects.create(subscriber=left, category=self.rock, is_active=False)
+
+    def emails(self, segment):
+        from .segments import segment_subscribers
+        return set(segment_subscribers(segment).values_list('email', flat=True))
+
+    def test_segment_definitions(self):
+        segment = Segment.objects.create(name="Music")
+        segment.any_categories.set([self.rock, self.jazz])
+        self.assertEqual(self.emails(segment), {'rock@example.com', 'jazz@example.com', 'both@example.com'})
+
+        segment.any_categories.clear()
+        segment.all_categories.set([self.rock, self.jazz])
+        self.assertEqual(self.emails(segment), {'both@example.com'})
+
+        everyone = Segment.objects.create(name="Recent checkout signups", sources=['CHECKOUT'])
+        self.assertEqual(self.emails(everyone), {'jazz@example.com', 'both@example.com'})
+        everyone.sources = []
+        everyone.subscribed_after = timezone.now() - timezone.timedelta(days=4)
+        self.assertEqual(self.emails(everyone), {'both@example.com', 'promo@example.com'})
+        everyone.subscribed_before = timezone.now() - timezone.timedelta(days=2)
+        self.assertEqual(self.emails(everyone), {'both@example.com'})
+
+    def test_materialized_audience(self):
+        from .segments import materialize_segment
+
+        segment = Segment.objects.create(name="Rock fans")
+        segment.any_categories.set([self.rock])
+        self.assertEqual(materialize_segment(segment), (2, 0))
+        segment.refresh_from_db()
+        self.assertEqual(segment.audience_size, 2)
+        self.assertIsNotNone(segment.materialized_at)
+
+        # Only the difference is applied on refresh
+        Subscription.objects.filter(subscriber=self.subscribers['rock@example.com']).update(is_active=False)
+        Subscription.objects.create(subscriber=self.subscribers['promo@example.com'], category=self.rock)
+        self.assertEqual(materialize_segment(segment), (1, 1))
+        self.assertEqual(
+            set(segment.members.values_list('subscriber__email', flat=True)),
+            {'both@example.com', 'promo@example.com'},
+        )
+
+    def test_category_unsubscribe_after_materializing_is_honored(self):
+        from .delivery import plan_send, send_chunk
+        from .segments import materialize_segment
+
+        segment = Segment.objects.create(name="Jazz fans")
+        segment.any_categories.set([self.jazz])
+        materialize_segment(segment)
+        newsletter = Newsletter.objects.create(subject="Jazz night", content="<p>Tonight</p>", segment=segment)
+        jazz = self.subscribers['jazz@example.com']
+
+        # Opting out of the category right after the audience was stored still takes effect
+        response = self.client.post(
+            reverse('newsletter-unsubscribe'),
+            {'email': jazz.email, 'token': str(jazz.unsubscribe_token), 'categories': ['jazz']},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        chunks = plan_send(newsletter)
+        self.assertEqual(newsletter.deliveries.count(), 1)
+
+        # ...as does opting out between planning and sending the chunk: the stored audience is pruned
+        both = self.subscribers['both@example.com']
+        self.client.post(
+            reverse('newsletter-unsubscribe'),
+            {'email': both.email, 'token': str(both.unsubscribe_token), 'categories': ['jazz']},
+            content_type='application/json',
+        )
+        self.assertFalse(segment.members.filter(subscriber=both).exists())
+        segment.refresh_from_db()
+        self.assertEqual(segment.audience_size, 0)
+        self.assertEqual(send_chunk(chunks[0].pk), 0)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(newsletter.deliveries.get().status, NewsletterDelivery.Status.SKIPPED)
+
+    def test_stale_audience_rebuilt_before_send(self):
+        segment = Segment.objects.create(name="Promo fans")
+        segment.any_categories.set([self.promos])
+        newsletter = Newsletter.objects.create(subject="Sale", content="<p>Sale</p>", segment=segment)
+
+        self.assertEqual(send_newsletter_task(newsletter.newsletter_id), 1)
+        segment.refresh_from_db()
+        self.assertEqual(segment.audience_size, 1)
+
+    def test_admin_shows_stored_audience_size(self):
+        from django.contrib.auth import get_user_model
+        from .segments import materialize_segment
+
+        segment = Segment.objects.create(name="Rock fans")
+        segment.any_categories.set([self.rock])
+        materialize_segment(segment)
+        newsletter = Newsletter.objects.create(subject="Riffs", content="<p>Riffs</p>", segment=segment)
+        admin_user = get_user_model().objects.create_superuser(username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin_user)
+
+        with self.assertNumQueries(5):  # session, user, 2x count, page with segment and ledger counts joined
+            response = self.client.get('/admin/newsletter/newsletter/')
+        self.assertContains(response, "Rock fans (2)")
+        self.assertContains(self.client.get('/admin/newsletter/segment/'), "Rock fans")
+        self.assertContains(self.client.get(f'/admin/newsletter/newsletter/{newsletter.pk}/change/'), "Rock fans (2)")
@@ -1,6 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NewsletterCategoryViewSet, SubscribeView, UnsubscribeView
+from .views import (
+    NewsletterCategoryViewSet,
+    SubscribeView,
+    SubscriberExportView,
+    SubscriberImportView,
+    UnsubscribeView,
+)
 
 router = DefaultRouter()
 router.register(r'categories', NewsletterCategoryViewSet, basename='newsletter-category')
@@ -9,4 +15,6 @@ urlpatterns = [
     path('newsletter/', include(router.urls)),
     path('newsletter/subscribe/', SubscribeView.as_view(), name='newsletter-subscribe'),
     path('newsletter/unsubscribe/', UnsubscribeView.as_view(), name='newsletter-unsubscribe'),
-]
\ No newline at end of file
+    path('newsletter/subscribers/import/', SubscriberImportView.as_view(), name='newsletter-subscriber-import'),
+    path('newsletter/subscribers/export/', SubscriberExportView.as_view(), name='newsletter-subscriber-export'),
+]
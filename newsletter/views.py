@@ -1,10 +1,18 @@
 from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
+from core.throttles import ScopedRateLimitThrottle
+
+from .bulk import IMPORT_EXTENSIONS, SubscriberImport, export_csv, export_jsonl, export_queryset, read_upload
 from .models import NewsletterCategory, Subscriber, Subscription
+from .segments import prune_memberships
 from .serializers import (
     NewsletterCategorySerializer,
     SubscribeSerializer,
@@ -27,6 +35,8 @@ class SubscribeView(APIView):
     Subscribe an email to the newsletter.
     """
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [ScopedRateLimitThrottle]
+    throttle_scope = "newsletter_subscribe"
 
     def post(self, request):
         serializer = SubscribeSerializer(data=request.data)
@@ -36,17 +46,6 @@ class SubscribeView(APIView):
         source = serializer.validated_data['source']
         category_slugs = serializer.validated_data.get('categories', [])
 
-        # Get or create subscriber
-        subscriber, created = Subscriber.objects.get_or_create(
-            email=email
-        )
-
-        # If subscriber was inactive, reactivate
-        if not created and not subscriber.is_active:
-            subscriber.is_active = True
-            subscriber.unsubscribed_at = None
-            subscriber.save()
-
         # Determine categories to subscribe to
         if category_slugs:
             categories = NewsletterCategory.objects.filter(
@@ -59,19 +58,38 @@ class SubscribeView(APIView):
                 is_default=True,
                 is_active=True
             )
+        categories = list(categories.only('category_id', 'name'))
+        category_ids = [category.category_id for category in categories]
 
-        # Create subscriptions
-        for category in categories:
-            Subscription.objects.get_or_create(
-                subscriber=subscriber,
-                category=category,
-                defaults={'is_active': True, 'source': source}
+        with transaction.atomic():
+            # Get or create subscriber
+            subscriber, created = Subscriber.objects.get_or_create(
+                email=email
             )
 
-        # 🆕 Send confirmation email (only for new subscribers)
-        if created:
-            from .tasks import send_subscription_confirmation_email
-            send_subscription_confirmation_email.delay(subscriber.subscriber_id)
+            # If subscriber was inactive, reactivate
+            if not created and not subscriber.is_active:
+                Subscriber.objects.filter(pk=subscriber.pk).update(is_active=True, unsubscribed_at=None)
+
+            # Create subscriptions in one statement; (subscriber, category) is unique, so existing rows are skipped
+            Subscription.objects.bulk_create(
+                [
+                    Subscription(subscriber=subscriber, category_id=category_id, source=source)
+                    for category_id in category_ids
+                ],
+                ignore_conflicts=True,
+            )
+            # Signing up again for a category they had left turns it back on
+            if not created and category_ids:
+                Subscription.objects.filter(
+                    subscriber=subscriber, category_id__in=category_ids, is_active=False
+                ).update(is_active=True, unsubscribed_at=None)
+
+            # 🆕 Send confirmation email (only for new subscribers), once the signup is committed
+            if created:
+                from .tasks import send_subscription_confirmation_email
+                subscriber_id = subscriber.subscriber_id
+                transaction.on_commit(lambda: send_subscription_confirmation_email.delay(subscriber_id))
 
         return Response({
             'message': 'Successfully subscribed to newsletter',
@@ -115,6 +133,7 @@ class UnsubscribeView(APIView):
             # Unsubscribe from all
             subscriber.unsubscribe_all()
             message = "Unsubscribed from all newsletters"
+        prune_memberships(subscriber)
 
         return Response({'message': message})
 
@@ -136,9 +155,65 @@ class UnsubscribeView(APIView):
         try:
             subscriber = Subscriber.objects.get(email=email, unsubscribe_token=token)
             subscriber.unsubscribe_all()
+            prune_memberships(subscriber)
             return Response({'message': 'Successfully unsubscribed from all newsletters'})
         except Subscriber.DoesNotExist:
             return Response(
                 {'error': 'Invalid unsubscribe link'},
                 status=status.HTTP_404_NOT_FOUND
-            )
\ No newline at end of file
+            )
+
+
+class SubscriberImportView(APIView):
+    """
+    POST /api/v1/newsletter/subscribers/import/  (staff only)
+
+    Bulk import subscribers from a CSV (header row with `email` and optional `categories`) or JSONL
+    upload in the `file` field. Categories are comma-separated slugs; rows without any get the default
+    categories. Returns counts plus the rows that could not be imported.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not upload.name.lower().endswith(IMPORT_EXTENSIONS):
+            return Response({'error': 'file must be a .csv or .jsonl file'}, status=status.HTTP_400_BAD_REQUEST)
+        source = request.data.get('source', Subscription.SubscriptionSource.MANUAL)
+        if source not in Subscription.SubscriptionSource.values:
+            return Response({'error': f"Unknown source '{source}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            summary = SubscriberImport(source=source).run(read_upload(upload))
+        except UnicodeDecodeError:
+            return Response({'error': 'file must be UTF-8 encoded'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
+
+
+class SubscriberExportView(APIView):
+    """
+    GET /api/v1/newsletter/subscribers/export/?output=csv|jsonl&active=true&category=<slug>  (staff only)
+
+    Streams every matching subscriber with their active category slugs.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in ('csv', 'jsonl'):
+            return Response({'error': 'output must be csv or jsonl'}, status=status.HTTP_400_BAD_REQUEST)
+        active = request.query_params.get('active')
+        subscribers = export_queryset(
+            active=None if active is None else active.lower() in ('1', 'true', 'yes'),
+            category_slug=request.query_params.get('category'),
+        )
+
+        if output == 'csv':
+            response = StreamingHttpResponse(export_csv(subscribers), content_type='text/csv')
+        else:
+            response = StreamingHttpResponse(export_jsonl(subscribers), content_type='application/x-ndjson')
+        filename = f"subscribers-{timezone.now():%Y%m%d-%H%M%S}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
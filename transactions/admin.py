@@ -1,8 +1,15 @@
 from django.contrib import admin
 from .models import Order, OrderItem, Payment, Receipt, Buyer   
 # Register your models here.
-admin.site.register(Order)
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    # totals are the denormalized values kept up to date by transactions.pricing - no per-row recomputation
+    list_display = ('reference_number', 'status', 'subtotal', 'tax_amount', 'total_amount', 'currency', 'created_date')
+    list_filter = ('status', 'currency', 'created_date')
+    search_fields = ('reference_number', 'buyer__contact__email')
+    readonly_fields = ('subtotal', 'tax_amount', 'total_amount')
+
 admin.site.register(OrderItem)
 admin.site.register(Payment)
 admin.site.register(Receipt)
-admin.site.register(Buyer)
\ No newline at end of file
+admin.site.register(Buyer)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:04
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_rename_created_at_order_created_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_date'], name='order_status_created_idx'),
+        ),
+    ]
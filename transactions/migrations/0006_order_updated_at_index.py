@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0005_order_denormalized_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at'], name='order_updated_at_idx'),
+        ),
+    ]
@@ -5,7 +5,10 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericRelation
 from common.models import Address
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 
 class Buyer(models.Model):
     """A buyer of a track"""
@@ -39,25 +42,37 @@ class Order(models.Model):
     created_date = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    # tax fields
-    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    # tax fields - denormalized totals maintained by transactions.pricing whenever order items change
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     tax_rate = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('8.50'))  # e.g., 8.50 for 8.50%
-    tax_amount = models.DecimalField(max_digits=10, decimal_places=2)
-    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     currency = models.CharField(max_length=3, default="usd")
 
+    class Meta:
+        indexes = [
+            # revenue reporting filters completed orders by date
+            models.Index(fields=['status', 'created_date'], name='order_status_created_idx'),
+            # analytics rollups pick up orders changed since their last run
+            models.Index(fields=['updated_at'], name='order_updated_at_idx'),
+        ]
+
+    @staticmethod
+    def compute_tax(subtotal, tax_rate):
+        """Return (tax_amount, total_amount) for a subtotal, rounded to cents"""
+        tax_amount = (subtotal * (tax_rate / Decimal('100'))).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return tax_amount, subtotal + tax_amount
+
     def calculate_totals(self):
         """Calculate tax and total based on subtotal and tax rate"""
-        self.tax_amount = self.subtotal * (self.tax_rate / Decimal('100'))
-        self.total_amount = self.subtotal + self.tax_amount
+        self.tax_amount, self.total_amount = self.compute_tax(self.subtotal, self.tax_rate)
         self.save()  # Save the calculated values
         return self.total_amount
 
     def save(self, *args, **kwargs):
         # Ensure totals are calculated before saving
         if self.subtotal and self.tax_rate:
-            self.tax_amount = self.subtotal * (self.tax_rate / Decimal('100'))
-            self.total_amount = self.subtotal + self.tax_amount
+            self.tax_amount, self.total_amount = self.compute_tax(self.subtotal, self.tax_rate)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -116,4 +131,28 @@ class Receipt(models.Model):
     receipt_file = models.FileField(upload_to='receipts/', blank=True, null=True)
  
     def __str__(self):
-        return f"Receipt {self.receipt_id} for Payment {self.payment}"
\ No newline at end of file
+        return f"Receipt {self.receipt_id} for Payment {self.payment}"
+
+
+def touch_orders(*order_ids):
+    """
+    Bump updated_at of orders whose sales data changed without the order itself being saved
+    (payments, licenses), so the incremental sales rollups (analytics/services.py) rebuild their day.
+    """
+    order_ids = {order_id for order_id in order_ids if order_id is not None}
+    if order_ids:
+        Order.objects.filter(order_id__in=order_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def touch_order_on_payment_change(sender, instance, **kwargs):
+    touch_orders(instance.order_id)
+
+
+# Keep the denormalized order totals in sync whenever an order item is added, changed or removed
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def recalculate_order_totals_on_item_change(sender, instance, **kwargs):
+    from transactions.pricing import recalculate_order_totals
+    recalculate_order_totals(instance.order_id)
@@ -0,0 +1,150 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth
+from django.utils import timezone
+
+from .models import Order, OrderItem
+
+# Pricing engine for orders
+# - Cart pricing: one query joining TrackLicenseOptions -> License_type for every item in the cart
+# - Order totals: one aggregate query over OrderItem (price snapshot * quantity) grouped by order,
+#   written back to the denormalized Order.subtotal/tax_amount/total_amount columns
+# - Revenue reporting: aggregates over the stored order totals, so reports never walk order items
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+LINE_TOTAL = ExpressionWrapper(F('price') * F('quantity'), output_field=MONEY)
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+
+_deferred = threading.local()
+
+
+class PricingError(ValueError):
+    """Raised when a cart references products that can't be priced"""
+
+
+def quote_items(items):
+    """
+    Price cart items against the current License_type prices in a single query.
+
+    items: iterable of dicts with "track_license_option_id" and optional "quantity".
+    Returns (subtotal, options) where options maps the option id (str) to its
+    TrackLicenseOptions (with track and license_type already joined).
+    """
+    from licenses.models import TrackLicenseOptions
+
+    items = list(items)
+    option_ids = {str(item.get("track_license_option_id")) for item in items}
+    options = {
+        str(option.track_license_option_id): option
+        for option in TrackLicenseOptions.objects
+        .select_related("track", "license_type")
+        .filter(track_license_option_id__in=option_ids)
+    }
+
+    subtotal = ZERO
+    for item in items:
+        option = options.get(str(item.get("track_license_option_id")))
+        if option is None:
+            raise PricingError(f"Track license option {item.get('track_license_option_id')} not found")
+        subtotal += option.license_type.price * int(item.get("quantity", 1))
+    return subtotal, options
+
+
+def compute_order_subtotals(order_ids):
+    """Return {order_id: subtotal} for the given orders using one grouped aggregate query (orders without items are omitted)"""
+    rows = (
+        OrderItem.objects
+        .filter(order_id__in=order_ids)
+        .values('order_id')
+        .annotate(subtotal=Sum(LINE_TOTAL))
+        .order_by()
+    )
+    return {row['order_id']: row['subtotal'] or ZERO for row in rows}
+
+
+def recalculate_order_totals(*order_ids):
+    """
+    Recompute and store the denormalized totals for the given orders.
+    Inside deferred_order_totals() the work is postponed and done once per order on exit.
+    """
+    order_ids = {order_id for order_id in order_ids if order_id is not None}
+    if not order_ids:
+        return 0
+
+    pending = getattr(_deferred, "order_ids", None)
+    if pending is not None:
+        pending.update(order_ids)
+        return 0
+
+    subtotals = compute_order_subtotals(order_ids)
+    orders = list(Order.objects.filter(order_id__in=order_ids).only('order_id', 'tax_rate'))
+    now = timezone.now()
+    for order in orders:
+        order.subtotal = subtotals.get(order.order_id, ZERO)
+        order.tax_amount, order.total_amount = Order.compute_tax(order.subtotal, order.tax_rate)
+        # bulk_update skips auto_now; the sales rollups find changed orders by updated_at
+        order.updated_at = now
+    return Order.objects.bulk_update(orders, ['subtotal', 'tax_amount', 'total_amount', 'updated_at'])
+
+
+@contextmanager
+def deferred_order_totals():
+    """
+    Batch order total recalculation while many order items are written (e.g. checkout),
+    so each touched order is aggregated once instead of once per item.
+    """
+    if getattr(_deferred, "order_ids", None) is not None:
+        # already deferring - the outermost block flushes
+        yield
+        return
+
+    _deferred.order_ids = set()
+    try:
+        yield
+        order_ids = _deferred.order_ids
+    finally:
+        _deferred.order_ids = None
+    recalculate_order_totals(*order_ids)
+
+
+REPORT_PERIODS = {
+    'day': TruncDay,
+    'month': TruncMonth,
+}
+
+
+def revenue_report(start=None, end=None, period='month', statuses=(Order.OrderStatus.COMPLETED,)):
+    """
+    Revenue per period and currency from the stored order totals.
+    One grouped aggregate query regardless of how many orders or items are involved.
+    """
+    if period not in REPORT_PERIODS:
+        raise PricingError(f"Unsupported period '{period}'. Use one of: {', '.join(REPORT_PERIODS)}")
+
+    orders = Order.objects.filter(status__in=statuses)
+    if start:
+        orders = orders.filter(created_date__date__gte=start)
+    if end:
+        orders = orders.filter(created_date__date__lte=end)
+
+    rows = list(
+        orders
+        .annotate(period=REPORT_PERIODS[period]('created_date'))
+        .values('period', 'currency')
+        .annotate(
+            order_count=Count('order_id'),
+            subtotal=Coalesce(Sum('subtotal'), ZERO, output_field=MONEY),
+            tax_amount=Coalesce(Sum('tax_amount'), ZERO, output_field=MONEY),
+            total_amount=Coalesce(Sum('total_amount'), ZERO, output_field=MONEY),
+        )
+        .order_by('period', 'currency')
+    )
+    # SQLite hands back sums without their scale - normalize to cents
+    for row in rows:
+        for field in ('subtotal', 'tax_amount', 'total_amount'):
+            row[field] = Decimal(row[field]).quantize(CENT)
+    return rows
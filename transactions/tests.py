@@ -1,15 +1,18 @@
+from django.contrib.auth import get_user_model
 from django.test.utils import isolate_apps
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from .models import Buyer, Order, OrderItem, Payment, Receipt, PaymentStatus
 from common.models import Contact
-from licenses.models import License
-from music.models import Track
+from licenses.models import License, License_type, LicenseStatus, TrackLicenseOptions, LicenseDownload
+from music.models import Track, FileFormat, TrackStorageFile
 from django.contrib.contenttypes.models import ContentType
 import uuid
 from django.db import models
-from datetime import date
+from datetime import date, timedelta
+from decimal import Decimal
+from django.utils import timezone
 # Define a simple, test-only model to act as a purchasable item.
 # This avoids pulling in dependencies from other apps like 'tracks' or 'licenses'.
  # This ensures the model is only used for tests and not created in the real database.
@@ -135,4 +138,121 @@ class ReceiptTest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(str(response.data['payment']), str(self.payment.payment_id)) 
-        self.assertIn('receipts/test.pdf', response.data['receipt_file'])
\ No newline at end of file
+        self.assertIn('receipts/test.pdf', response.data['receipt_file'])
+
+class OrderLicensesQueryTest(APITestCase):
+    """The order confirmation payload must not issue queries per order item."""
+    def setUp(self):
+        self.contact = Contact.objects.create(first_name='Buyer', last_name='Buyer')
+        self.buyer = Buyer.objects.create(contact=self.contact)
+        self.file_format = FileFormat.objects.create(
+            name='MP3', mime_type='audio/mpeg', extension='.mp3', compression='lossy'
+        )
+        self.license_type = License_type.objects.create(
+            license_type_name='Basic', license_template='Template', license_term='1 Year',
+            transferability='Non-Transferable', price=Decimal('29.99'), download_limit='Unlimited',
+            streaming_limit='Unlimited', monetized_radio_plays='Unlimited', video_rights='Yes',
+            royalty_payment='No'
+        )
+        self.content_type = ContentType.objects.get(app_label='licenses', model='tracklicenseoptions')
+
+        def build_order(reference_number, item_count):
+            order = Order.objects.create(
+                buyer=self.buyer, reference_number=reference_number,
+                subtotal=Decimal('29.99') * item_count, status=Order.OrderStatus.COMPLETED
+            )
+            for i in range(item_count):
+                track = Track.objects.create(title=f'Track {reference_number}-{i}')
+                storage_file = TrackStorageFile.objects.create(
+                    file_path=f'track_storage_files/{reference_number}-{i}.mp3', file_format=self.file_format
+                )
+                option = TrackLicenseOptions.objects.create(
+                    track=track, track_storage_file=storage_file, license_type=self.license_type
+                )
+                order_item = OrderItem.objects.create(
+                    order=order, content_type=self.content_type, object_id=option.track_license_option_id,
+                    price=self.license_type.price
+                )
+                license_obj = License.objects.create(track_license_option=option, order_item=order_item)
+                LicenseStatus.objects.create(license=license_obj, license_status_option='Active')
+                LicenseDownload.objects.create(
+                    license=license_obj, token=f'token-{reference_number}-{i}',
+                    expires_at=timezone.now() + timedelta(hours=1),
+                    zip_file=f'license_zips/{reference_number}-{i}.zip'
+                )
+            return order
+
+        self.small_order = build_order('ORD-SMALL', 1)
+        self.large_order = build_order('ORD-LARGE', 50)
+
+    def test_query_count_is_constant(self):
+        for order, item_count in ((self.small_order, 1), (self.large_order, 50)):
+            url = reverse('order-licenses', kwargs={'reference_number': order.reference_number})
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['licenses']), item_count)
+            self.assertTrue(all(item['status'] == 'Active' for item in response.data['licenses']))
+            self.assertTrue(all(item['zip_download_url'] for item in response.data['licenses']))
+
+
+class OrderTotalsTest(APITestCase):
+    def setUp(self):
+        self.contact = Contact.objects.create(first_name='Buyer', last_name='Buyer')
+        self.buyer = Buyer.objects.create(contact=self.contact)
+        self.order = Order.objects.create(buyer=self.buyer, reference_number='ORD-TOTALS', tax_rate=Decimal('10.00'))
+        self.content_type = ContentType.objects.get_for_model(Track)
+
+    def add_item(self, price, quantity=1):
+        track = Track.objects.create(title='Test Track')
+        return OrderItem.objects.create(
+            order=self.order, content_type=self.content_type, object_id=track.track_id,
+            price=Decimal(price), quantity=quantity
+        )
+
+    def test_totals_follow_item_changes(self):
+        self.add_item('20.00')
+        item = self.add_item('5.00', quantity=2)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.subtotal, Decimal('30.00'))
+        self.assertEqual(self.order.tax_amount, Decimal('3.00'))
+        self.assertEqual(self.order.total_amount, Decimal('33.00'))
+
+        item.delete()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.subtotal, Decimal('20.00'))
+        self.assertEqual(self.order.total_amount, Decimal('22.00'))
+
+    def test_deferred_totals_aggregate_once(self):
+        from .pricing import deferred_order_totals
+        with deferred_order_totals():
+            for _ in range(5):
+                self.add_item('10.00')
+            self.order.refresh_from_db()
+            self.assertEqual(self.order.subtotal, Decimal('0.00'))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.subtotal, Decimal('50.00'))
+        self.assertEqual(self.order.total_amount, Decimal('55.00'))
+
+    def test_revenue_report(self):
+        self.add_item('20.00')
+        self.order.refresh_from_db()
+        self.order.status = Order.OrderStatus.COMPLETED
+        self.order.save()
+        Order.objects.create(buyer=self.buyer, reference_number='ORD-PENDING', subtotal=Decimal('99.00'))
+
+        url = reverse('orders-revenue')
+        self.assertIn(self.client.get(url).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+        self.client.force_authenticate(get_user_model().objects.create_user(username='staff', email='staff@example.com', password='pass', is_staff=True))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'period': 'day'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        row = response.data['results'][0]
+        self.assertEqual(row['order_count'], 1)
+        self.assertEqual(row['subtotal'], '20.00')
+        self.assertEqual(row['total_amount'], '22.00')
+
+        response = self.client.get(url, {'period': 'week'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
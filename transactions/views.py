@@ -6,9 +6,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.contrib.contenttypes.models import ContentType
 from transactions.services import PaymentService
+from transactions.pricing import quote_items, deferred_order_totals, revenue_report, PricingError
 from django.conf import settings
 from common.models import Contact, Address
 from music.models import Contributor, Contribution, Track, MusicProfessional, SocialMediaLink
@@ -21,6 +24,11 @@ from datetime import datetime
 from licenses.tasks import fulfill_order_licenses
 from licenses.services import get_or_create_license_zip
 from django.urls import reverse
+from core.throttles import ScopedRateLimitThrottle
+
+
+class CheckoutThrottle(ScopedRateLimitThrottle):
+    scope = "checkout"
 
 
 class DebugLoggingMixin:
@@ -70,7 +78,7 @@ class OrderViewSet(DebugLoggingMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     pagination_class = None
 
-    @action(detail=False, methods=["post"], url_path="checkout")
+    @action(detail=False, methods=["post"], url_path="checkout", throttle_classes=[CheckoutThrottle])
     def checkout(self, request):
         """
         Atomic checkout endpoint - creates entire order with licenses in one transaction.
@@ -248,19 +256,8 @@ class OrderViewSet(DebugLoggingMixin, viewsets.ModelViewSet):
                 )
 
                 # ****ORDER****
-                # 7. Create an order variable that takes all the license prices and quantity in the backend to create the order in the backend instead so as it's safer from user tampering
-                subtotal = 0
-                for item_data in data["items"]:
-                    # get the track license option from each track
-                    track_license_option = TrackLicenseOptions.objects.get(track_license_option_id=item_data["track_license_option_id"])
-                    # get the license price from the track license option
-                    license_price = track_license_option.license_type.price
-                    # get the quantity from the item data
-                    quantity = item_data["quantity"]
-                    # calculate the total price for the item
-                    total_price = license_price * quantity
-                    # add the total price to the subtotal
-                    subtotal += total_price
+                # 7. Price the cart in the backend (one query joined to License_type) instead of trusting the client, as it's safer from user tampering
+                subtotal, track_license_options = quote_items(data["items"])
                 # create the order with the subtotal as the total amount the tax amount is calculated in the model
                 order, _ = Order.objects.update_or_create(
                     reference_number=reference_number,
@@ -274,79 +271,78 @@ class OrderViewSet(DebugLoggingMixin, viewsets.ModelViewSet):
             
                 # ****LICENSE****
                 # 9. Process each cart item license
+                # Order totals are recalculated once for the whole cart when the block exits
                 created_licenses = []
                 holdings = []
-                for item_data in data["items"]:
-                    track_id = item_data.get("track_id")
-                    track_license_option_id = item_data.get("track_license_option_id")
-                    # It's more secure to get the price of each license in the backend to that users don't temper with it
-                    track_license_option = TrackLicenseOptions.objects.get(track_license_option_id=track_license_option_id)
-                    price = track_license_option.license_type.price
-                    # get the quantity from the item data
-                    quantity = item_data.get("quantity", 1)
-                    print("my track_id", track_id)
-                    # Validate track and license_type exist
-                    try:
-                        track = Track.objects.get(track_id=track_id)
-                        track_license_option = TrackLicenseOptions.objects.get(track_license_option_id=track_license_option_id)
-                    except Track.DoesNotExist:
-                        raise ValueError(f"Track {track_id} not found")
-                    except TrackLicenseOptions.DoesNotExist:
-                        raise ValueError(f"Track license option {track_license_option_id} not found")
+                with deferred_order_totals():
+                    for item_data in data["items"]:
+                        track_id = item_data.get("track_id")
+                        track_license_option_id = item_data.get("track_license_option_id")
+                        # It's more secure to get the price of each license in the backend to that users don't temper with it
+                        track_license_option = track_license_options[str(track_license_option_id)]
+                        price = track_license_option.license_type.price
+                        # get the quantity from the item data
+                        quantity = item_data.get("quantity", 1)
+                        print("my track_id", track_id)
+                        # Validate the track exists and matches the license option
+                        track = track_license_option.track
+                        if str(track.track_id) != str(track_id):
+                            raise ValueError(f"Track {track_id} not found")
                     
-                    # ****ORDERITEM****
-                    # Create orderItem (generic FK to track_license_option instead of license) as it will be used to create the license
-                    # License is typically a derived artifact that can change state over time.
-                    # *License represents fulfillment generated from that purchase.
-                    # *TrackLicenseOption is the product being purchased.
-                    content_type = ContentType.objects.get(app_label='licenses', model='tracklicenseoptions')
-                    order_item, _ = OrderItem.objects.update_or_create(
-                        order=order,
-                        object_id=track_license_option.track_license_option_id,
-                        defaults={
-                            "content_type": content_type,
-                            "quantity": quantity,
-                            "price": price
-                        }
-                    )
+                        # ****ORDERITEM****
+                        # Create orderItem (generic FK to track_license_option instead of license) as it will be used to create the license
+                        # License is typically a derived artifact that can change state over time.
+                        # *License represents fulfillment generated from that purchase.
+                        # *TrackLicenseOption is the product being purchased.
+                        content_type = ContentType.objects.get(app_label='licenses', model='tracklicenseoptions')
+                        order_item, _ = OrderItem.objects.update_or_create(
+                            order=order,
+                            object_id=track_license_option.track_license_option_id,
+                            defaults={
+                                "content_type": content_type,
+                                "quantity": quantity,
+                                "price": price
+                            }
+                        )
 
-                    # Create license - And MAKE SURE YO INCLUDE THE LICENSE_AGREEMENT_FILE LATER
-                    license_obj, _ = License.objects.update_or_create(
-                        track_license_option=track_license_option,
-                        order_item=order_item,
-                        defaults={
-                            "created_date": timezone.now(),
-                        }
-                    )
-                    print(f"License obj created: {license_obj}") 
-                    #TODO: Automate expiration date
+                        # Create license - And MAKE SURE YO INCLUDE THE LICENSE_AGREEMENT_FILE LATER
+                        license_obj, _ = License.objects.update_or_create(
+                            track_license_option=track_license_option,
+                            order_item=order_item,
+                            defaults={
+                                "created_date": timezone.now(),
+                            }
+                        )
+                        print(f"License obj created: {license_obj}") 
+                        #TODO: Automate expiration date
                     
-                    # ****LICENSEHOLDING****
-                    # Create license holdings for each licensee
-                    # Create license holding
-                    holding, _ = LicenseHolding.objects.update_or_create(
-                        license=license_obj,
-                        licensee=licensee,
-                        defaults={}
-                    )
+                        # ****LICENSEHOLDING****
+                        # Create license holdings for each licensee
+                        # Create license holding
+                        holding, _ = LicenseHolding.objects.update_or_create(
+                            license=license_obj,
+                            licensee=licensee,
+                            defaults={}
+                        )
 
-                    # Create license status- BUT IT'S NOT ACTIVE UNTIL PAYMENT IS PROCESSED
-                    license_status, _ = LicenseStatus.objects.update_or_create(
-                        license=license_obj,
-                        defaults={
-                            "license_status_option":"Pending",
-                            "license_status_date": timezone.now(),
-                        }
-                    )
+                        # Create license status- BUT IT'S NOT ACTIVE UNTIL PAYMENT IS PROCESSED
+                        license_status, _ = LicenseStatus.objects.update_or_create(
+                            license=license_obj,
+                            defaults={
+                                "license_status_option":"Pending",
+                                "license_status_date": timezone.now(),
+                            }
+                        )
                     
-                    created_licenses.append({
-                        "license_id": str(license_obj.license_id),
-                        "track_id": str(track.track_id),
-                        "track_title": track.title,
-                        "license_type": track_license_option.license_type.license_type_name,
-                        "status": "Pending Payment",
-                    })
+                        created_licenses.append({
+                            "license_id": str(license_obj.license_id),
+                            "track_id": str(track.track_id),
+                            "track_title": track.title,
+                            "license_type": track_license_option.license_type.license_type_name,
+                            "status": "Pending Payment",
+                        })
                     
+                order.refresh_from_db(fields=["subtotal", "tax_amount", "total_amount"])
                 holdings.append({
                     # "licensee_id": str(licensee.licensee_id), -  prob not safe to include
                     "licensee_name": f"{licensee.music_professional.contact.first_name} {licensee.music_professional.contact.last_name}".strip(),
@@ -394,6 +390,44 @@ class OrderViewSet(DebugLoggingMixin, viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=["get"], url_path="revenue", permission_classes=[permissions.IsAdminUser])
+    def revenue(self, request):
+        """
+        Revenue report aggregated in the database from the stored order totals.
+        GET /orders/revenue/?period=month&start=2025-01-01&end=2025-12-31
+        period is "day" or "month" (default); start/end are optional ISO dates.
+        """
+        period = request.query_params.get("period", "month")
+        dates = {}
+        for param in ("start", "end"):
+            value = request.query_params.get(param)
+            dates[param] = parse_date(value) if value else None
+            if value and dates[param] is None:
+                return Response(
+                    {param: ["Enter a valid date in YYYY-MM-DD format."]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            rows = revenue_report(start=dates["start"], end=dates["end"], period=period)
+        except PricingError as e:
+            return Response({"period": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "period": period,
+            "results": [
+                {
+                    "period": row["period"].date().isoformat() if hasattr(row["period"], "date") else str(row["period"]),
+                    "currency": row["currency"],
+                    "order_count": row["order_count"],
+                    "subtotal": str(row["subtotal"]),
+                    "tax_amount": str(row["tax_amount"]),
+                    "total_amount": str(row["total_amount"]),
+                }
+                for row in rows
+            ],
+        })
+
     #This route gets the licenses and track zip files for the front end on order confirmation
     @action(detail=True, methods=['get'])
     def get_licenses_and_tracks(self, request, reference_number=None):
@@ -404,8 +438,38 @@ class OrderViewSet(DebugLoggingMixin, viewsets.ModelViewSet):
         Poll every ~1-2 seconds for a short period (or poll an order status endpoint), until it becomes COMPLETED and returns licenses
         """
         try:
-            order = Order.objects.get(reference_number=reference_number)
-            print(f"PROVIDER PAYMENT ID from PAYMENT FOR ORDER for License: {order.payments.first().provider_payment_id}")
+            # Walk order -> items -> licenses in a fixed number of queries regardless of order size.
+            # The active flag is computed in SQL so we don't hit license_status once per license.
+            license_queryset = (
+                License.objects
+                .select_related(
+                    "track_license_option__track",
+                    "track_license_option__license_type",
+                    "track_license_option__track_storage_file__file_format",
+                    "license_downloads",
+                )
+                .annotate(
+                    is_active=Exists(
+                        LicenseStatus.objects.filter(
+                            license=OuterRef("pk"),
+                            license_status_option="Active",
+                        )
+                    )
+                )
+                .order_by("created_date")
+            )
+            order = (
+                Order.objects
+                .prefetch_related(
+                    Prefetch(
+                        "order_items",
+                        queryset=OrderItem.objects.prefetch_related(
+                            Prefetch("licenses", queryset=license_queryset)
+                        ),
+                    )
+                )
+                .get(reference_number=reference_number)
+            )
             print(f"ORDER STATUS IN GETLICENSE: {order.status}")
             # Security check: only allow access if payment is completed
             if order.status != Order.OrderStatus.COMPLETED:
@@ -419,25 +483,23 @@ class OrderViewSet(DebugLoggingMixin, viewsets.ModelViewSet):
             licenses = []
             for order_item in order.order_items.all():
                 for license_obj in order_item.licenses.all():
+                    track_license_option = license_obj.track_license_option
+                    track_storage_file = track_license_option.track_storage_file
                     # Only include download_url if license status is Active
-                    download_url = None
-                    if hasattr(license_obj, 'license_status') and license_obj.license_status.filter(license_status_option='Active').exists():
-                        # license_download_url = license_obj.license_agreement_file.url if license_obj.license_agreement_file else None,
-                        # track_download_url= license_obj.track_license_option.track_storage_file.file_path.url,
-                        track_description = license_obj.track_license_option.track_storage_file.description,
-                        track_file_format = license_obj.track_license_option.track_storage_file.file_format.name,
+                    zip_url = None
+                    if license_obj.is_active:
                         ld = get_or_create_license_zip(license_obj)  # 96h TTL
                         zip_path = reverse("download-assets", args=[license_obj.license_id, ld.token])
                         zip_url = request.build_absolute_uri(zip_path) #This is important to create a short lived url
                     licenses.append({
                         "license_id": str(license_obj.license_id),
-                        "track_id": str(license_obj.track_license_option.track.track_id),
-                        "track_title": license_obj.track_license_option.track.title,
-                        "license_type": license_obj.track_license_option.license_type.license_type_name,
-                        "status": "Active",  # We know it's active because of the check above
+                        "track_id": str(track_license_option.track.track_id),
+                        "track_title": track_license_option.track.title,
+                        "license_type": track_license_option.license_type.license_type_name,
+                        "status": "Active" if license_obj.is_active else "Pending",
                         "created_date": license_obj.created_date,
-                        "track_description": track_description,
-                        "track_file_format": track_file_format,
+                        "track_description": track_storage_file.description,
+                        "track_file_format": track_storage_file.file_format.name,
                         "zip_download_url": zip_url,
                     })
 